@@ -136,6 +136,7 @@ setup(
     # Similar to `install_requires` above, these must be valid existing
     # projects.
     extras_require={  # Optional
+        'compression': ['zstandard', 'lz4'],
         'demo': ['ipykernel', 'ipywidgets'],
         'docs': ['sphinx-autoapi', 'sphinx_rtd_theme']
     },
@@ -163,9 +164,9 @@ setup(
     # For example, the following would provide a command called `sample` which
     # executes the function `main` from this package when invoked:
     entry_points={  # Optional
-        #'console_scripts': [
-        #    'sample=sample:main',
-        #],
+        'console_scripts': [
+            'epic-masks=epic_kitchens.masks.cli:main',
+        ],
     },
 
     # List additional URLs that are relevant to your project as a dict.
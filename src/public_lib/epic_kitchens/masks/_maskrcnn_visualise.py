@@ -33,6 +33,7 @@ def display_instances(
     show_bbox=True,
     colors=None,
     captions=None,
+    polygons=None,
 ):
     """
     boxes: [num_instance, (x1, y1, x2, y2, class_id)] in image coordinates.
@@ -45,6 +46,8 @@ def display_instances(
     figsize: (optional) the size of the image
     colors: (optional) An array or colors to use with each object
     captions: (optional) A list of strings to use as captions for each object
+    polygons: (optional) A list of (x, y) outline polygons in image coordinates
+        for each object, used instead of finding contours of the masks
     """
     # Number of instances
     N = boxes.shape[0]
@@ -107,13 +110,18 @@ def display_instances(
             masked_image = apply_mask(masked_image, mask, color)
 
         # Mask Polygon
-        # Pad to ensure proper polygons for masks that touch image edges.
-        padded_mask = np.zeros((mask.shape[0] + 2, mask.shape[1] + 2), dtype=np.uint8)
-        padded_mask[1:-1, 1:-1] = mask
-        contours = find_contours(padded_mask, 0.5)
-        for verts in contours:
+        if polygons is not None:
+            instance_polygons = polygons[i]
+        else:
+            # Pad to ensure proper polygons for masks that touch image edges.
+            padded_mask = np.zeros(
+                (mask.shape[0] + 2, mask.shape[1] + 2), dtype=np.uint8
+            )
+            padded_mask[1:-1, 1:-1] = mask
+            contours = find_contours(padded_mask, 0.5)
             # Subtract the padding and flip (y, x) to (x, y)
-            verts = np.fliplr(verts) - 1
+            instance_polygons = [np.fliplr(verts) - 1 for verts in contours]
+        for verts in instance_polygons:
             p = Polygon(verts, facecolor="none", edgecolor=color)
             ax.add_patch(p)
     ax.imshow(masked_image.astype(np.uint8))
@@ -121,16 +129,17 @@ def display_instances(
         plt.show()
 
 
-def random_colors(N, bright=True):
+def random_colors(N, bright=True, rng=None):
     """
     Generate random colors.
     To get visually distinct colors, generate them in HSV space then
-    convert to RGB.
+    convert to RGB. Colors are shuffled with ``rng`` (a ``random.Random``),
+    defaulting to the global ``random`` module.
     """
     brightness = 1.0 if bright else 0.7
     hsv = [(i / N, 1, brightness) for i in range(N)]
     colors = list(map(lambda c: colorsys.hsv_to_rgb(*c), hsv))
-    random.shuffle(colors)
+    (random if rng is None else rng).shuffle(colors)
     return colors
 
 
@@ -0,0 +1,163 @@
+"""
+Decoder for the protobuf wire format of ``model.masks.FrameObjectDetections``
+(see ``types.proto``) straight into flat columns.
+
+Parsing the wire format directly avoids building a protobuf message and then
+copying each of its fields into dataclasses one attribute at a time.
+"""
+import struct
+from array import array
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+# Tags are (field_number << 3) | wire_type.
+_FRAME_NUMBER = (2 << 3) | 0
+_OBJECTS = (3 << 3) | 2
+_OBJ_BBOX = (1 << 3) | 2
+_OBJ_COCO_MASK = (2 << 3) | 2
+_OBJ_SCORE = (3 << 3) | 5
+_OBJ_PRED_CLASS = (4 << 3) | 0
+_BBOX_FIELDS = {(1 << 3) | 5: 0, (2 << 3) | 5: 1, (3 << 3) | 5: 2, (4 << 3) | 5: 3}
+
+# A BBox with all four (non-zero) fields in order, the common case.
+_FULL_BBOX = struct.Struct("<xfxfxfxf")
+_FULL_BBOX_TAGS = (0x0D, 0x15, 0x1D, 0x25)
+_FLOAT = struct.Struct("<f")
+
+
+def decode_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _skip_field(buf: bytes, pos: int, wire_type: int) -> int:
+    if wire_type == 0:
+        return decode_varint(buf, pos)[1]
+    if wire_type == 1:
+        return pos + 8
+    if wire_type == 2:
+        length, pos = decode_varint(buf, pos)
+        return pos + length
+    if wire_type == 5:
+        return pos + 4
+    raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+
+
+def _to_int32(value: int) -> int:
+    # Negative int32s are encoded as 64-bit two's complement varints.
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _decode_bbox(buf: bytes, pos: int, end: int, bbox: array) -> None:
+    if end - pos == _FULL_BBOX.size and (
+        buf[pos], buf[pos + 5], buf[pos + 10], buf[pos + 15]
+    ) == _FULL_BBOX_TAGS:
+        bbox.extend(_FULL_BBOX.unpack_from(buf, pos))
+        return
+    coords = [0.0, 0.0, 0.0, 0.0]
+    while pos < end:
+        tag, pos = decode_varint(buf, pos)
+        if tag in _BBOX_FIELDS:
+            coords[_BBOX_FIELDS[tag]] = _FLOAT.unpack_from(buf, pos)[0]
+            pos += 4
+        else:
+            pos = _skip_field(buf, pos, tag & 7)
+    bbox.extend(coords)
+
+
+def decode_frame_number(buf: bytes) -> int:
+    """Frame number of a serialized ``pb.FrameObjectDetections``, skipping its
+    objects without parsing them.
+    """
+    pos = 0
+    frame_number = 0
+    while pos < len(buf):
+        tag, pos = decode_varint(buf, pos)
+        if tag == _FRAME_NUMBER:
+            frame_number, pos = decode_varint(buf, pos)
+            frame_number = _to_int32(frame_number)
+        else:
+            pos = _skip_field(buf, pos, tag & 7)
+    return frame_number
+
+
+def decode_frame_detections(pb_strs: Iterable[bytes]) -> Dict[str, np.ndarray]:
+    """Decode serialized ``pb.FrameObjectDetections`` into the columns of
+    :class:`epic_kitchens.masks.types.VideoDetections`.
+    """
+    frame_numbers = array("i")
+    frame_offsets = array("q", [0])
+    bbox = array("f")
+    score = array("f")
+    pred_class = array("i")
+    rle_offsets = array("q", [0])
+    rle_blob = bytearray()
+
+    for buf in pb_strs:
+        buf = memoryview(buf).cast("B") if not isinstance(buf, bytes) else buf
+        pos = 0
+        n = len(buf)
+        frame_number = 0
+        while pos < n:
+            tag = buf[pos]
+            pos += 1
+            if tag >= 0x80:
+                tag, pos = decode_varint(buf, pos - 1)
+            if tag == _OBJECTS:
+                length, pos = decode_varint(buf, pos)
+                end = pos + length
+                obj_score = 0.0
+                obj_class = 0
+                has_bbox = False
+                while pos < end:
+                    tag = buf[pos]
+                    pos += 1
+                    if tag == _OBJ_BBOX:
+                        length, pos = decode_varint(buf, pos)
+                        _decode_bbox(buf, pos, pos + length, bbox)
+                        has_bbox = True
+                        pos += length
+                    elif tag == _OBJ_COCO_MASK:
+                        length, pos = decode_varint(buf, pos)
+                        rle_blob += buf[pos : pos + length]
+                        pos += length
+                    elif tag == _OBJ_SCORE:
+                        obj_score = _FLOAT.unpack_from(buf, pos)[0]
+                        pos += 4
+                    elif tag == _OBJ_PRED_CLASS:
+                        obj_class, pos = decode_varint(buf, pos)
+                        obj_class = _to_int32(obj_class)
+                    else:
+                        if tag >= 0x80:
+                            tag, pos = decode_varint(buf, pos - 1)
+                        pos = _skip_field(buf, pos, tag & 7)
+                if not has_bbox:
+                    bbox.extend((0.0, 0.0, 0.0, 0.0))
+                score.append(obj_score)
+                pred_class.append(obj_class)
+                rle_offsets.append(len(rle_blob))
+            elif tag == _FRAME_NUMBER:
+                frame_number, pos = decode_varint(buf, pos)
+                frame_number = _to_int32(frame_number)
+            else:
+                pos = _skip_field(buf, pos, tag & 7)
+        frame_numbers.append(frame_number)
+        frame_offsets.append(len(score))
+
+    return {
+        "frame_numbers": np.frombuffer(frame_numbers, dtype=np.int32),
+        "frame_offsets": np.frombuffer(frame_offsets, dtype=np.int64),
+        "bbox": np.frombuffer(bbox, dtype=np.float32).reshape(-1, 4),
+        "score": np.frombuffer(score, dtype=np.float32),
+        "pred_class": np.frombuffer(pred_class, dtype=np.int32),
+        "rle_offsets": np.frombuffer(rle_offsets, dtype=np.int64),
+        "rle_blob": np.frombuffer(rle_blob, dtype=np.uint8),
+    }
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Sequence
+
+import numpy as np
+
+from epic_kitchens.masks.rle import MASK_HEIGHT, MASK_WIDTH, decode_rles
+
+__all__ = ["MaskCache"]
+
+
+class MaskCache:
+    """Least-recently-used cache of decoded masks bounded by total array size.
+
+    Cached arrays are made read-only since they're shared between callers.
+    The cache is safe to share between threads.
+
+    Example::
+
+        cache = MaskCache(max_bytes=64 * 2 ** 20)
+        masks = frame_detections.masks(cache=cache)
+        print(cache.hits, cache.misses)
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Caches are per process: a pickled cache (e.g. sent to a worker) is
+        # unpickled empty.
+        return {"max_bytes": self.max_bytes}
+
+    def __setstate__(self, state) -> None:
+        self.__init__(**state)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __repr__(self) -> str:
+        return (
+            f"MaskCache(entries={len(self)}, n_bytes={self.n_bytes}, "
+            f"max_bytes={self.max_bytes}, hits={self.hits}, misses={self.misses})"
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: np.ndarray) -> np.ndarray:
+        if value.nbytes > self.max_bytes:
+            return value
+        value.setflags(write=False)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.n_bytes -= previous.nbytes
+            self._entries[key] = value
+            self.n_bytes += value.nbytes
+            while self.n_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.n_bytes -= evicted.nbytes
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.n_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def masks(
+        self, rles: Sequence[bytes], out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Masks of RLEs as a ``(N, 100, 100)`` array.
+
+        Masks are cached under their RLE, so entries don't depend on which
+        frame (or filtered view of it) they were read from and identical masks
+        share an entry. Those not in the cache are decoded together in one
+        batch.
+        """
+        if out is None:
+            out = np.empty((len(rles), MASK_HEIGHT, MASK_WIDTH), dtype=np.uint8)
+        out = out[: len(rles)]
+        missing = []
+        for mask_idx, rle in enumerate(rles):
+            mask = self.get(rle)
+            if mask is None:
+                missing.append(mask_idx)
+            else:
+                out[mask_idx] = mask
+        if missing:
+            decoded = decode_rles([rles[mask_idx] for mask_idx in missing])
+            for mask_idx, mask in zip(missing, decoded):
+                out[mask_idx] = mask
+                self.put(rles[mask_idx], mask.copy())
+        return out
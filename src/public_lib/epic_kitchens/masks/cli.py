@@ -0,0 +1,333 @@
+"""
+The ``epic-masks`` command line tool.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from epic_kitchens.masks.container import DEFAULT_CHUNK_SIZE, available_codecs
+from epic_kitchens.masks.coverage import analyze_coverage
+from epic_kitchens.masks.migrate import FAILED, MIGRATED, SKIPPED, migrate_detections
+from epic_kitchens.masks.montage import (
+    BY_SCORE,
+    BY_STRIDE,
+    FRAME_TEMPLATE as MONTAGE_FRAME_TEMPLATE,
+    MontageBuilder,
+    build_montages,
+)
+from epic_kitchens.masks.render import FRAME_TEMPLATE, render_video
+from epic_kitchens.masks.visualisation import BACKEND_RASTER, DetectionRenderer
+
+parser = argparse.ArgumentParser(
+    prog="epic-masks",
+    description="Tools for the EPIC-KITCHENS-100 object mask detections",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+)
+subparsers = parser.add_subparsers(dest="command")
+subparsers.required = True
+
+migrate_parser = subparsers.add_parser(
+    "migrate",
+    help="Convert legacy Pxx_yy.pkl detections to the indexed format",
+    description="Convert a tree of legacy Pxx_yy.pkl detections to indexed "
+    "Pxx_yy.dets files, skipping videos that are already migrated",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+)
+migrate_parser.add_argument(
+    "source_root", type=Path, help="Directory containing Pxx/Pxx_yy.pkl detections"
+)
+migrate_parser.add_argument(
+    "output_root",
+    type=Path,
+    nargs="?",
+    help="Directory to write Pxx/Pxx_yy.dets to, defaults to source_root",
+)
+migrate_parser.add_argument(
+    "--replacements",
+    type=Path,
+    help="Directory of corrected pickles (e.g. P01_109.pkl and P27_103.pkl from "
+    "Dropbox) to use instead of those in source_root",
+)
+migrate_parser.add_argument(
+    "--video-ids", nargs="+", help="Videos to migrate, defaults to all found"
+)
+migrate_parser.add_argument(
+    "--compression", choices=available_codecs(), help="Compress outputs with this codec"
+)
+migrate_parser.add_argument(
+    "--chunk-size",
+    type=int,
+    default=DEFAULT_CHUNK_SIZE,
+    help="Number of frames per compressed chunk",
+)
+migrate_parser.add_argument(
+    "-j", "--workers", type=int, default=1, help="Number of videos to migrate in parallel"
+)
+migrate_parser.add_argument(
+    "--no-verify",
+    dest="verify",
+    action="store_false",
+    help="Don't check outputs against their source",
+)
+migrate_parser.add_argument(
+    "--overwrite", action="store_true", help="Migrate videos that are up to date too"
+)
+
+coverage_parser = subparsers.add_parser(
+    "coverage",
+    help="Report missing, duplicate and out of range frames of every video",
+    description="Check which frames of every video have detections against "
+    "EPIC_100_frame_counts.csv and write a JSON summary",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+)
+coverage_parser.add_argument(
+    "detections_root", type=Path, help="Directory containing Pxx/Pxx_yy detections"
+)
+coverage_parser.add_argument(
+    "--frame-counts",
+    type=Path,
+    default=Path("EPIC_100_frame_counts.csv"),
+    help="CSV with the rgb_n_frames of each video",
+)
+coverage_parser.add_argument(
+    "-o", "--output", type=Path, help="Path to write the JSON summary to"
+)
+coverage_parser.add_argument(
+    "--video-ids", nargs="+", help="Videos to check, defaults to all"
+)
+coverage_parser.add_argument(
+    "-j", "--workers", type=int, default=1, help="Number of videos to read in parallel"
+)
+coverage_parser.add_argument(
+    "--report-only",
+    action="store_true",
+    help="Exit with 0 when coverage is incomplete, only failing on errors",
+)
+
+render_parser = subparsers.add_parser(
+    "render",
+    help="Draw detections over every frame of a video",
+    description="Render the detections of a video over its extracted frames to "
+    "numbered images, optionally encoding them to a video with ffmpeg",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+)
+render_parser.add_argument(
+    "frames_dir", type=Path, help="Directory of frames, e.g. frame_0000000001.jpg"
+)
+render_parser.add_argument("detections", type=Path, help="Detections of the video")
+render_parser.add_argument("out_dir", type=Path, help="Directory to write frames to")
+render_parser.add_argument(
+    "--output-template",
+    default=FRAME_TEMPLATE,
+    help="Name of rendered frames, formatted with the frame number",
+)
+render_parser.add_argument(
+    "--score-threshold", type=float, default=0, help="Only draw objects above this"
+)
+render_parser.add_argument(
+    "--no-masks", dest="display_mask", action="store_false", help="Don't fill masks"
+)
+render_parser.add_argument(
+    "--no-boxes", dest="display_bbox", action="store_false", help="Don't draw boxes"
+)
+render_parser.add_argument(
+    "--polygons", type=Path, help="Precomputed outlines of the detections to draw"
+)
+render_parser.add_argument(
+    "--video", type=Path, help="Also encode the frames to this video with ffmpeg"
+)
+render_parser.add_argument("--fps", type=float, default=50, help="Video frame rate")
+render_parser.add_argument("--ffmpeg", default="ffmpeg", help="ffmpeg binary")
+render_parser.add_argument(
+    "-j", "--workers", type=int, default=1, help="Number of rendering processes"
+)
+
+montage_parser = subparsers.add_parser(
+    "montage",
+    help="Draw contact sheets of sampled frames of every video for spot checks",
+    description="Render a grid of thumbnails of sampled frames with their "
+    "detections for every video, one image per video",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+)
+montage_parser.add_argument(
+    "detections_root", type=Path, help="Directory containing Pxx/Pxx_yy detections"
+)
+montage_parser.add_argument("out_dir", type=Path, help="Directory to write sheets to")
+montage_parser.add_argument(
+    "--frames-root",
+    type=Path,
+    help="Directory of extracted frames, thumbnails are left blank without it",
+)
+montage_parser.add_argument(
+    "--frame-template",
+    default=MONTAGE_FRAME_TEMPLATE,
+    help="Path of frames relative to --frames-root",
+)
+montage_parser.add_argument(
+    "--video-ids", nargs="+", help="Videos to render, defaults to all"
+)
+montage_parser.add_argument(
+    "-n", "--n-frames", type=int, default=16, help="Number of frames per video"
+)
+montage_parser.add_argument(
+    "--by",
+    choices=[BY_STRIDE, BY_SCORE],
+    default=BY_STRIDE,
+    help="Spread frames evenly over the video or pick the highest scoring ones",
+)
+montage_parser.add_argument(
+    "--score-threshold",
+    type=float,
+    help="Only sample frames with an object scoring above this (and only draw "
+    "those objects)",
+)
+montage_parser.add_argument(
+    "--classes", nargs="+", help="Only sample frames with objects of these classes"
+)
+montage_parser.add_argument("--columns", type=int, default=4, help="Tiles per row")
+montage_parser.add_argument("--tile-height", type=int, default=135)
+montage_parser.add_argument("--tile-width", type=int, default=240)
+montage_parser.add_argument(
+    "-j", "--workers", type=int, default=1, help="Number of videos to render in parallel"
+)
+
+
+def migrate(args) -> int:
+    start = time.perf_counter()
+    counts = {MIGRATED: 0, SKIPPED: 0, FAILED: 0}
+    for result in migrate_detections(
+        args.source_root,
+        args.output_root or args.source_root,
+        video_ids=args.video_ids,
+        replacements_root=args.replacements,
+        compression=args.compression,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        verify=args.verify,
+        overwrite=args.overwrite,
+    ):
+        counts[result.status] += 1
+        if result.status == FAILED:
+            print(f"{result.video_id}: failed: {result.error}", file=sys.stderr)
+        elif result.status == MIGRATED:
+            print(f"{result.video_id}: {result.n_frames} frames -> {result.output}")
+    print(
+        f"Migrated {counts[MIGRATED]}, skipped {counts[SKIPPED]} up to date and "
+        f"failed {counts[FAILED]} videos in {time.perf_counter() - start:.1f}s"
+    )
+    return 1 if counts[FAILED] else 0
+
+
+def coverage(args) -> int:
+    summary = analyze_coverage(
+        args.detections_root,
+        args.frame_counts,
+        video_ids=args.video_ids,
+        workers=args.workers,
+    )
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+    for video_id, video in summary["videos"].items():
+        problems = []
+        if video["n_missing"]:
+            problems.append(
+                f"{video['n_missing']} missing frames in "
+                f"{len(video['missing_ranges'])} ranges"
+            )
+        if video["duplicates"]:
+            problems.append(f"{len(video['duplicates'])} duplicated frames")
+        if video["out_of_range"]:
+            problems.append(f"{len(video['out_of_range'])} out of range frames")
+        if problems:
+            print(f"{video_id}: {', '.join(problems)}")
+    for video_id in summary["missing_videos"]:
+        print(f"{video_id}: no detections")
+    for video_id in summary["unknown_videos"]:
+        print(f"{video_id}: not in {args.frame_counts}")
+    totals = summary["totals"]
+    print(
+        f"{totals['n_incomplete_videos']} of {totals['n_videos']} videos incomplete, "
+        f"{totals['n_missing']} of {totals['n_frames']} frames missing"
+    )
+    incomplete = (
+        totals["n_incomplete_videos"]
+        or summary["missing_videos"]
+        or summary["unknown_videos"]
+    )
+    return 1 if incomplete and not args.report_only else 0
+
+
+def render(args) -> int:
+    start = time.perf_counter()
+    renderer = DetectionRenderer(
+        display_mask=args.display_mask,
+        display_bbox=args.display_bbox,
+        score_threshold=args.score_threshold,
+        backend=BACKEND_RASTER,
+    )
+    n_frames = render_video(
+        args.frames_dir,
+        args.detections,
+        args.out_dir,
+        workers=args.workers,
+        renderer=renderer,
+        output_template=args.output_template,
+        video_path=args.video,
+        fps=args.fps,
+        ffmpeg=args.ffmpeg,
+        polygons=args.polygons,
+    )
+    print(
+        f"Rendered {n_frames} frames to {args.out_dir} in "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+    return 0
+
+
+def montage(args) -> int:
+    start = time.perf_counter()
+    builder = MontageBuilder(
+        tile_height=args.tile_height,
+        tile_width=args.tile_width,
+        columns=args.columns,
+        renderer=DetectionRenderer(score_threshold=args.score_threshold or 0),
+        frames_root=args.frames_root,
+        frame_template=args.frame_template,
+    )
+    n_videos = 0
+    for output in build_montages(
+        args.detections_root,
+        args.out_dir,
+        video_ids=args.video_ids,
+        builder=builder,
+        n_frames=args.n_frames,
+        by=args.by,
+        score_threshold=args.score_threshold,
+        classes=args.classes,
+        workers=args.workers,
+    ):
+        n_videos += 1
+        print(output)
+    print(f"Rendered {n_videos} videos in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parser.parse_args(argv)
+    if args.command == "migrate":
+        return migrate(args)
+    if args.command == "coverage":
+        return coverage(args)
+    if args.command == "render":
+        return render(args)
+    if args.command == "montage":
+        return montage(args)
+    raise ValueError(f"Unknown command {args.command!r}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
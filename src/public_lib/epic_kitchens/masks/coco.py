@@ -81,3 +81,8 @@ class_names = [
     "hair drier",
     "toothbrush",
 ]
+
+
+def to_class_ids(classes):
+    """Convert an iterable of class ids and/or class names to class ids."""
+    return [class_names.index(cls) if isinstance(cls, str) else cls for cls in classes]
@@ -0,0 +1,172 @@
+"""
+Memory-mappable column files.
+
+A column file holds a handful of named NumPy arrays laid out back to back so
+each one can be opened with :class:`numpy.memmap` without copying::
+
+    magic (8 bytes) | header length (u8) | JSON header | padding | columns...
+
+The JSON header stores free-form ``attrs`` and the dtype, shape and byte
+offset of every column. Columns are aligned to 64 bytes. Processes that open
+the same file share a single copy of it in the page cache.
+"""
+import json
+import shutil
+import struct
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from epic_kitchens.masks.types import VideoDetections
+
+__all__ = [
+    "ColumnWriter",
+    "load_video_detections",
+    "read_columns",
+    "save_video_detections",
+]
+
+MAGIC = b"EPICCOL\x00"
+_PREAMBLE = struct.Struct("<8sQ")
+_ALIGNMENT = 64
+
+VIDEO_COLUMNS = [
+    "frame_numbers",
+    "frame_offsets",
+    "bbox",
+    "score",
+    "pred_class",
+    "rle_offsets",
+    "rle_blob",
+]
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+class ColumnWriter:
+    """Write a column file, appending rows to each column incrementally.
+
+    Rows are spooled to temporary files next to the destination, and the
+    final file is assembled on :meth:`close`.
+    """
+
+    def __init__(self, filepath: Union[Path, str], attrs: Optional[Dict[str, Any]] = None):
+        self.filepath = Path(filepath)
+        self.filepath.parent.mkdir(exist_ok=True, parents=True)
+        self.attrs = dict(attrs or {})
+        self._tmpdir = tempfile.TemporaryDirectory(
+            dir=str(self.filepath.parent), prefix=".columns-"
+        )
+        self._columns: Dict[str, Tuple[np.dtype, Tuple[int, ...]]] = {}
+        self._n_rows: Dict[str, int] = {}
+
+    def __enter__(self) -> "ColumnWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._tmpdir.cleanup()
+
+    def _spool_path(self, name: str) -> Path:
+        return Path(self._tmpdir.name) / name
+
+    def append(self, **columns: np.ndarray) -> None:
+        for name, values in columns.items():
+            values = np.asarray(values)
+            if name not in self._columns:
+                self._columns[name] = (values.dtype, values.shape[1:])
+                self._n_rows[name] = 0
+            dtype, row_shape = self._columns[name]
+            if values.shape[1:] != row_shape:
+                raise ValueError(
+                    f"Expected rows of column {name} to have shape {row_shape} "
+                    f"but got {values.shape[1:]}"
+                )
+            with open(self._spool_path(name), "ab") as f:
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+            self._n_rows[name] += len(values)
+
+    def close(self) -> None:
+        header = {"attrs": self.attrs, "columns": {}}
+        # The header length depends on the offsets it contains, so reserve
+        # enough room for it by sizing it with placeholder offsets first.
+        placeholder = {
+            name: {
+                "dtype": dtype.str,
+                "shape": [self._n_rows[name], *row_shape],
+                "offset": 2 ** 63,
+            }
+            for name, (dtype, row_shape) in self._columns.items()
+        }
+        offset = _align(
+            _PREAMBLE.size
+            + len(json.dumps({"attrs": self.attrs, "columns": placeholder}).encode())
+        )
+        for name, (dtype, row_shape) in self._columns.items():
+            header["columns"][name] = {
+                "dtype": dtype.str,
+                "shape": [self._n_rows[name], *row_shape],
+                "offset": offset,
+            }
+            offset = _align(offset + self._spool_path(name).stat().st_size)
+        header_bytes = json.dumps(header).encode()
+
+        with open(self.filepath, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, len(header_bytes)))
+            f.write(header_bytes)
+            for name, column in header["columns"].items():
+                f.write(b"\0" * (column["offset"] - f.tell()))
+                with open(self._spool_path(name), "rb") as spool:
+                    shutil.copyfileobj(spool, f)
+        self._tmpdir.cleanup()
+
+
+def read_columns(
+    filepath: Union[Path, str], mmap: bool = True
+) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Read a column file, returning its attrs and columns.
+
+    With ``mmap=True`` the columns are read-only :class:`numpy.memmap` views of
+    the file, otherwise they are read into memory.
+    """
+    filepath = Path(filepath)
+    with open(filepath, "rb") as f:
+        magic, header_length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{filepath} is not a column file (bad magic)")
+        header = json.loads(f.read(header_length).decode())
+        columns = {}
+        for name, column in header["columns"].items():
+            dtype = np.dtype(column["dtype"])
+            shape = tuple(column["shape"])
+            count = int(np.prod(shape))
+            if count == 0:
+                columns[name] = np.empty(shape, dtype=dtype)
+            elif mmap:
+                columns[name] = np.memmap(
+                    filepath, dtype=dtype, mode="r", offset=column["offset"], shape=shape
+                )
+            else:
+                f.seek(column["offset"])
+                columns[name] = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+    return header["attrs"], columns
+
+
+def save_video_detections(filepath: Union[Path, str], video: VideoDetections) -> None:
+    with ColumnWriter(filepath, attrs={"video_id": video.video_id}) as writer:
+        writer.append(**{name: getattr(video, name) for name in VIDEO_COLUMNS})
+
+
+def load_video_detections(
+    filepath: Union[Path, str], mmap: bool = True
+) -> VideoDetections:
+    attrs, columns = read_columns(filepath, mmap=mmap)
+    return VideoDetections(
+        video_id=attrs["video_id"], **{name: columns[name] for name in VIDEO_COLUMNS}
+    )
@@ -0,0 +1,449 @@
+"""
+Indexed container format for per-video detections.
+
+Layout (all integers little-endian)::
+
+    header   magic (8 bytes) | version (u16) | codec (u16) | chunk size (u32)
+    records  varint(len(frame)) | serialized pb.FrameObjectDetections, per frame
+    index    (frame_number i4, offset u8, length u4) per frame, in record order
+    chunks   (offset u8, length u8) per chunk, compressed files only
+    metadata UTF-8 JSON object, optional
+    footer   index offset (u8) | number of frames (u8) | magic (8 bytes)
+
+The index points at the payload of each record, so a single frame can be read
+and parsed without touching the rest of the file. The varint length prefixes
+make the record section self-delimiting so it can also be read sequentially.
+
+Compressed files (version 2) group the records of every ``chunk size``
+consecutive frames into an independently compressed chunk, and index offsets
+are relative to the start of the decompressed chunk. Reading a frame only
+decompresses its chunk, so the chunk size trades file size against
+random-access latency.
+
+The optional metadata (e.g. where a file was migrated from) sits between the
+tables and the footer, where readers that don't know about it never look.
+"""
+import json
+import os
+import struct
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from epic_kitchens.masks._wire import decode_varint
+from epic_kitchens.masks.types import FrameObjectDetections, LazyFrameObjectDetections
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+__all__ = [
+    "DEFAULT_CHUNK_SIZE",
+    "DetectionReader",
+    "IndexedRecordWriter",
+    "available_codecs",
+    "is_indexed_detections_file",
+    "iter_records",
+]
+
+MAGIC = b"EPICDET\x00"
+VERSION = 1
+COMPRESSED_VERSION = 2
+DEFAULT_CHUNK_SIZE = 64
+
+_HEADER = struct.Struct("<8sHHI")
+_FOOTER = struct.Struct("<QQ8s")
+INDEX_DTYPE = np.dtype([("frame_number", "<i4"), ("offset", "<u8"), ("length", "<u4")])
+CHUNK_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u8")])
+
+_CODEC_IDS = {"zlib": 1, "zstd": 2, "lz4": 3}
+_CODEC_NAMES = {codec_id: name for name, codec_id in _CODEC_IDS.items()}
+_CODEC_PACKAGES = {"zstd": "zstandard", "lz4": "lz4"}
+
+
+def available_codecs() -> List[str]:
+    """Compression codecs usable in this environment.
+
+    zlib is always available; zstd and lz4 need the ``zstandard`` and ``lz4``
+    packages (``pip install epic-masks[compression]``).
+    """
+    codecs = ["zlib"]
+    if zstandard is not None:
+        codecs.append("zstd")
+    if lz4 is not None:
+        codecs.append("lz4")
+    return codecs
+
+
+def _check_codec(codec: str) -> None:
+    if codec not in _CODEC_IDS:
+        raise ValueError(
+            f"Unknown compression codec {codec!r}, expected one of {list(_CODEC_IDS)}"
+        )
+    if codec not in available_codecs():
+        raise ImportError(
+            f"{codec} compression needs the {_CODEC_PACKAGES[codec]} package"
+        )
+
+
+def _compressor(codec: str) -> Callable[[bytes], bytes]:
+    _check_codec(codec)
+    if codec == "zstd":
+        return zstandard.ZstdCompressor().compress
+    if codec == "lz4":
+        return lz4.frame.compress
+    return zlib.compress
+
+
+def _decompressor(codec: str) -> Callable[[bytes], bytes]:
+    _check_codec(codec)
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress
+    if codec == "lz4":
+        return lz4.frame.decompress
+    return zlib.decompress
+
+
+def is_indexed_detections_file(filepath: Union[Path, str]) -> bool:
+    with open(filepath, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+class IndexedRecordWriter:
+    """Write serialized frames to an indexed detections file one at a time.
+
+    The index is accumulated in compact arrays and written with the footer on
+    :meth:`close`. If ``compression`` names a codec (see
+    :func:`available_codecs`) records are compressed in chunks of
+    ``chunk_size`` frames. ``metadata`` is stored as JSON and read back by
+    :attr:`DetectionReader.metadata`.
+    """
+
+    def __init__(
+        self,
+        f: BinaryIO,
+        compression: Optional[str] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        if chunk_size < 1:
+            raise ValueError(f"Expected chunk_size to be positive but was {chunk_size}")
+        self._compress = None if compression is None else _compressor(compression)
+        self._file = f
+        if compression is None:
+            self._file.write(_HEADER.pack(MAGIC, VERSION, 0, 0))
+        else:
+            self._file.write(
+                _HEADER.pack(
+                    MAGIC, COMPRESSED_VERSION, _CODEC_IDS[compression], chunk_size
+                )
+            )
+        self._chunk_size = chunk_size
+        self._metadata = metadata
+        self._offset = _HEADER.size
+        self._chunk = bytearray()
+        self._chunk_offsets = array("Q")
+        self._chunk_lengths = array("Q")
+        self._frame_numbers = array("i")
+        self._offsets = array("Q")
+        self._lengths = array("I")
+
+    def __len__(self) -> int:
+        return len(self._frame_numbers)
+
+    def write(self, frame_number: int, pb_str: bytes) -> None:
+        prefix = encode_varint(len(pb_str))
+        self._frame_numbers.append(frame_number)
+        self._lengths.append(len(pb_str))
+        if self._compress is None:
+            self._file.write(prefix)
+            self._file.write(pb_str)
+            self._offsets.append(self._offset + len(prefix))
+            self._offset += len(prefix) + len(pb_str)
+            return
+        self._offsets.append(len(self._chunk) + len(prefix))
+        self._chunk += prefix
+        self._chunk += pb_str
+        if len(self) % self._chunk_size == 0:
+            self._flush_chunk()
+
+    def _flush_chunk(self) -> None:
+        if not self._chunk:
+            return
+        compressed = self._compress(bytes(self._chunk))
+        self._file.write(compressed)
+        self._chunk_offsets.append(self._offset)
+        self._chunk_lengths.append(len(compressed))
+        self._offset += len(compressed)
+        self._chunk = bytearray()
+
+    def close(self) -> None:
+        if self._compress is not None:
+            self._flush_chunk()
+        index = np.empty(len(self), dtype=INDEX_DTYPE)
+        index["frame_number"] = self._frame_numbers
+        index["offset"] = self._offsets
+        index["length"] = self._lengths
+        self._file.write(index.tobytes())
+        if self._compress is not None:
+            chunks = np.empty(len(self._chunk_offsets), dtype=CHUNK_DTYPE)
+            chunks["offset"] = self._chunk_offsets
+            chunks["length"] = self._chunk_lengths
+            self._file.write(chunks.tobytes())
+        if self._metadata:
+            self._file.write(json.dumps(self._metadata, sort_keys=True).encode())
+        self._file.write(_FOOTER.pack(self._offset, len(index), MAGIC))
+
+
+def _pread(f: BinaryIO, length: int, offset: int) -> bytes:
+    # pread doesn't move the shared file position, so readers stay usable after
+    # a fork (e.g. in data loader worker processes).
+    if hasattr(os, "pread"):
+        return os.pread(f.fileno(), length, offset)
+    f.seek(offset)
+    return f.read(length)
+
+
+class _Layout(NamedTuple):
+    index_offset: int
+    n_frames: int
+    codec: Optional[str]
+    chunk_size: int
+
+    @property
+    def n_chunks(self) -> int:
+        if self.codec is None:
+            return 0
+        return -(-self.n_frames // self.chunk_size)
+
+    @property
+    def tables_end(self) -> int:
+        return (
+            self.index_offset
+            + self.n_frames * INDEX_DTYPE.itemsize
+            + self.n_chunks * CHUNK_DTYPE.itemsize
+        )
+
+
+def _read_layout(f: BinaryIO) -> _Layout:
+    magic, version, codec_id, chunk_size = _HEADER.unpack(_pread(f, _HEADER.size, 0))
+    if magic != MAGIC:
+        raise ValueError("Not an indexed detections file (bad header magic)")
+    if version not in (VERSION, COMPRESSED_VERSION):
+        raise ValueError(f"Unsupported indexed detections version {version}")
+    if version == COMPRESSED_VERSION and codec_id not in _CODEC_NAMES:
+        raise ValueError(f"Unsupported indexed detections codec {codec_id}")
+    file_size = os.fstat(f.fileno()).st_size
+    index_offset, n_frames, magic = _FOOTER.unpack(
+        _pread(f, _FOOTER.size, file_size - _FOOTER.size)
+    )
+    if magic != MAGIC:
+        raise ValueError("Indexed detections file is truncated (bad footer magic)")
+    if version == VERSION:
+        return _Layout(index_offset, n_frames, None, 0)
+    return _Layout(index_offset, n_frames, _CODEC_NAMES[codec_id], chunk_size)
+
+
+def _read_index(f: BinaryIO, layout: _Layout) -> np.ndarray:
+    index_bytes = _pread(f, layout.n_frames * INDEX_DTYPE.itemsize, layout.index_offset)
+    return np.frombuffer(index_bytes, dtype=INDEX_DTYPE)
+
+
+def _read_chunk_table(f: BinaryIO, layout: _Layout) -> np.ndarray:
+    chunks_offset = layout.index_offset + layout.n_frames * INDEX_DTYPE.itemsize
+    chunks_bytes = _pread(f, layout.n_chunks * CHUNK_DTYPE.itemsize, chunks_offset)
+    return np.frombuffer(chunks_bytes, dtype=CHUNK_DTYPE)
+
+
+def _read_metadata(f: BinaryIO, layout: _Layout) -> Dict[str, Any]:
+    length = os.fstat(f.fileno()).st_size - _FOOTER.size - layout.tables_end
+    if length <= 0:
+        return {}
+    return json.loads(_pread(f, length, layout.tables_end).decode())
+
+
+def read_index(f: BinaryIO) -> np.ndarray:
+    return _read_index(f, _read_layout(f))
+
+
+def _read_varint(f: BinaryIO) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    n_bytes = 0
+    while True:
+        byte = f.read(1)
+        if not byte:
+            raise EOFError("Unexpected end of file while reading record length")
+        n_bytes += 1
+        value |= (byte[0] & 0x7F) << shift
+        if not byte[0] & 0x80:
+            return value, n_bytes
+        shift += 7
+
+
+def iter_records(f: BinaryIO) -> Iterator[bytes]:
+    """Read the serialized frames of an indexed detections file sequentially.
+
+    Only one record (or, for compressed files, one chunk) is held in memory at
+    a time and the index isn't loaded.
+    """
+    layout = _read_layout(f)
+    if layout.codec is not None:
+        decompress = _decompressor(layout.codec)
+        for offset, length in _read_chunk_table(f, layout).tolist():
+            chunk = decompress(_pread(f, length, offset))
+            position = 0
+            while position < len(chunk):
+                length, position = decode_varint(chunk, position)
+                yield chunk[position : position + length]
+                position += length
+        return
+
+    f.seek(_HEADER.size)
+    position = _HEADER.size
+    while position < layout.index_offset:
+        length, n_bytes = _read_varint(f)
+        pb_str = f.read(length)
+        if len(pb_str) != length:
+            raise EOFError("Unexpected end of file while reading record")
+        position += n_bytes + length
+        yield pb_str
+
+
+class DetectionReader:
+    """Random access reader for an indexed detections file.
+
+    Only the index is loaded on opening; frames are read and parsed on request.
+    With ``lazy=True`` frames are returned as :class:`LazyFrameObjectDetections`.
+    For compressed files the last decompressed chunk is kept, so reading frames
+    in file order decompresses each chunk once.
+    """
+
+    def __init__(self, filepath: Union[Path, str], lazy: bool = False):
+        self.filepath = Path(filepath)
+        self.video_id = self.filepath.stem
+        self._frame_cls = LazyFrameObjectDetections if lazy else FrameObjectDetections
+        self._file = open(self.filepath, "rb")
+        try:
+            self._layout = _read_layout(self._file)
+            self._index = _read_index(self._file, self._layout)
+            self._chunks = _read_chunk_table(self._file, self._layout)
+            if self._layout.codec is not None:
+                self._decompress = _decompressor(self._layout.codec)
+        except Exception:
+            self._file.close()
+            raise
+        self._cached_chunk: Tuple[int, bytes] = (-1, b"")
+        self._order = np.argsort(self._index["frame_number"], kind="stable")
+        self._sorted_frame_numbers = self._index["frame_number"][self._order]
+
+    def __enter__(self) -> "DetectionReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, frame_number: int) -> bool:
+        return self._find(frame_number) is not None
+
+    @property
+    def compression(self) -> Optional[str]:
+        return self._layout.codec
+
+    @property
+    def chunk_size(self) -> Optional[int]:
+        """Frames per compressed chunk, ``None`` for uncompressed files."""
+        return None if self._layout.codec is None else self._layout.chunk_size
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata stored by the writer, empty if there was none."""
+        return _read_metadata(self._file, self._layout)
+
+    @property
+    def frame_numbers(self) -> np.ndarray:
+        """Frame numbers in the order they are stored in the file."""
+        return self._index["frame_number"]
+
+    def _find(self, frame_number: int):
+        i = np.searchsorted(self._sorted_frame_numbers, frame_number)
+        if i < len(self._sorted_frame_numbers) and (
+            self._sorted_frame_numbers[i] == frame_number
+        ):
+            return self._order[i]
+        return None
+
+    def _read_chunk(self, chunk_idx: int) -> bytes:
+        cached_idx, chunk = self._cached_chunk
+        if cached_idx != chunk_idx:
+            offset, length = self._chunks[chunk_idx].tolist()
+            chunk = self._decompress(_pread(self._file, length, offset))
+            self._cached_chunk = (chunk_idx, chunk)
+        return chunk
+
+    def _read_record(self, position: int) -> bytes:
+        entry = self._index[position]
+        offset, length = int(entry["offset"]), int(entry["length"])
+        if self._layout.codec is None:
+            return _pread(self._file, length, offset)
+        chunk = self._read_chunk(position // self._layout.chunk_size)
+        return chunk[offset : offset + length]
+
+    def get_frame_bytes(self, frame_number: int) -> bytes:
+        position = self._find(frame_number)
+        if position is None:
+            raise KeyError(f"Frame {frame_number} not in {self.filepath}")
+        return self._read_record(position)
+
+    def get_frame(self, frame_number: int) -> FrameObjectDetections:
+        return self._frame_cls.from_protobuf_str(
+            self.video_id, self.get_frame_bytes(frame_number)
+        )
+
+    def get_frames(self, frame_numbers: Iterable[int]) -> List[FrameObjectDetections]:
+        positions = []
+        for frame_number in frame_numbers:
+            position = self._find(frame_number)
+            if position is None:
+                raise KeyError(f"Frame {frame_number} not in {self.filepath}")
+            positions.append(position)
+        # Read in file order to keep disk access sequential (and decompress
+        # each chunk once).
+        records = {
+            position: self._read_record(position) for position in sorted(set(positions))
+        }
+        return [
+            self._frame_cls.from_protobuf_str(self.video_id, records[position])
+            for position in positions
+        ]
+
+    def __iter__(self) -> Iterator[FrameObjectDetections]:
+        for position in range(len(self)):
+            yield self._frame_cls.from_protobuf_str(
+                self.video_id, self._read_record(position)
+            )
@@ -0,0 +1,170 @@
+"""
+Checking which frames of each video have detections, against the frame counts
+of the dataset (``EPIC_100_frame_counts.csv``).
+"""
+import csv
+from dataclasses import asdict, dataclass, field
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from epic_kitchens.masks._wire import decode_frame_number
+from epic_kitchens.masks.container import DetectionReader, is_indexed_detections_file
+from epic_kitchens.masks.dataset import find_detection_files
+from epic_kitchens.masks.io import iter_serialized_detections
+
+__all__ = [
+    "FrameCoverage",
+    "analyze_coverage",
+    "frame_coverage",
+    "read_frame_counts",
+    "read_frame_numbers",
+]
+
+
+def read_frame_counts(filepath: Union[Path, str]) -> Dict[str, int]:
+    """Number of RGB frames of each video from ``EPIC_100_frame_counts.csv``."""
+    with open(filepath, newline="") as f:
+        return {row["video_id"]: int(row["rgb_n_frames"]) for row in csv.DictReader(f)}
+
+
+def read_frame_numbers(filepath: Union[Path, str]) -> np.ndarray:
+    """Frame numbers of a detections file in stored order, without parsing
+    objects (indexed files only need their index read).
+    """
+    if is_indexed_detections_file(filepath):
+        with DetectionReader(filepath) as reader:
+            return reader.frame_numbers.copy()
+    return np.fromiter(
+        map(decode_frame_number, iter_serialized_detections(filepath)), dtype=np.int64
+    )
+
+
+@dataclass
+class FrameCoverage:
+    """Which of frames ``1..n_frames`` of a video have detections.
+
+    ``missing_ranges`` are inclusive ``(first, last)`` frame numbers,
+    ``duplicates`` maps frame numbers stored more than once to their count and
+    ``out_of_range`` lists frame numbers outside ``1..n_frames``.
+    """
+
+    video_id: str
+    n_frames: int
+    n_present: int
+    missing_ranges: List[Tuple[int, int]] = field(default_factory=list)
+    duplicates: Dict[int, int] = field(default_factory=dict)
+    out_of_range: List[int] = field(default_factory=list)
+
+    @property
+    def n_missing(self) -> int:
+        return self.n_frames - self.n_present
+
+    @property
+    def complete(self) -> bool:
+        return not (self.missing_ranges or self.duplicates or self.out_of_range)
+
+    def to_dict(self) -> Dict[str, Any]:
+        summary = asdict(self)
+        summary["n_missing"] = self.n_missing
+        summary["missing_ranges"] = [list(r) for r in self.missing_ranges]
+        # JSON object keys have to be strings.
+        summary["duplicates"] = {str(k): v for k, v in self.duplicates.items()}
+        return summary
+
+
+def frame_coverage(
+    video_id: str, frame_numbers: np.ndarray, n_frames: int
+) -> FrameCoverage:
+    frame_numbers = np.asarray(frame_numbers, dtype=np.int64)
+    in_range = (1 <= frame_numbers) & (frame_numbers <= n_frames)
+    unique_frame_numbers, counts = np.unique(frame_numbers, return_counts=True)
+    duplicated = counts > 1
+
+    present = np.zeros(n_frames + 2, dtype=bool)
+    present[frame_numbers[in_range]] = True
+    present[0] = present[-1] = True
+    # Frames where a run of missing frames starts or ends.
+    changes = np.flatnonzero(np.diff(present.view(np.int8)))
+    missing_ranges = [
+        (int(start), int(stop - 1))
+        for start, stop in zip(changes[::2] + 1, changes[1::2] + 1)
+    ]
+    return FrameCoverage(
+        video_id=video_id,
+        n_frames=n_frames,
+        n_present=int(present[1:-1].sum()),
+        missing_ranges=missing_ranges,
+        duplicates=dict(
+            zip(unique_frame_numbers[duplicated].tolist(), counts[duplicated].tolist())
+        ),
+        out_of_range=np.unique(frame_numbers[~in_range]).tolist(),
+    )
+
+
+def _video_coverage(job: Tuple[str, Path, int]) -> FrameCoverage:
+    video_id, filepath, n_frames = job
+    return frame_coverage(video_id, read_frame_numbers(filepath), n_frames)
+
+
+def analyze_coverage(
+    root: Union[Path, str],
+    frame_counts: Union[Path, str, Dict[str, int]],
+    video_ids: Optional[Iterable[str]] = None,
+    workers: int = 1,
+) -> Dict[str, Any]:
+    """Check the frame coverage of every video under ``root``.
+
+    Args:
+        root: Directory to search for detection files, see
+            :func:`epic_kitchens.masks.dataset.find_detection_files`.
+        frame_counts: Frame count of each video or the path of a CSV to read
+            them from, see :func:`read_frame_counts`.
+        video_ids: Videos to check, defaults to all in ``frame_counts`` or
+            under ``root``.
+        workers: Number of videos to read in parallel.
+
+    Returns:
+        A JSON serializable summary with the :class:`FrameCoverage` of each
+        video (``videos``), videos without a detections file
+        (``missing_videos``), detection files of unknown videos
+        (``unknown_videos``) and dataset ``totals``.
+    """
+    if not isinstance(frame_counts, dict):
+        frame_counts = read_frame_counts(frame_counts)
+    files = find_detection_files(root)
+    if video_ids is None:
+        video_ids = frame_counts.keys() | files.keys()
+    video_ids = sorted(set(video_ids))
+    jobs = [
+        (video_id, files[video_id], frame_counts[video_id])
+        for video_id in video_ids
+        if video_id in files and video_id in frame_counts
+    ]
+    if workers <= 1:
+        coverages = list(map(_video_coverage, jobs))
+    else:
+        with Pool(workers) as pool:
+            coverages = pool.map(_video_coverage, jobs)
+
+    return {
+        "videos": {coverage.video_id: coverage.to_dict() for coverage in coverages},
+        "missing_videos": [
+            video_id for video_id in video_ids if video_id not in files
+        ],
+        "unknown_videos": [
+            video_id
+            for video_id in video_ids
+            if video_id in files and video_id not in frame_counts
+        ],
+        "totals": {
+            "n_videos": len(coverages),
+            "n_incomplete_videos": sum(not c.complete for c in coverages),
+            "n_frames": sum(c.n_frames for c in coverages),
+            "n_missing": sum(c.n_missing for c in coverages),
+            "n_duplicates": sum(len(c.duplicates) for c in coverages),
+            "n_out_of_range": sum(len(c.out_of_range) for c in coverages),
+        },
+    }
@@ -0,0 +1,243 @@
+"""
+Working with the detections of many videos at once, e.g. a data root laid out
+like the release::
+
+    data/processed/P01/P01_01.pkl
+    data/processed/P01/P01_02.pkl
+    ...
+"""
+import re
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from epic_kitchens.masks.coco import to_class_ids
+from epic_kitchens.masks.columnar import ColumnWriter, read_columns
+from epic_kitchens.masks.io import (
+    INDEXED_SUFFIX,
+    PICKLE_SUFFIX,
+    iter_serialized_detections,
+)
+from epic_kitchens.masks.types import VideoDetections
+
+__all__ = [
+    "MetadataIndex",
+    "build_metadata_index",
+    "find_detection_files",
+    "load_dataset",
+]
+
+_VIDEO_ID_RE = re.compile(r"P\d+_\d+$")
+
+
+def find_detection_files(
+    root: Union[Path, str],
+    video_ids: Optional[Iterable[str]] = None,
+    suffixes: Sequence[str] = (PICKLE_SUFFIX, INDEXED_SUFFIX),
+) -> Dict[str, Path]:
+    """Find the detection files of each video under ``root``.
+
+    Files are matched by name (``Pxx_yy.pkl`` or ``Pxx_yy.dets``) at any
+    depth. If a video has files with several of ``suffixes``, the last suffix
+    wins, so by default the indexed file is used.
+
+    Returns:
+        A mapping from video id to detections file, sorted by video id.
+    """
+    files: Dict[str, Path] = {}
+    for suffix in suffixes:
+        for path in Path(root).rglob("P*_*" + suffix):
+            if _VIDEO_ID_RE.match(path.stem):
+                files[path.stem] = path
+    if video_ids is not None:
+        video_ids = set(video_ids)
+        missing = video_ids - files.keys()
+        if missing:
+            raise FileNotFoundError(
+                f"No detections found under {root} for {sorted(missing)}"
+            )
+        files = {video_id: files[video_id] for video_id in video_ids}
+    return dict(sorted(files.items()))
+
+
+def _load_video(video_file: Tuple[str, Path]) -> VideoDetections:
+    video_id, filepath = video_file
+    return VideoDetections.from_protobuf_strs(
+        video_id, iter_serialized_detections(filepath)
+    )
+
+
+def load_dataset(
+    root: Union[Path, str],
+    video_ids: Optional[Iterable[str]] = None,
+    workers: int = 1,
+    ordered: bool = True,
+) -> Iterator[VideoDetections]:
+    """Load the detections of many videos, spreading videos over processes.
+
+    Each worker parses a whole video and sends it back as a compact
+    :class:`VideoDetections` (a handful of NumPy arrays) rather than a graph of
+    dataclasses, so returning results is cheap.
+
+    Args:
+        root: Directory to search for detection files, see
+            :func:`find_detection_files`.
+        video_ids: Videos to load, defaults to all found under ``root``.
+        workers: Number of worker processes. With ``workers=1`` videos are
+            loaded in the calling process.
+        ordered: Yield videos sorted by video id if ``True``, otherwise in the
+            order they finish loading.
+    """
+    video_files = list(find_detection_files(root, video_ids).items())
+    if workers <= 1:
+        yield from map(_load_video, video_files)
+        return
+    with Pool(workers) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        yield from imap(_load_video, video_files)
+
+
+def _read_video_metadata(filepath: Path) -> Dict[str, np.ndarray]:
+    video = VideoDetections.from_protobuf_strs(
+        filepath.stem, iter_serialized_detections(filepath)
+    )
+    return {
+        "frames_frame_number": video.frame_numbers,
+        "frames_n_objects": video.n_objects_per_frame.astype(np.int32),
+        "frame_number": video.object_frame_numbers,
+        "score": video.score,
+        "pred_class": video.pred_class.astype(np.int16),
+        "bbox": video.bbox,
+    }
+
+
+def build_metadata_index(
+    root: Union[Path, str],
+    output: Union[Path, str],
+    video_ids: Optional[Iterable[str]] = None,
+    workers: int = 1,
+) -> None:
+    """Build a :class:`MetadataIndex` over all detection files under ``root``.
+
+    Videos are read in parallel by ``workers`` processes; masks aren't decoded
+    and only one video is held in memory per worker at a time.
+    """
+    files = find_detection_files(root, video_ids)
+    video_ids = list(files.keys())
+    with ColumnWriter(output, attrs={"video_ids": video_ids}) as writer:
+        with Pool(workers) as pool:
+            for video_idx, columns in enumerate(
+                pool.imap(_read_video_metadata, files.values())
+            ):
+                writer.append(
+                    video_idx=np.full(len(columns["score"]), video_idx, np.int16),
+                    frames_video_idx=np.full(
+                        len(columns["frames_frame_number"]), video_idx, np.int16
+                    ),
+                    **columns,
+                )
+
+
+class MetadataIndex:
+    """Object metadata (no masks) of a whole dataset, see :func:`build_metadata_index`.
+
+    Per-object columns are ``video_idx``, ``frame_number``, ``pred_class``,
+    ``score`` and ``bbox``; per-frame columns are ``frames_video_idx``,
+    ``frames_frame_number`` and ``frames_n_objects``. ``video_idx`` indexes
+    into ``video_ids``.
+
+    Example::
+
+        index = MetadataIndex("data/processed/metadata_index.cols")
+        frames = index.frames(participants=["P01", "P02"], classes=["knife"], min_score=0.8)
+    """
+
+    def __init__(self, filepath: Union[Path, str], mmap: bool = True):
+        attrs, self.columns = read_columns(filepath, mmap=mmap)
+        self.video_ids: List[str] = attrs["video_ids"]
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __len__(self) -> int:
+        return len(self.columns["score"])
+
+    def _video_selection(
+        self,
+        video_idx: np.ndarray,
+        video_ids: Optional[Iterable[str]],
+        participants: Optional[Iterable[str]],
+    ) -> np.ndarray:
+        selected = np.ones(len(self.video_ids), dtype=bool)
+        if video_ids is not None:
+            selected &= np.isin(self.video_ids, list(video_ids))
+        if participants is not None:
+            participants = set(participants)
+            selected &= np.array(
+                [video_id.split("_")[0] in participants for video_id in self.video_ids],
+                dtype=bool,
+            )
+        return selected[video_idx]
+
+    def select(
+        self,
+        video_ids: Optional[Iterable[str]] = None,
+        participants: Optional[Iterable[str]] = None,
+        classes: Optional[Iterable[Union[int, str]]] = None,
+        min_score: Optional[float] = None,
+        max_score: Optional[float] = None,
+    ) -> np.ndarray:
+        """Boolean mask over objects matching all the given criteria.
+
+        ``classes`` may be class ids or COCO class names.
+        """
+        selected = np.ones(len(self), dtype=bool)
+        if video_ids is not None or participants is not None:
+            selected &= self._video_selection(self.video_idx, video_ids, participants)
+        if classes is not None:
+            selected &= np.isin(self.pred_class, to_class_ids(classes))
+        if min_score is not None:
+            selected &= self.score > min_score
+        if max_score is not None:
+            selected &= self.score <= max_score
+        return selected
+
+    def frames(self, **criteria) -> List[Tuple[str, int]]:
+        """``(video_id, frame_number)`` of frames with an object matching ``criteria``.
+
+        Accepts the same criteria as :meth:`select`.
+        """
+        selected = self.select(**criteria)
+        keys = np.unique(
+            self.video_idx[selected].astype(np.int64) << 32
+            | self.frame_number[selected].astype(np.int64)
+        )
+        return [
+            (self.video_ids[video_idx], frame_number)
+            for video_idx, frame_number in zip(
+                (keys >> 32).tolist(), (keys & 0xFFFFFFFF).tolist()
+            )
+        ]
+
+    def object_counts(
+        self,
+        video_ids: Optional[Iterable[str]] = None,
+        participants: Optional[Iterable[str]] = None,
+    ) -> Iterator[Tuple[str, int, int]]:
+        """``(video_id, frame_number, n_objects)`` for every indexed frame."""
+        selected = np.ones(len(self.frames_video_idx), dtype=bool)
+        if video_ids is not None or participants is not None:
+            selected = self._video_selection(
+                self.frames_video_idx, video_ids, participants
+            )
+        for video_idx, frame_number, n_objects in zip(
+            self.frames_video_idx[selected].tolist(),
+            self.frames_frame_number[selected].tolist(),
+            self.frames_n_objects[selected].tolist(),
+        ):
+            yield self.video_ids[video_idx], frame_number, n_objects
@@ -1,24 +1,272 @@
 import pickle
+import pickletools
+import struct
 from pathlib import Path
-from typing import Iterator, List, Union
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from typing import Union
 
-from epic_kitchens.masks.types import FrameObjectDetections
+from epic_kitchens.masks.container import (
+    DEFAULT_CHUNK_SIZE,
+    MAGIC as INDEXED_MAGIC,
+    DetectionReader,
+    IndexedRecordWriter,
+    iter_records,
+)
+from epic_kitchens.masks.types import FrameObjectDetections, LazyFrameObjectDetections
 
+FORMAT_PICKLE = "pickle"
+FORMAT_INDEXED = "indexed"
+# Conventional file suffixes of the two formats.
+PICKLE_SUFFIX = ".pkl"
+INDEXED_SUFFIX = ".dets"
 
-def load_detections(filepath: Union[Path, str]) -> Iterator[FrameObjectDetections]:
+
+# Opcodes of bytes objects and the size of their length prefix.
+_PICKLED_BYTES_OPCODES = {"SHORT_BINBYTES": 1, "BINBYTES": 4, "BINBYTES8": 8}
+_PICKLED_MEMO_OPCODES = {"MEMOIZE", "BINPUT", "LONG_BINPUT"}
+_PICKLED_GET_OPCODES = {"BINGET", "LONG_BINGET"}
+_PICKLED_LIST_OPCODES = {"PROTO", "FRAME", "EMPTY_LIST", "MARK", "APPEND", "APPENDS"}
+
+
+def _read_at(f: BinaryIO, offset: int, length: int) -> bytes:
+    position = f.tell()
+    f.seek(offset)
+    data = f.read(length)
+    f.seek(position)
+    return data
+
+
+def _iter_pickled_bytes(f: BinaryIO) -> Iterator[bytes]:
+    """Stream the elements of a pickled ``List[bytes]`` one at a time.
+
+    Walks the pickle opcodes rather than unpickling the list, so memory use is
+    bounded by the largest element rather than the whole list. The pickler
+    memoizes every bytes object, so repeated elements are memo references:
+    for seekable files only the location of memoized elements is kept, and they
+    are read again when referenced.
+    """
+    memo: Dict[int, Union[bytes, Tuple[int, int]]] = {}
+    n_memoized = 0
+    top = None
+    for position, (opcode, arg, offset) in enumerate(pickletools.genops(f)):
+        name = opcode.name
+        if position == 0 and (name != "PROTO" or arg < 3):
+            # Protocols < 3 don't have a bytes opcode, fall back to unpickling.
+            f.seek(0)
+            yield from pickle.load(f)
+            return
+        if name == "STOP":
+            return
+        if name in _PICKLED_BYTES_OPCODES:
+            if offset is None:
+                top = arg
+            else:
+                top = (offset + 1 + _PICKLED_BYTES_OPCODES[name], len(arg))
+            yield arg
+        elif name in _PICKLED_MEMO_OPCODES:
+            memo_key = n_memoized if name == "MEMOIZE" else arg
+            n_memoized += 1
+            if top is not None:
+                memo[memo_key] = top
+        elif name in _PICKLED_GET_OPCODES:
+            if arg not in memo:
+                raise ValueError(
+                    f"Unsupported memo reference {arg} in detections pickle"
+                )
+            top = memo[arg]
+            yield top if isinstance(top, bytes) else _read_at(f, *top)
+        elif name in _PICKLED_LIST_OPCODES:
+            top = None
+        else:
+            raise ValueError(
+                f"Expected detections pickle to contain a list of bytes, "
+                f"but found opcode {name}"
+            )
+
+
+def iter_serialized_detections(filepath: Union[Path, str]) -> Iterator[bytes]:
+    """Yield the serialized ``pb.FrameObjectDetections`` of a detections file.
+
+    Works for both the pickle and indexed formats, reading one frame at a time.
+    """
+    f = open(filepath, "rb")
+    return _iter_serialized_detections(f)
+
+
+def _iter_serialized_detections(f: BinaryIO) -> Iterator[bytes]:
+    with f:
+        if f.read(len(INDEXED_MAGIC)) == INDEXED_MAGIC:
+            yield from iter_records(f)
+        else:
+            f.seek(0)
+            yield from _iter_pickled_bytes(f)
+
+
+def load_detections(
+    filepath: Union[Path, str], lazy: bool = False
+) -> Iterator[FrameObjectDetections]:
+    """Iterate over the frames of a detections file, in either format.
+
+    With ``lazy=True`` frames are yielded as :class:`LazyFrameObjectDetections`,
+    which only build object dataclasses when they're accessed.
+    """
     filepath = Path(filepath)
     video_id = filepath.stem
-    with open(filepath, "rb") as f:
-        return (
-            FrameObjectDetections.from_protobuf_str(video_id, pb_str) for pb_str in
-            pickle.load(f)
+    frame_cls = LazyFrameObjectDetections if lazy else FrameObjectDetections
+    return (
+        frame_cls.from_protobuf_str(video_id, pb_str)
+        for pb_str in iter_serialized_detections(filepath)
+    )
+
+
+def open_detections(filepath: Union[Path, str], lazy: bool = False) -> DetectionReader:
+    return DetectionReader(filepath, lazy=lazy)
+
+
+def get_frame(filepath: Union[Path, str], frame_number: int) -> FrameObjectDetections:
+    with DetectionReader(filepath) as reader:
+        return reader.get_frame(frame_number)
+
+
+def get_frames(
+    filepath: Union[Path, str], frame_numbers: Iterable[int]
+) -> List[FrameObjectDetections]:
+    with DetectionReader(filepath) as reader:
+        return reader.get_frames(frame_numbers)
+
+
+class _PickledBytesWriter:
+    """Incrementally write a protocol 3 pickle of a ``List[bytes]``.
+
+    The output unpickles to the same list ``pickle.dump`` would produce, but
+    elements are written as they arrive instead of from a materialized list.
+    """
+
+    _BATCH_SIZE = 1000
+
+    def __init__(self, f: BinaryIO):
+        self._file = f
+        self._file.write(pickle.PROTO + b"\x03" + pickle.EMPTY_LIST)
+        self._n_batched = 0
+
+    def write(self, pb_str: bytes) -> None:
+        if self._n_batched == 0:
+            self._file.write(pickle.MARK)
+        if len(pb_str) < 256:
+            self._file.write(pickle.SHORT_BINBYTES + bytes([len(pb_str)]))
+        else:
+            self._file.write(pickle.BINBYTES + struct.pack("<I", len(pb_str)))
+        self._file.write(pb_str)
+        self._n_batched += 1
+        if self._n_batched == self._BATCH_SIZE:
+            self._flush_batch()
+
+    def _flush_batch(self) -> None:
+        if self._n_batched > 0:
+            self._file.write(pickle.APPENDS)
+            self._n_batched = 0
+
+    def close(self) -> None:
+        self._flush_batch()
+        self._file.write(pickle.STOP)
+
+
+class DetectionWriter:
+    """Write a detections file frame by frame.
+
+    Frames are serialized and written as they're passed in, so a video never
+    needs to be held in memory. The file is finalized (e.g. the index and
+    footer of the indexed format written) when the writer is closed; if the
+    ``with`` block raises, the partial file is removed.
+
+    Indexed files can be compressed in chunks of ``chunk_size`` frames by
+    passing a ``compression`` codec (see
+    :func:`epic_kitchens.masks.container.available_codecs`), and carry
+    ``metadata`` (see :attr:`~epic_kitchens.masks.container.DetectionReader.metadata`).
+
+    Example::
+
+        with DetectionWriter("P01_101.dets", file_format=FORMAT_INDEXED) as writer:
+            for frame in frames:
+                writer.write(frame)
+    """
+
+    def __init__(
+        self,
+        filepath: Union[Path, str],
+        file_format: str = FORMAT_PICKLE,
+        compression: Optional[str] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        if file_format not in (FORMAT_PICKLE, FORMAT_INDEXED):
+            raise ValueError(f"Unknown detections file format {file_format!r}")
+        if compression is not None and file_format != FORMAT_INDEXED:
+            raise ValueError("Compression is only supported by the indexed format")
+        if metadata is not None and file_format != FORMAT_INDEXED:
+            raise ValueError("Metadata is only supported by the indexed format")
+        self.filepath = Path(filepath)
+        self.filepath.parent.mkdir(exist_ok=True, parents=True)
+        self.file_format = file_format
+        self.n_frames = 0
+        self._file = open(self.filepath, "wb")
+        try:
+            if file_format == FORMAT_INDEXED:
+                self._writer = IndexedRecordWriter(
+                    self._file,
+                    compression=compression,
+                    chunk_size=chunk_size,
+                    metadata=metadata,
+                )
+            else:
+                self._writer = _PickledBytesWriter(self._file)
+        except Exception:
+            self._file.close()
+            self.filepath.unlink()
+            raise
+
+    def __enter__(self) -> "DetectionWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            self.filepath.unlink()
+
+    def write(self, detections: FrameObjectDetections) -> None:
+        self.write_serialized(
+            detections.frame_number, detections.to_protobuf().SerializeToString()
         )
 
+    def write_serialized(self, frame_number: int, pb_str: bytes) -> None:
+        """Write an already serialized ``pb.FrameObjectDetections`` as is."""
+        if self.file_format == FORMAT_INDEXED:
+            self._writer.write(frame_number, pb_str)
+        else:
+            self._writer.write(pb_str)
+        self.n_frames += 1
+
+    def write_all(self, detections: Iterable[FrameObjectDetections]) -> None:
+        for frame_detections in detections:
+            self.write(frame_detections)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._writer.close()
+        self._file.close()
+
 
 def save_detections(
-    filepath: Union[Path, str], detections: List[FrameObjectDetections]
+    filepath: Union[Path, str],
+    detections: Iterable[FrameObjectDetections],
+    file_format: str = FORMAT_PICKLE,
+    compression: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
 ) -> None:
-    filepath = Path(filepath)
-    filepath.parent.mkdir(exist_ok=True, parents=True)
-    with open(filepath, "wb") as f:
-        pickle.dump([det.to_protobuf().SerializeToString() for det in detections], f)
+    with DetectionWriter(
+        filepath, file_format=file_format, compression=compression, chunk_size=chunk_size
+    ) as writer:
+        writer.write_all(detections)
@@ -0,0 +1,160 @@
+"""
+Mask IoU at any resolution on bit-packed masks, only comparing masks whose
+bounding boxes intersect.
+
+Compared with ``_maskrcnn_utils.compute_overlaps_masks``, which multiplies
+dense float32 ``(H * W, N)`` matrices, masks take 1 bit per pixel and each
+pair only costs the area where their boxes overlap.
+"""
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from epic_kitchens.masks.cache import MaskCache
+from epic_kitchens.masks.resize import resize_rles
+from epic_kitchens.masks.rle import decode_rles
+from epic_kitchens.masks.types import VideoDetections
+
+__all__ = ["PackedMasks", "mask_ious", "packed_mask_ious", "video_mask_ious"]
+
+_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+def _popcount(packed: np.ndarray) -> int:
+    # np.bitwise_count is only available from NumPy 2.0.
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(packed).sum(dtype=np.int64))
+    return int(_POPCOUNT[packed].sum(dtype=np.int64))
+
+
+@dataclass
+class PackedMasks:
+    """A stack of binary masks packed 8 pixels per byte along rows.
+
+    ``boxes`` are the tight ``(x1, y1, x2, y2)`` pixel bounds of each mask
+    (exclusive of ``x2``/``y2``), all zero for empty masks.
+    """
+
+    bits: np.ndarray
+    width: int
+    areas: np.ndarray
+    boxes: np.ndarray
+
+    @staticmethod
+    def from_masks(masks: np.ndarray) -> "PackedMasks":
+        """Pack ``(N, H, W)`` binary masks."""
+        bits = np.packbits(masks.astype(bool), axis=-1)
+        n_masks, height, width = masks.shape
+        areas = np.array([_popcount(mask_bits) for mask_bits in bits], dtype=np.int64)
+        boxes = np.zeros((n_masks, 4), dtype=np.int64)
+        rows = bits.any(axis=2)
+        cols = np.unpackbits(np.bitwise_or.reduce(bits, axis=1), axis=-1)[:, :width]
+        for mask_idx in np.flatnonzero(areas):
+            row_idxs = np.flatnonzero(rows[mask_idx])
+            col_idxs = np.flatnonzero(cols[mask_idx])
+            boxes[mask_idx] = (
+                col_idxs[0],
+                row_idxs[0],
+                col_idxs[-1] + 1,
+                row_idxs[-1] + 1,
+            )
+        return PackedMasks(bits=bits, width=width, areas=areas, boxes=boxes)
+
+    def __len__(self) -> int:
+        return len(self.bits)
+
+    @property
+    def height(self) -> int:
+        return self.bits.shape[1]
+
+
+def packed_mask_ious(masks1: PackedMasks, masks2: PackedMasks) -> np.ndarray:
+    """Pairwise IoU between two stacks of packed masks of the same size.
+
+    Only pairs whose boxes intersect are compared, within the intersection of
+    their boxes. Pairs involving an empty mask have an IoU of 0.
+
+    Returns:
+        A ``(len(masks1), len(masks2))`` float64 array.
+    """
+    if masks1.bits.shape[1:] != masks2.bits.shape[1:]:
+        raise ValueError(
+            f"Can't compare masks of size {masks1.height}x{masks1.width} with "
+            f"{masks2.height}x{masks2.width}"
+        )
+    ious = np.zeros((len(masks1), len(masks2)))
+    if len(masks1) == 0 or len(masks2) == 0:
+        return ious
+    boxes1 = masks1.boxes[:, np.newaxis]
+    boxes2 = masks2.boxes[np.newaxis]
+    x1 = np.maximum(boxes1[..., 0], boxes2[..., 0])
+    y1 = np.maximum(boxes1[..., 1], boxes2[..., 1])
+    x2 = np.minimum(boxes1[..., 2], boxes2[..., 2])
+    y2 = np.minimum(boxes1[..., 3], boxes2[..., 3])
+    for i, j in zip(*np.nonzero((x1 < x2) & (y1 < y2))):
+        rows = slice(y1[i, j], y2[i, j])
+        # Bits outside either mask are 0, so windows can be widened to bytes.
+        cols = slice(x1[i, j] // 8, -(-x2[i, j] // 8))
+        intersection = _popcount(
+            masks1.bits[i, rows, cols] & masks2.bits[j, rows, cols]
+        )
+        if intersection:
+            union = masks1.areas[i] + masks2.areas[j] - intersection
+            ious[i, j] = intersection / union
+    return ious
+
+
+def mask_ious(masks1: np.ndarray, masks2: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between ``(N1, H, W)`` and ``(N2, H, W)`` binary masks,
+    see :func:`packed_mask_ious`."""
+    return packed_mask_ious(
+        PackedMasks.from_masks(masks1), PackedMasks.from_masks(masks2)
+    )
+
+
+def video_mask_ious(
+    video: VideoDetections,
+    height: Optional[int] = None,
+    width: Optional[int] = None,
+    lag: int = 1,
+    smooth: bool = True,
+    cache: Optional[MaskCache] = None,
+) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """Mask IoU between the objects of each frame of a video and those of the
+    ``lag``-th frame of ``video`` before it, e.g. to associate objects across
+    frames.
+
+    Masks are compared at their stored 100 x 100 resolution, or resized to
+    ``height x width`` (see :func:`~epic_kitchens.masks.resize.resize_rles`).
+    Each frame is decoded and packed once, and only the packed masks of the
+    last ``lag`` frames are kept, so whole videos run in bounded memory.
+
+    Yields:
+        ``(frame_idx - lag, frame_idx, ious)`` for every frame from ``lag``,
+        with ``ious`` of shape ``(n_objects[frame_idx - lag],
+        n_objects[frame_idx])``.
+
+    Raises:
+        ValueError: If ``lag`` is less than 1.
+    """
+    if (height is None) != (width is None):
+        raise ValueError("Expected both or neither of height and width")
+    if lag < 1:
+        raise ValueError("lag must be at least 1")
+    previous: "deque[PackedMasks]" = deque(maxlen=lag)
+    for frame_idx in range(len(video)):
+        object_slice = video.object_slice(frame_idx)
+        rles = [
+            video.rle(object_idx)
+            for object_idx in range(object_slice.start, object_slice.stop)
+        ]
+        if height is None:
+            masks = decode_rles(rles)
+        else:
+            masks = resize_rles(rles, height, width, smooth=smooth, cache=cache)
+        packed = PackedMasks.from_masks(masks)
+        if len(previous) == lag:
+            yield frame_idx - lag, frame_idx, packed_mask_ious(previous[0], packed)
+        previous.append(packed)
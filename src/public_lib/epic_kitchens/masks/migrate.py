@@ -0,0 +1,236 @@
+"""
+Conversion of a tree of legacy ``Pxx_yy.pkl`` detections to the indexed format.
+"""
+import os
+import warnings
+from functools import partial
+from itertools import zip_longest
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from typing import Union
+
+from epic_kitchens.masks._wire import decode_frame_number
+from epic_kitchens.masks.container import DEFAULT_CHUNK_SIZE, DetectionReader
+from epic_kitchens.masks.dataset import find_detection_files
+from epic_kitchens.masks.io import (
+    FORMAT_INDEXED,
+    INDEXED_SUFFIX,
+    PICKLE_SUFFIX,
+    DetectionWriter,
+    iter_serialized_detections,
+)
+
+__all__ = [
+    "REPLACED_VIDEO_IDS",
+    "MigrationResult",
+    "migrate_detections",
+    "verify_migrated_detections",
+]
+
+# Videos whose detections on data.bris were incorrectly extracted, corrected
+# copies are distributed separately (see the README).
+REPLACED_VIDEO_IDS = ("P01_109", "P27_103")
+
+MIGRATED = "migrated"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class MigrationResult(NamedTuple):
+    video_id: str
+    source: Path
+    output: Path
+    status: str
+    n_frames: int = 0
+    error: Optional[str] = None
+
+
+def verify_migrated_detections(source: Path, output: Path) -> int:
+    """Check ``output`` holds exactly the frames of ``source``, byte for byte.
+
+    Returns:
+        The number of frames.
+
+    Raises:
+        ValueError: If the files differ.
+    """
+    with DetectionReader(output) as reader:
+        indexed_frame_numbers = reader.frame_numbers.tolist()
+    n_frames = 0
+    for expected, actual in zip_longest(
+        iter_serialized_detections(source), iter_serialized_detections(output)
+    ):
+        if expected != actual:
+            raise ValueError(f"{output} differs from {source} at frame {n_frames}")
+        if indexed_frame_numbers[n_frames] != decode_frame_number(actual):
+            raise ValueError(f"Index of {output} is wrong at frame {n_frames}")
+        n_frames += 1
+    if n_frames != len(indexed_frame_numbers):
+        raise ValueError(
+            f"Index of {output} has {len(indexed_frame_numbers)} entries "
+            f"for {n_frames} frames"
+        )
+    return n_frames
+
+
+def _source_metadata(source: Path) -> Dict[str, Any]:
+    stat = source.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _is_up_to_date(
+    source: Path, output: Path, compression: Optional[str], chunk_size: int
+) -> bool:
+    # Compare against what the output was migrated from rather than mtimes, as
+    # replacement files can be older than existing outputs.
+    if not output.exists():
+        return False
+    try:
+        with DetectionReader(output) as reader:
+            metadata = reader.metadata
+            output_settings = (reader.compression, reader.chunk_size)
+    except (OSError, ValueError):
+        return False
+    settings = (compression, None if compression is None else chunk_size)
+    return (
+        metadata.get("source") == _source_metadata(source)
+        and output_settings == settings
+    )
+
+
+def _migrate_video(
+    job: Tuple[str, Path, Path],
+    compression: Optional[str],
+    chunk_size: int,
+    verify: bool,
+    overwrite: bool,
+) -> MigrationResult:
+    video_id, source, output = job
+    if not overwrite and _is_up_to_date(source, output, compression, chunk_size):
+        return MigrationResult(video_id, source, output, SKIPPED)
+    # Write next to the output so the final rename is atomic, and readers never
+    # see a partially written file.
+    tmp_output = output.with_name(f".{output.name}.{os.getpid()}.tmp")
+    try:
+        with DetectionWriter(
+            tmp_output,
+            file_format=FORMAT_INDEXED,
+            compression=compression,
+            chunk_size=chunk_size,
+            metadata={"source": _source_metadata(source)},
+        ) as writer:
+            for pb_str in iter_serialized_detections(source):
+                writer.write_serialized(decode_frame_number(pb_str), pb_str)
+        if verify:
+            verify_migrated_detections(source, tmp_output)
+        os.replace(tmp_output, output)
+    except Exception as e:
+        if tmp_output.exists():
+            tmp_output.unlink()
+        return MigrationResult(video_id, source, output, FAILED, error=repr(e))
+    return MigrationResult(video_id, source, output, MIGRATED, writer.n_frames)
+
+
+def _migration_jobs(
+    source_root: Path,
+    output_root: Path,
+    video_ids: Optional[Iterable[str]],
+    replacements_root: Optional[Path],
+) -> List[Tuple[str, Path, Path]]:
+    sources = find_detection_files(source_root, suffixes=(PICKLE_SUFFIX,))
+    replacements = {}
+    if replacements_root is not None:
+        replacements = find_detection_files(
+            replacements_root, suffixes=(PICKLE_SUFFIX,)
+        )
+    if video_ids is not None:
+        video_ids = set(video_ids)
+        missing = video_ids - sources.keys() - replacements.keys()
+        if missing:
+            raise FileNotFoundError(
+                f"No detections found under {source_root} for {sorted(missing)}"
+            )
+        sources = {video_id: sources.get(video_id) for video_id in video_ids}
+        replacements = {
+            video_id: path
+            for video_id, path in replacements.items()
+            if video_id in video_ids
+        }
+
+    jobs = []
+    for video_id in sorted(sources.keys() | replacements.keys()):
+        source = sources.get(video_id)
+        if source is not None:
+            relative_path = source.relative_to(source_root)
+        else:
+            relative_path = Path(video_id.split("_")[0]) / video_id
+        if video_id in replacements:
+            source = replacements[video_id]
+        elif video_id in REPLACED_VIDEO_IDS:
+            warnings.warn(
+                f"Migrating the data.bris release of {video_id} which was "
+                f"incorrectly extracted, pass the corrected file as a replacement"
+            )
+        output = output_root / relative_path.with_suffix(INDEXED_SUFFIX)
+        jobs.append((video_id, source, output))
+    return jobs
+
+
+def migrate_detections(
+    source_root: Union[Path, str],
+    output_root: Union[Path, str],
+    video_ids: Optional[Iterable[str]] = None,
+    replacements_root: Optional[Union[Path, str]] = None,
+    compression: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 1,
+    verify: bool = True,
+    overwrite: bool = False,
+) -> Iterator[MigrationResult]:
+    """Convert the legacy pickles under ``source_root`` to indexed files.
+
+    Outputs mirror the layout of ``source_root`` under ``output_root``, e.g.
+    ``P01/P01_101.pkl`` becomes ``P01/P01_101.dets``. Frames are copied
+    without being parsed, written to a temporary file, optionally verified
+    against the source (see :func:`verify_migrated_detections`) and then
+    renamed into place. Outputs record the size and modification time of their
+    source, and are skipped if those and the compression settings haven't
+    changed unless ``overwrite`` is set.
+
+    Args:
+        source_root: Directory containing ``Pxx_yy.pkl`` files at any depth.
+        output_root: Directory to write ``Pxx_yy.dets`` files to, may be the
+            same as ``source_root``.
+        video_ids: Videos to migrate, defaults to all found.
+        replacements_root: Directory of corrected pickles (e.g. the
+            P01_109/P27_103 re-releases) used instead of those under
+            ``source_root``.
+        compression: Optional codec to compress the outputs with.
+        chunk_size: Number of frames per compressed chunk.
+        workers: Number of videos to migrate in parallel.
+        verify: Check each output against its source before renaming it.
+        overwrite: Migrate videos even if their output is up to date.
+
+    Yields:
+        A :class:`MigrationResult` per video as it finishes. Failures are
+        reported rather than raised so one bad file doesn't stop the rest.
+    """
+    jobs = _migration_jobs(
+        Path(source_root),
+        Path(output_root),
+        video_ids,
+        None if replacements_root is None else Path(replacements_root),
+    )
+    migrate_video = partial(
+        _migrate_video,
+        compression=compression,
+        chunk_size=chunk_size,
+        verify=verify,
+        overwrite=overwrite,
+    )
+    if workers <= 1:
+        yield from map(migrate_video, jobs)
+        return
+    with Pool(workers) as pool:
+        yield from pool.imap_unordered(migrate_video, jobs)
@@ -0,0 +1,254 @@
+"""
+Contact sheets of the detections of many frames at thumbnail size, for spot
+checking releases.
+"""
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+import PIL.Image
+import PIL.ImageDraw
+import PIL.ImageFont
+import numpy as np
+
+from epic_kitchens.masks.dataset import find_detection_files
+from epic_kitchens.masks.io import iter_serialized_detections
+from epic_kitchens.masks.raster import composite_masks, label_map
+from epic_kitchens.masks.resize import resize_rles
+from epic_kitchens.masks.types import VideoDetections
+from epic_kitchens.masks.visualisation import DetectionRenderer
+
+__all__ = ["MontageBuilder", "build_montages", "sample_frames"]
+
+BY_STRIDE = "stride"
+BY_SCORE = "score"
+# Relative to frames_root, e.g. the layout of extracted frames per video.
+FRAME_TEMPLATE = "{video_id}/frame_{frame_number:010d}.jpg"
+
+
+def sample_frames(
+    video: VideoDetections,
+    n_frames: int,
+    by: str = BY_STRIDE,
+    score_threshold: Optional[float] = None,
+    classes: Optional[Iterable[Union[int, str]]] = None,
+) -> np.ndarray:
+    """Pick up to ``n_frames`` frames of a video to show.
+
+    Only frames with an object scoring above ``score_threshold`` and of
+    ``classes`` (if given) are candidates. With ``by="stride"`` candidates are
+    spread evenly over the video, with ``by="score"`` those with the highest
+    scoring objects are picked.
+
+    Returns:
+        Indices of the frames in ``video``, in video order.
+    """
+    if by not in (BY_STRIDE, BY_SCORE):
+        raise ValueError(f"Unknown frame sampling {by!r}")
+    if score_threshold is not None or classes is not None:
+        video = video.filter(score_threshold=score_threshold, classes=classes)
+        candidates = np.flatnonzero(video.n_objects_per_frame > 0)
+    else:
+        candidates = np.arange(len(video))
+    if len(candidates) <= n_frames:
+        return candidates
+    if by == BY_STRIDE:
+        strided = np.linspace(0, len(candidates) - 1, n_frames).round()
+        return candidates[strided.astype(int)]
+    frame_scores = np.full(len(video), -np.inf, dtype=np.float32)
+    non_empty = np.flatnonzero(video.n_objects_per_frame > 0)
+    if len(non_empty) > 0:
+        frame_scores[non_empty] = np.maximum.reduceat(
+            video.score, video.frame_offsets[non_empty]
+        )
+    top = np.argsort(-frame_scores[candidates], kind="stable")[:n_frames]
+    return np.sort(candidates[top])
+
+
+class MontageBuilder:
+    """Render the detections of many frames as a grid of thumbnails.
+
+    Frames are loaded from ``frames_root / frame_template`` at reduced size
+    (JPEGs are decoded at a fraction of their resolution), or left blank if
+    missing. Masks of all tiles are resized in batches and blended into one
+    preallocated canvas in a single pass.
+
+    Drawing options (score threshold, masks, boxes, mask smoothing and
+    colors) are taken from ``renderer``.
+
+    Example::
+
+        builder = MontageBuilder(frames_root="frames", columns=4)
+        video = VideoDetections.from_frames("P01_101", load_detections("P01_101.pkl"))
+        builder.render(video, sample_frames(video, 16)).save("P01_101.jpg")
+    """
+
+    def __init__(
+        self,
+        tile_height: int = 135,
+        tile_width: int = 240,
+        columns: int = 4,
+        renderer: Optional[DetectionRenderer] = None,
+        frames_root: Optional[Union[Path, str]] = None,
+        frame_template: str = FRAME_TEMPLATE,
+        background: Tuple[int, int, int] = (32, 32, 32),
+    ):
+        self.tile_height = tile_height
+        self.tile_width = tile_width
+        self.columns = columns
+        self.renderer = DetectionRenderer() if renderer is None else renderer
+        self.frames_root = None if frames_root is None else Path(frames_root)
+        self.frame_template = frame_template
+        self.background = background
+
+    def _load_tile(self, video_id: str, frame_number: int) -> Optional[np.ndarray]:
+        if self.frames_root is None:
+            return None
+        path = self.frames_root / self.frame_template.format(
+            video_id=video_id, frame_number=frame_number
+        )
+        if not path.exists():
+            return None
+        with PIL.Image.open(path) as img:
+            img.draft("RGB", (self.tile_width, self.tile_height))
+            img = img.convert("RGB").resize(
+                (self.tile_width, self.tile_height), PIL.Image.BILINEAR
+            )
+        return np.asarray(img)
+
+    def render(
+        self, video: VideoDetections, frame_idxs: Sequence[int]
+    ) -> PIL.Image.Image:
+        """Render frames ``frame_idxs`` of ``video``, left to right and top to
+        bottom, each captioned with its frame number."""
+        renderer = self.renderer
+        height, width = self.tile_height, self.tile_width
+        n_rows = max(1, -(-len(frame_idxs) // self.columns))
+        canvas = np.empty((n_rows * height, self.columns * width, 3), dtype=np.uint8)
+        canvas[...] = self.background
+        labels = np.zeros(canvas.shape[:2], dtype=np.uint32)
+        colors = []
+        boxes = []
+        n_instances = 0
+        for tile_idx, frame_idx in enumerate(frame_idxs):
+            top = (tile_idx // self.columns) * height
+            left = (tile_idx % self.columns) * width
+            tile = self._load_tile(video.video_id, int(video.frame_numbers[frame_idx]))
+            if tile is not None:
+                canvas[top : top + height, left : left + width] = tile
+
+            object_slice = video.object_slice(frame_idx)
+            object_idxs = np.arange(object_slice.start, object_slice.stop)
+            object_idxs = object_idxs[
+                video.score[object_idxs] > renderer.score_threshold
+            ]
+            if len(object_idxs) == 0:
+                continue
+            masks = resize_rles(
+                [video.rle(object_idx) for object_idx in object_idxs],
+                height,
+                width,
+                smooth=renderer.smooth_mask,
+                cache=renderer.mask_cache,
+            )
+            order = np.argsort(video.score[object_idxs], kind="stable")
+            tile_labels = label_map(masks, order)
+            foreground = tile_labels > 0
+            labels[top : top + height, left : left + width][foreground] = (
+                tile_labels[foreground].astype(np.uint32) + n_instances
+            )
+            n_instances += len(object_idxs)
+            colors.append(renderer.class_colors[video.pred_class[object_idxs]])
+            boxes.append(
+                video.bbox[object_idxs] * [width, height, width, height]
+                + [left, top, left, top]
+            )
+
+        if n_instances > 0:
+            composite_masks(
+                canvas, labels, np.concatenate(colors), fill=renderer.display_mask
+            )
+        img = PIL.Image.fromarray(canvas)
+        draw = PIL.ImageDraw.Draw(img)
+        if renderer.display_bbox and n_instances > 0:
+            for box, color in zip(np.concatenate(boxes), np.concatenate(colors)):
+                draw.rectangle(
+                    [int(coord) for coord in box.round()],
+                    outline=tuple(int(c) for c in color),
+                )
+        font = PIL.ImageFont.load_default()
+        for tile_idx, frame_idx in enumerate(frame_idxs):
+            top = (tile_idx // self.columns) * height
+            left = (tile_idx % self.columns) * width
+            draw.text(
+                (left + 2, top + 1),
+                str(int(video.frame_numbers[frame_idx])),
+                fill=(255, 255, 255),
+                font=font,
+                stroke_width=1,
+                stroke_fill=(0, 0, 0),
+            )
+        return img
+
+
+def _build_montage(
+    video_file: Tuple[str, Path],
+    builder: MontageBuilder,
+    out_dir: Path,
+    output_template: str,
+    n_frames: int,
+    by: str,
+    score_threshold: Optional[float],
+    classes: Optional[Sequence[Union[int, str]]],
+) -> Path:
+    video_id, filepath = video_file
+    video = VideoDetections.from_protobuf_strs(
+        video_id, iter_serialized_detections(filepath)
+    )
+    frame_idxs = sample_frames(
+        video, n_frames, by=by, score_threshold=score_threshold, classes=classes
+    )
+    output = out_dir / output_template.format(video_id=video_id)
+    builder.render(video, frame_idxs).save(output)
+    return output
+
+
+def build_montages(
+    detections_root: Union[Path, str],
+    out_dir: Union[Path, str],
+    video_ids: Optional[Iterable[str]] = None,
+    builder: Optional[MontageBuilder] = None,
+    n_frames: int = 16,
+    by: str = BY_STRIDE,
+    score_threshold: Optional[float] = None,
+    classes: Optional[Sequence[Union[int, str]]] = None,
+    output_template: str = "{video_id}.jpg",
+    workers: int = 1,
+) -> Iterator[Path]:
+    """Write a contact sheet of ``n_frames`` sampled frames (see
+    :func:`sample_frames`) of every video under ``detections_root``.
+
+    Videos are spread over ``workers`` processes.
+
+    Yields:
+        The path of each contact sheet as it's written.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    video_files = list(find_detection_files(detections_root, video_ids).items())
+    build_montage = partial(
+        _build_montage,
+        builder=MontageBuilder() if builder is None else builder,
+        out_dir=out_dir,
+        output_template=output_template,
+        n_frames=n_frames,
+        by=by,
+        score_threshold=score_threshold,
+        classes=classes,
+    )
+    if workers <= 1:
+        yield from map(build_montage, video_files)
+        return
+    with Pool(workers) as pool:
+        yield from pool.imap_unordered(build_montage, video_files)
@@ -0,0 +1,218 @@
+"""
+Mask outlines as simplified polygons, precomputed once and stored in a column
+file (see :mod:`epic_kitchens.masks.columnar`) alongside the detections.
+
+Vertices are ``(x, y)`` in coordinates normalized to the frame, so they scale
+to any resolution like the bounding boxes. They're quantized to 16 bits.
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+from skimage.measure import approximate_polygon, find_contours
+
+from epic_kitchens.masks.columnar import ColumnWriter, read_columns
+from epic_kitchens.masks.types import FrameObjectDetections
+
+__all__ = [
+    "PolygonWriter",
+    "VideoPolygons",
+    "load_polygons",
+    "mask_polygons",
+    "save_polygons",
+    "to_pixel_polygons",
+]
+
+POLYGON_SUFFIX = ".polygons"
+# Maximum distance, in pixels of the 100 x 100 masks, of simplified outlines
+# from the exact contours.
+DEFAULT_TOLERANCE = 0.5
+_SCALE = np.iinfo(np.uint16).max
+
+POLYGON_COLUMNS = [
+    "frame_numbers",
+    "frame_offsets",
+    "object_offsets",
+    "polygon_offsets",
+    "vertices",
+]
+
+
+def mask_polygons(
+    mask: np.ndarray, tolerance: float = DEFAULT_TOLERANCE
+) -> List[np.ndarray]:
+    """Outlines of a binary mask as ``(K, 2)`` arrays of normalized ``(x, y)``
+    vertices, simplified to within ``tolerance`` mask pixels.
+    """
+    height, width = mask.shape
+    # Pad so masks touching the border give closed contours, like
+    # display_instances.
+    padded_mask = np.pad(mask.astype(np.uint8), 1)
+    polygons = []
+    for contour in find_contours(padded_mask, 0.5):
+        if tolerance > 0:
+            contour = approximate_polygon(contour, tolerance)
+        # Undo the padding, flip (y, x) to (x, y) and normalize, with pixel
+        # centers at (i + 0.5) / size.
+        polygons.append(
+            (np.fliplr(contour) - 0.5) / np.array([width, height], dtype=np.float64)
+        )
+    return polygons
+
+
+def to_pixel_polygons(
+    polygons: Sequence[np.ndarray], height: int, width: int
+) -> List[np.ndarray]:
+    """Scale normalized polygons to a ``height x width`` image, with pixel
+    centers at integer coordinates."""
+    scale = np.array([width, height], dtype=np.float32)
+    return [polygon * scale - 0.5 for polygon in polygons]
+
+
+@dataclass
+class VideoPolygons:
+    """Polygons of every object of a video, stored as flat columns.
+
+    Objects of frame ``frame_numbers[i]`` are
+    ``frame_offsets[i]:frame_offsets[i + 1]``, in the same order as in the
+    detections. Polygons of object ``j`` are
+    ``object_offsets[j]:object_offsets[j + 1]`` and the vertices of polygon
+    ``k`` are ``vertices[polygon_offsets[k]:polygon_offsets[k + 1]]``.
+    """
+
+    video_id: str
+    tolerance: float
+    frame_numbers: np.ndarray
+    frame_offsets: np.ndarray
+    object_offsets: np.ndarray
+    polygon_offsets: np.ndarray
+    vertices: np.ndarray = field(repr=False)
+    _frame_idxs: Optional[Dict[int, int]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __len__(self) -> int:
+        return len(self.frame_numbers)
+
+    def __contains__(self, frame_number: int) -> bool:
+        return frame_number in self._frame_lookup()
+
+    def _frame_lookup(self) -> Dict[int, int]:
+        if self._frame_idxs is None:
+            self._frame_idxs = {
+                frame_number: frame_idx
+                for frame_idx, frame_number in enumerate(self.frame_numbers.tolist())
+            }
+        return self._frame_idxs
+
+    def object_polygons(self, object_idx: int) -> List[np.ndarray]:
+        """Normalized ``(K, 2)`` polygons of an object."""
+        polygons = []
+        for polygon_idx in range(
+            self.object_offsets[object_idx], self.object_offsets[object_idx + 1]
+        ):
+            start, stop = self.polygon_offsets[polygon_idx : polygon_idx + 2]
+            polygons.append(self.vertices[start:stop].astype(np.float32) / _SCALE)
+        return polygons
+
+    def frame(self, frame_number: int) -> List[List[np.ndarray]]:
+        """Polygons of each object of a frame.
+
+        Raises:
+            KeyError: If the frame has no polygons.
+        """
+        frame_idx = self._frame_lookup()[frame_number]
+        return [
+            self.object_polygons(object_idx)
+            for object_idx in range(
+                self.frame_offsets[frame_idx], self.frame_offsets[frame_idx + 1]
+            )
+        ]
+
+
+class PolygonWriter:
+    """Write the polygons of a video's frames to a column file, frame by frame.
+
+    Example::
+
+        with PolygonWriter("P01_101.polygons", "P01_101") as writer:
+            for frame in load_detections("P01_101.pkl"):
+                writer.write(frame)
+    """
+
+    def __init__(
+        self,
+        filepath: Union[Path, str],
+        video_id: str,
+        tolerance: float = DEFAULT_TOLERANCE,
+    ):
+        self.tolerance = tolerance
+        self._writer = ColumnWriter(
+            filepath, attrs={"video_id": video_id, "tolerance": tolerance}
+        )
+        self._n_objects = 0
+        self._n_polygons = 0
+        self._n_vertices = 0
+        self._writer.append(
+            frame_numbers=np.empty(0, dtype=np.int32),
+            frame_offsets=np.zeros(1, dtype=np.int64),
+            object_offsets=np.zeros(1, dtype=np.int64),
+            polygon_offsets=np.zeros(1, dtype=np.int64),
+            vertices=np.empty((0, 2), dtype=np.uint16),
+        )
+
+    def __enter__(self) -> "PolygonWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._writer.__exit__(exc_type, exc_value, traceback)
+
+    def write(self, frame: FrameObjectDetections) -> None:
+        object_offsets = []
+        polygon_offsets = []
+        vertices = []
+        for mask in frame.masks():
+            polygons = mask_polygons(mask, self.tolerance)
+            for polygon in polygons:
+                vertices.append(polygon)
+                self._n_vertices += len(polygon)
+                polygon_offsets.append(self._n_vertices)
+            self._n_polygons += len(polygons)
+            object_offsets.append(self._n_polygons)
+        self._n_objects += len(object_offsets)
+        if vertices:
+            quantized = np.round(np.concatenate(vertices) * _SCALE)
+            vertices = np.clip(quantized, 0, _SCALE).astype(np.uint16)
+        else:
+            vertices = np.empty((0, 2), dtype=np.uint16)
+        self._writer.append(
+            frame_numbers=np.array([frame.frame_number], dtype=np.int32),
+            frame_offsets=np.array([self._n_objects], dtype=np.int64),
+            object_offsets=np.array(object_offsets, dtype=np.int64),
+            polygon_offsets=np.array(polygon_offsets, dtype=np.int64),
+            vertices=vertices,
+        )
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def save_polygons(
+    filepath: Union[Path, str],
+    frames: Iterable[FrameObjectDetections],
+    video_id: str,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> None:
+    with PolygonWriter(filepath, video_id, tolerance=tolerance) as writer:
+        for frame in frames:
+            writer.write(frame)
+
+
+def load_polygons(filepath: Union[Path, str], mmap: bool = True) -> VideoPolygons:
+    attrs, columns = read_columns(filepath, mmap=mmap)
+    return VideoPolygons(
+        video_id=attrs["video_id"],
+        tolerance=attrs["tolerance"],
+        **{name: columns[name] for name in POLYGON_COLUMNS},
+    )
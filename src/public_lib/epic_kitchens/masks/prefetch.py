@@ -0,0 +1,206 @@
+"""
+Reading (and decoding) detections ahead of a consumer on a background thread.
+"""
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Deque, Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+from epic_kitchens.masks.io import load_detections
+
+__all__ = ["PrefetchStats", "Prefetcher", "item_nbytes", "prefetch_detections"]
+
+
+def item_nbytes(item: Any) -> int:
+    """Approximate memory held by a prefetched item.
+
+    Arrays and objects with an ``nbytes`` attribute (e.g. :class:`VideoDetections`)
+    report their own size, tuples and lists are summed and anything else is
+    measured with :func:`sys.getsizeof`.
+    """
+    if isinstance(item, (tuple, list)):
+        return sum(item_nbytes(element) for element in item)
+    nbytes = getattr(item, "nbytes", None)
+    if isinstance(nbytes, (int, np.integer)):
+        return int(nbytes)
+    return sys.getsizeof(item)
+
+
+@dataclass
+class PrefetchStats:
+    """Counters for sizing a :class:`Prefetcher`'s buffer.
+
+    A consumer that often stalls (``stall_s`` is a large part of its run time)
+    is waiting on reading, so more depth won't help unless reading is bursty.
+    A producer that spends most of its time in ``producer_wait_s`` keeps the
+    buffer full, so the depth (or memory cap) could be reduced.
+    """
+
+    n_items: int = 0
+    n_stalls: int = 0
+    stall_s: float = 0.0
+    producer_wait_s: float = 0.0
+    max_buffered_items: int = 0
+    max_buffered_bytes: int = 0
+
+    @property
+    def mean_stall_s(self) -> float:
+        return self.stall_s / self.n_stalls if self.n_stalls else 0.0
+
+
+class Prefetcher:
+    """Iterate over ``iterable`` while a background thread reads ahead.
+
+    Up to ``depth`` items (and, if ``max_bytes`` is given, no more than
+    ``max_bytes`` of them as measured by ``nbytes``) are buffered. At least one
+    item is always buffered, however large. ``transform`` is applied to items
+    on the background thread, e.g. to decode masks. Exceptions raised while
+    reading are re-raised to the consumer once the items before them have been
+    consumed.
+
+    Reading protobufs and decoding masks mostly holds the GIL, so the thread
+    overlaps reading with a consumer that waits on I/O or a GPU. For CPU bound
+    consumers, prefetch from :func:`epic_kitchens.masks.dataset.load_dataset`
+    with several workers instead.
+
+    Example::
+
+        with Prefetcher(load_detections("P01_01.pkl"), depth=64) as frames:
+            for frame in frames:
+                train_step(frame)
+        print(frames.stats)
+    """
+
+    def __init__(
+        self,
+        iterable: Iterable,
+        depth: int = 8,
+        max_bytes: Optional[int] = None,
+        transform: Optional[Callable[[Any], Any]] = None,
+        nbytes: Callable[[Any], int] = item_nbytes,
+    ):
+        if depth < 1:
+            raise ValueError(f"Expected depth to be positive but was {depth}")
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.stats = PrefetchStats()
+        self._iterable = iterable
+        self._transform = transform
+        self._nbytes = nbytes
+        self._buffer: Deque[Tuple[Any, int]] = deque()
+        self._buffered_bytes = 0
+        self._error: Optional[BaseException] = None
+        self._done = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "Prefetcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def _is_full(self, item_size: int) -> bool:
+        if not self._buffer:
+            return False
+        if len(self._buffer) >= self.depth:
+            return True
+        return (
+            self.max_bytes is not None
+            and self._buffered_bytes + item_size > self.max_bytes
+        )
+
+    def _produce(self) -> None:
+        try:
+            for item in self._iterable:
+                if self._transform is not None:
+                    item = self._transform(item)
+                item_size = self._nbytes(item)
+                with self._condition:
+                    start = time.perf_counter()
+                    while not self._closed and self._is_full(item_size):
+                        self._condition.wait()
+                    self.stats.producer_wait_s += time.perf_counter() - start
+                    if self._closed:
+                        return
+                    self._buffer.append((item, item_size))
+                    self._buffered_bytes += item_size
+                    self.stats.max_buffered_items = max(
+                        self.stats.max_buffered_items, len(self._buffer)
+                    )
+                    self.stats.max_buffered_bytes = max(
+                        self.stats.max_buffered_bytes, self._buffered_bytes
+                    )
+                    self._condition.notify_all()
+        except BaseException as e:
+            with self._condition:
+                self._error = e
+        finally:
+            with self._condition:
+                self._done = True
+                self._condition.notify_all()
+
+    def __next__(self) -> Any:
+        with self._condition:
+            if not self._buffer and not self._done:
+                self.stats.n_stalls += 1
+                start = time.perf_counter()
+                while not self._buffer and not self._done:
+                    self._condition.wait()
+                self.stats.stall_s += time.perf_counter() - start
+            if self._buffer:
+                item, item_size = self._buffer.popleft()
+                self._buffered_bytes -= item_size
+                self.stats.n_items += 1
+                self._condition.notify_all()
+                return item
+            if self._error is not None:
+                error, self._error = self._error, None
+                raise error
+            raise StopIteration
+
+    def close(self) -> None:
+        """Stop reading ahead and drop buffered items.
+
+        Waits for the item currently being read to finish.
+        """
+        with self._condition:
+            self._closed = True
+            self._buffer.clear()
+            self._buffered_bytes = 0
+            self._condition.notify_all()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+def _with_masks(frame) -> Tuple[Any, np.ndarray]:
+    return frame, frame.masks()
+
+
+def prefetch_detections(
+    filepath: Union[Path, str],
+    depth: int = 64,
+    max_bytes: Optional[int] = None,
+    masks: bool = False,
+) -> Prefetcher:
+    """Read the frames of a detections file ahead of the consumer.
+
+    With ``masks=True`` masks are decoded in the background too and
+    ``(frame, masks)`` pairs are yielded.
+    """
+    return Prefetcher(
+        load_detections(filepath, lazy=True),
+        depth=depth,
+        max_bytes=max_bytes,
+        transform=_with_masks if masks else None,
+    )
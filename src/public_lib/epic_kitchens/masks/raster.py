@@ -0,0 +1,201 @@
+"""
+Drawing detections straight into an image with NumPy and PIL, without
+matplotlib, e.g. for batch rendering on headless servers.
+"""
+from typing import Optional, Sequence, Tuple
+
+import PIL.Image
+import PIL.ImageDraw
+import PIL.ImageFont
+import numpy as np
+
+__all__ = [
+    "composite_masks",
+    "label_boundaries",
+    "label_map",
+    "render_instances",
+    "to_uint8_colors",
+]
+
+MASK_ALPHA = 0.5
+BOX_ALPHA = 0.7
+BOX_WIDTH = 2
+BOX_DASH = 6
+
+
+def to_uint8_colors(colors: Sequence[Tuple[float, float, float]]) -> np.ndarray:
+    """Convert colors with 0--1 channels (as from ``random_colors``) to uint8."""
+    return np.round(np.asarray(colors, dtype=np.float64).reshape(-1, 3) * 255).astype(
+        np.uint8
+    )
+
+
+def _mask_window(mask: np.ndarray) -> Optional[Tuple[slice, slice]]:
+    # The tight bounding window of a mask, so instances only cost their area.
+    rows = np.flatnonzero(mask.any(axis=1))
+    if len(rows) == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1)
+
+
+def label_map(masks: np.ndarray, order: Optional[Sequence[int]] = None) -> np.ndarray:
+    """Which instance is on top at each pixel of ``(N, H, W)`` masks.
+
+    Instances are painted in ``order`` (default by index), later ones on top.
+
+    Returns:
+        An ``(H, W)`` map of 1-based instance indices, 0 for background.
+    """
+    dtype = np.uint8 if len(masks) < 255 else np.uint16
+    labels = np.zeros(masks.shape[1:], dtype=dtype)
+    for i in range(len(masks)) if order is None else order:
+        window = _mask_window(masks[i])
+        if window is not None:
+            labels[window][masks[i][window].astype(bool)] = i + 1
+    return labels
+
+
+def label_boundaries(labels: np.ndarray) -> np.ndarray:
+    """Foreground pixels of a label map with a 4-neighbour of another label.
+
+    Pixels on the image border count as boundary, like the padded contours
+    drawn by ``display_instances``.
+    """
+    padded = np.pad(labels, 1)
+    center = padded[1:-1, 1:-1]
+    return (center > 0) & (
+        (center != padded[:-2, 1:-1])
+        | (center != padded[2:, 1:-1])
+        | (center != padded[1:-1, :-2])
+        | (center != padded[1:-1, 2:])
+    )
+
+
+def composite_masks(
+    image: np.ndarray,
+    labels: np.ndarray,
+    colors: np.ndarray,
+    alpha: float = MASK_ALPHA,
+    fill: bool = True,
+    outline: bool = True,
+) -> np.ndarray:
+    """Blend the instances of a label map (see :func:`label_map`) into
+    ``image`` in place, outlining them unless ``outline=False``.
+
+    All instances are blended at once through a lookup table of premultiplied
+    colors, in 8 bit fixed point.
+    """
+    foreground = labels > 0
+    if fill:
+        weight = round(alpha * 256)
+        lut = np.zeros((len(colors) + 1, 3), dtype=np.uint16)
+        lut[1:] = colors.astype(np.uint16) * weight
+        blended = image[foreground].astype(np.uint16) * (256 - weight)
+        blended += lut[labels[foreground]]
+        image[foreground] = blended >> 8
+    if outline:
+        boundaries = label_boundaries(labels)
+        image[boundaries] = colors[labels[boundaries].astype(np.intp) - 1]
+    return image
+
+
+def _draw_dashed_rectangle(
+    draw: PIL.ImageDraw.ImageDraw,
+    box: Tuple[int, int, int, int],
+    fill: Tuple[int, int, int, int],
+) -> None:
+    x1, y1, x2, y2 = box
+    for start in range(x1, x2, 2 * BOX_DASH):
+        stop = min(start + BOX_DASH, x2)
+        draw.line([(start, y1), (stop, y1)], fill=fill, width=BOX_WIDTH)
+        draw.line([(start, y2), (stop, y2)], fill=fill, width=BOX_WIDTH)
+    for start in range(y1, y2, 2 * BOX_DASH):
+        stop = min(start + BOX_DASH, y2)
+        draw.line([(x1, start), (x1, stop)], fill=fill, width=BOX_WIDTH)
+        draw.line([(x2, start), (x2, stop)], fill=fill, width=BOX_WIDTH)
+
+
+def _text_size(draw: PIL.ImageDraw.ImageDraw, text: str, font) -> Tuple[int, int]:
+    if hasattr(draw, "textbbox"):
+        left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+        return right - left, bottom - top
+    return draw.textsize(text, font=font)
+
+
+def render_instances(
+    image: np.ndarray,
+    boxes: np.ndarray,
+    masks: np.ndarray,
+    class_ids: np.ndarray,
+    class_names: Sequence[str],
+    scores: Optional[Sequence[float]] = None,
+    show_mask: bool = True,
+    show_bbox: bool = True,
+    colors: Optional[np.ndarray] = None,
+    captions: Optional[Sequence[str]] = None,
+    polygons: Optional[Sequence[Sequence[np.ndarray]]] = None,
+) -> PIL.Image.Image:
+    """Render instances onto an image, like ``display_instances`` but without
+    matplotlib.
+
+    Args:
+        image: ``(H, W, 3)`` uint8 image, not modified.
+        boxes: ``(N, 4)`` boxes ``(x1, y1, x2, y2)`` in pixels.
+        masks: ``(N, H, W)`` binary masks.
+        class_ids: ``(N,)`` class ids.
+        class_names: Names of classes for captions.
+        scores: Optional scores shown in captions.
+        show_mask: Fill masks.
+        show_bbox: Draw dashed bounding boxes.
+        colors: ``(N, 3)`` uint8 color of each instance.
+        captions: Captions to use instead of class names and scores.
+        polygons: ``(K, 2)`` ``(x, y)`` outline polygons of each instance in
+            pixels, drawn instead of tracing the masks' boundaries.
+
+    Returns:
+        The rendered image, with mask fills, mask contours, boxes and captions.
+        Where masks overlap, the highest scoring instance is shown.
+    """
+    n_instances = len(boxes)
+    if colors is None:
+        colors = np.full((n_instances, 3), 255, dtype=np.uint8)
+    rendered = np.array(image[..., :3], dtype=np.uint8)
+    # Higher scoring instances are drawn over lower scoring ones.
+    order = None if scores is None else np.argsort(scores, kind="stable")
+    composite_masks(
+        rendered,
+        label_map(masks, order),
+        colors,
+        fill=show_mask,
+        outline=polygons is None,
+    )
+
+    rendered_img = PIL.Image.fromarray(rendered).convert("RGBA")
+    if polygons is not None:
+        outline_draw = PIL.ImageDraw.Draw(rendered_img)
+        for i in range(n_instances) if order is None else order:
+            color = tuple(int(c) for c in colors[i]) + (255,)
+            for polygon in polygons[i]:
+                points = [(float(x), float(y)) for x, y in polygon]
+                outline_draw.line(points + points[:1], fill=color, width=1)
+    overlay = PIL.Image.new("RGBA", rendered_img.size, (0, 0, 0, 0))
+    draw = PIL.ImageDraw.Draw(overlay)
+    font = PIL.ImageFont.load_default()
+    for i in range(n_instances):
+        if not np.any(boxes[i]):
+            continue
+        x1, y1, x2, y2 = (int(coord) for coord in boxes[i])
+        if show_bbox:
+            color = tuple(int(c) for c in colors[i]) + (round(BOX_ALPHA * 255),)
+            _draw_dashed_rectangle(draw, (x1, y1, x2, y2), color)
+        if captions is None:
+            label = class_names[class_ids[i]]
+            score = scores[i] if scores is not None else None
+            caption = "{} {:.3f}".format(label, score) if score else label
+        else:
+            caption = captions[i]
+        width, height = _text_size(draw, caption, font)
+        draw.rectangle([x1, y1, x1 + width + 4, y1 + height + 4], fill=(0, 0, 0, 96))
+        draw.text((x1 + 2, y1 + 2), caption, fill=(255, 255, 255, 255), font=font)
+    return PIL.Image.alpha_composite(rendered_img, overlay).convert("RGB")
@@ -0,0 +1,262 @@
+"""
+Rendering detections over every frame of a video, spread over processes.
+"""
+import io
+import re
+import shutil
+import subprocess
+from collections import deque
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+import PIL.Image
+import numpy as np
+
+from epic_kitchens.masks.io import iter_serialized_detections
+from epic_kitchens.masks.polygons import VideoPolygons, load_polygons
+from epic_kitchens.masks.types import FrameObjectDetections, VideoDetections
+from epic_kitchens.masks.visualisation import BACKEND_RASTER, DetectionRenderer
+
+__all__ = ["iter_frame_files", "render_video"]
+
+# The naming of the extracted EPIC-KITCHENS frames.
+FRAME_TEMPLATE = "frame_{:010d}.jpg"
+
+Frame = Union[Path, str, PIL.Image.Image]
+
+_worker_renderer: Optional[DetectionRenderer] = None
+
+
+def iter_frame_files(frames_dir: Union[Path, str]) -> Iterator[Tuple[int, Path]]:
+    """Yield ``(frame_number, path)`` of the images in a directory of extracted
+    frames (e.g. ``frame_0000000001.jpg``), ordered by frame number.
+    """
+    extensions = PIL.Image.registered_extensions()
+    frames = []
+    for path in Path(frames_dir).iterdir():
+        match = re.search(r"(\d+)$", path.stem)
+        if match is not None and path.suffix.lower() in extensions:
+            frames.append((int(match.group(1)), path))
+    return iter(sorted(frames))
+
+
+def _as_video_detections(
+    detections: Union[Path, str, VideoDetections, Iterable[FrameObjectDetections]]
+) -> VideoDetections:
+    if isinstance(detections, VideoDetections):
+        return detections
+    if isinstance(detections, (Path, str)):
+        return VideoDetections.from_protobuf_strs(
+            Path(detections).stem, iter_serialized_detections(detections)
+        )
+    frames = list(detections)
+    return VideoDetections.from_frames(frames[0].video_id if frames else "", frames)
+
+
+def _render_frame(
+    renderer: DetectionRenderer,
+    frame: Frame,
+    detections: FrameObjectDetections,
+    polygons: Optional[List[List[np.ndarray]]],
+    image_format: str,
+) -> bytes:
+    img = frame if isinstance(frame, PIL.Image.Image) else PIL.Image.open(frame)
+    rendered = renderer.render_detections(img.convert("RGB"), detections, polygons)
+    buffer = io.BytesIO()
+    rendered.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def _init_worker(renderer: DetectionRenderer) -> None:
+    global _worker_renderer
+    _worker_renderer = renderer
+
+
+def _render_frame_in_worker(
+    frame: Frame,
+    detections: FrameObjectDetections,
+    polygons: Optional[List[List[np.ndarray]]],
+    image_format: str,
+) -> bytes:
+    return _render_frame(_worker_renderer, frame, detections, polygons, image_format)
+
+
+def _pop_result(pending: deque) -> Tuple[int, bytes]:
+    frame_number, result = pending.popleft()
+    return frame_number, result.get()
+
+
+def _ffmpeg_command(ffmpeg: str, fps: float, video_path: Path) -> List[str]:
+    return [
+        ffmpeg,
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "image2pipe",
+        "-framerate",
+        str(fps),
+        "-i",
+        "-",
+        # yuv420p needs even dimensions.
+        "-vf",
+        "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+        "-c:v",
+        "libx264",
+        "-pix_fmt",
+        "yuv420p",
+        str(video_path),
+    ]
+
+
+def render_video(
+    frames: Union[Path, str, Iterable[Tuple[int, Frame]]],
+    detections: Union[Path, str, VideoDetections, Iterable[FrameObjectDetections]],
+    out_dir: Union[Path, str],
+    workers: int = 1,
+    renderer: Optional[DetectionRenderer] = None,
+    output_template: str = FRAME_TEMPLATE,
+    max_pending: Optional[int] = None,
+    video_path: Optional[Union[Path, str]] = None,
+    fps: float = 50,
+    ffmpeg: str = "ffmpeg",
+    progress: Optional[Callable[[int], None]] = None,
+    polygons: Optional[Union[Path, str, VideoPolygons]] = None,
+) -> int:
+    """Render detections over each frame of a video to numbered images.
+
+    Frames are streamed to a pool of ``workers`` processes which render and
+    encode them. At most ``max_pending`` frames (default ``4 * workers``) are in
+    flight at once; finished frames wait in that window until the frames
+    before them are done, so outputs are written in order with bounded memory.
+
+    Args:
+        frames: A directory of extracted frames (see :func:`iter_frame_files`)
+            or an iterable of ``(frame_number, image)`` pairs, where images are
+            paths or ``PIL.Image``\\ s. Paths are opened by the workers.
+        detections: The video's detections, or a detections file to load them
+            from. Frames without detections are written without overlays.
+        out_dir: Directory to write the rendered frames to.
+        workers: Number of rendering processes. With ``workers=1`` frames are
+            rendered in the calling process.
+        renderer: Renderer to use, defaults to a ``DetectionRenderer`` with the
+            ``raster`` backend. Each worker gets a copy (with an empty mask
+            cache).
+        output_template: Name of each rendered frame, formatted with the frame
+            number. Its extension sets the image format.
+        max_pending: Maximum number of frames rendering at once.
+        video_path: If given, also encode the frames to this H.264 video by
+            piping them to ``ffmpeg`` as they're written.
+        fps: Frame rate of the video.
+        ffmpeg: Name or path of the ``ffmpeg`` binary.
+        progress: Called with the frame number of each frame once written.
+        polygons: Precomputed outlines of the detections (see
+            :mod:`epic_kitchens.masks.polygons`), or a file to load them from,
+            to draw instead of tracing masks. They must cover every frame with
+            detections.
+
+    Returns:
+        The number of frames rendered.
+
+    Raises:
+        FileNotFoundError: If ``video_path`` is given but ``ffmpeg`` can't be
+            found.
+        subprocess.CalledProcessError: If ``ffmpeg`` fails.
+        ValueError: If ``polygons`` are missing a frame or don't match its
+            detections.
+    """
+    if renderer is None:
+        renderer = DetectionRenderer(backend=BACKEND_RASTER)
+    if isinstance(frames, (Path, str)):
+        frames = iter_frame_files(frames)
+    video = _as_video_detections(detections)
+    frame_idxs = {
+        frame_number: frame_idx
+        for frame_idx, frame_number in enumerate(video.frame_numbers.tolist())
+    }
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    image_format = PIL.Image.registered_extensions()[
+        Path(output_template).suffix.lower()
+    ]
+    if max_pending is None:
+        max_pending = 4 * workers
+    polygons_source = None
+    if isinstance(polygons, (Path, str)):
+        polygons_source = str(polygons)
+        polygons = load_polygons(polygons)
+    elif polygons is not None:
+        polygons_source = f"the polygons of {polygons.video_id}"
+
+    def jobs() -> Iterator[Tuple[int, tuple]]:
+        for frame_number, frame in frames:
+            frame_polygons = None
+            if frame_number in frame_idxs:
+                frame_detections = video.frame(frame_idxs[frame_number])
+                if polygons is not None:
+                    # Checked here rather than in the workers, so stale or
+                    # partial polygon files fail with a clear error.
+                    if frame_number not in polygons:
+                        raise ValueError(
+                            f"Frame {frame_number} has detections but isn't in "
+                            f"{polygons_source}"
+                        )
+                    frame_polygons = polygons.frame(frame_number)
+                    n_objects = video.n_objects_per_frame[frame_idxs[frame_number]]
+                    if len(frame_polygons) != n_objects:
+                        raise ValueError(
+                            f"Frame {frame_number} has {n_objects} objects but "
+                            f"{len(frame_polygons)} in {polygons_source}"
+                        )
+            else:
+                frame_detections = FrameObjectDetections(
+                    video_id=video.video_id, frame_number=frame_number, objects=[]
+                )
+            yield frame_number, (frame, frame_detections, frame_polygons, image_format)
+
+    encoder = None
+    if video_path is not None:
+        ffmpeg_path = shutil.which(ffmpeg)
+        if ffmpeg_path is None:
+            raise FileNotFoundError(f"Couldn't find {ffmpeg!r} to encode the video")
+        encoder = subprocess.Popen(
+            _ffmpeg_command(ffmpeg_path, fps, Path(video_path)), stdin=subprocess.PIPE
+        )
+
+    def write(frame_number: int, encoded: bytes) -> None:
+        with open(out_dir / output_template.format(frame_number), "wb") as f:
+            f.write(encoded)
+        if encoder is not None:
+            encoder.stdin.write(encoded)
+        if progress is not None:
+            progress(frame_number)
+
+    n_frames = 0
+    try:
+        if workers <= 1:
+            for frame_number, args in jobs():
+                write(frame_number, _render_frame(renderer, *args))
+                n_frames += 1
+        else:
+            with Pool(workers, initializer=_init_worker, initargs=(renderer,)) as pool:
+                pending = deque()
+                for frame_number, args in jobs():
+                    if len(pending) >= max_pending:
+                        write(*_pop_result(pending))
+                        n_frames += 1
+                    result = pool.apply_async(_render_frame_in_worker, args)
+                    pending.append((frame_number, result))
+                while pending:
+                    write(*_pop_result(pending))
+                    n_frames += 1
+    except BaseException:
+        if encoder is not None:
+            encoder.kill()
+            encoder.wait()
+        raise
+    if encoder is not None:
+        encoder.stdin.close()
+        if encoder.wait() != 0:
+            raise subprocess.CalledProcessError(encoder.returncode, encoder.args)
+    return n_frames
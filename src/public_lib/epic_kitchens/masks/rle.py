@@ -0,0 +1,217 @@
+"""
+Helpers operating on the COCO run-length encoded masks stored with each
+detection.
+"""
+from typing import Collection, Iterable, Optional, Sequence
+
+import numpy as np
+from pycocotools.mask import area as coco_mask_area
+from pycocotools.mask import decode as coco_mask_decode
+from pycocotools.mask import iou as coco_mask_iou
+from pycocotools.mask import toBbox as coco_mask_to_bbox
+
+__all__ = [
+    "MASK_HEIGHT",
+    "MASK_WIDTH",
+    "decode_masks",
+    "decode_rles",
+    "rle_areas",
+    "rle_bboxes",
+    "rle_ious",
+    "rle_lengths",
+]
+
+MASK_HEIGHT = 100
+MASK_WIDTH = 100
+
+# Longest run length string that fits in an int64 (5 bits per character).
+_MAX_COUNT_CHARS = 12
+# Bytes of RLE strings parsed at once by rle_lengths, bounding its temporaries.
+_RLE_LENGTHS_BATCH_BYTES = 2 ** 22
+
+
+def to_coco_rles(rles: Iterable[bytes]) -> list:
+    return [{"counts": counts, "size": [MASK_HEIGHT, MASK_WIDTH]} for counts in rles]
+
+
+def decode_rles(rles: Sequence[bytes], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Decode RLE mask counts into a ``(N, 100, 100)`` uint8 array.
+
+    All masks are decoded by a single pycocotools call. If ``out`` is given
+    (a C-contiguous uint8 array of shape ``(M, 100, 100)`` with ``M >= N``)
+    masks are written into it and ``out[:N]`` is returned.
+    """
+    n = len(rles)
+    if out is None:
+        out = np.empty((n, MASK_HEIGHT, MASK_WIDTH), dtype=np.uint8)
+    elif (
+        out.dtype != np.uint8
+        or out.shape[1:] != (MASK_HEIGHT, MASK_WIDTH)
+        or out.shape[0] < n
+    ):
+        raise ValueError(
+            f"Expected out to be a uint8 array of shape (>={n}, {MASK_HEIGHT}, "
+            f"{MASK_WIDTH}) but was a {out.dtype} array of shape {out.shape}"
+        )
+    if n == 0:
+        return out[:0]
+    # pycocotools returns (H, W, N) in Fortran order.
+    np.copyto(out[:n], coco_mask_decode(to_coco_rles(rles)).transpose(2, 0, 1))
+    return out[:n]
+
+
+def decode_masks(
+    detections: Iterable,
+    frames: Optional[Collection[int]] = None,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Decode the masks of many frames into one ``(N, 100, 100)`` array.
+
+    Args:
+        detections: Frame detections (e.g. the output of ``load_detections``).
+        frames: Frame numbers to decode masks of, defaults to all frames.
+        out: Optional preallocated output, see :func:`decode_rles`.
+
+    Returns:
+        The masks of all objects of the selected frames, in order.
+    """
+    if frames is not None:
+        frames = set(frames)
+    rles = []
+    for frame_detections in detections:
+        if frames is None or frame_detections.frame_number in frames:
+            rles.extend(frame_detections.rles())
+    return decode_rles(rles, out=out)
+
+
+def rle_areas(rles: Sequence[bytes]) -> np.ndarray:
+    """Number of foreground pixels of each (100 x 100) mask, without decoding."""
+    if len(rles) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return coco_mask_area(to_coco_rles(rles)).astype(np.int64)
+
+
+def rle_bboxes(rles: Sequence[bytes]) -> np.ndarray:
+    """Tight bounding boxes of masks, without decoding.
+
+    Returns:
+        A ``(N, 4)`` float32 array of ``(left, top, right, bottom)`` boxes,
+        normalized by the mask size like :class:`BBox`. Empty masks have an
+        all-zero box.
+    """
+    if len(rles) == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    xywh = coco_mask_to_bbox(to_coco_rles(rles)).reshape(-1, 4)
+    return np.stack(
+        [
+            xywh[:, 0] / MASK_WIDTH,
+            xywh[:, 1] / MASK_HEIGHT,
+            (xywh[:, 0] + xywh[:, 2]) / MASK_WIDTH,
+            (xywh[:, 1] + xywh[:, 3]) / MASK_HEIGHT,
+        ],
+        axis=1,
+    ).astype(np.float32)
+
+
+def rle_ious(rles_a: Sequence[bytes], rles_b: Sequence[bytes]) -> np.ndarray:
+    """Pairwise mask IoU between two sets of masks, without decoding.
+
+    Returns:
+        A ``(len(rles_a), len(rles_b))`` float64 array.
+    """
+    if len(rles_a) == 0 or len(rles_b) == 0:
+        return np.zeros((len(rles_a), len(rles_b)))
+    return np.asarray(
+        coco_mask_iou(
+            to_coco_rles(rles_a), to_coco_rles(rles_b), [0] * len(rles_b)
+        )
+    ).reshape(len(rles_a), len(rles_b))
+
+
+def _segmented_cumsum(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    # Cumulative sums restarting at each group, for values sorted by group.
+    cumsum = np.cumsum(values)
+    is_start = np.r_[True, groups[1:] != groups[:-1]]
+    group_starts = np.flatnonzero(is_start)
+    before_group = np.r_[0, cumsum[group_starts[1:] - 1]]
+    return cumsum - np.repeat(before_group, np.diff(np.r_[group_starts, len(values)]))
+
+
+def _rle_lengths(blob: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    blob = blob.astype(np.int64)
+    offsets = offsets - offsets[0]
+    n_rles = len(offsets) - 1
+    lengths = np.zeros(n_rles, dtype=np.int64)
+    if len(blob) == 0:
+        return lengths
+    malformed = np.zeros(n_rles, dtype=bool)
+    rle_sizes = np.diff(offsets)
+    byte_rles = np.repeat(np.arange(n_rles), rle_sizes)
+
+    # Each run is a little-endian sequence of 5 bit groups, stored as
+    # characters from 48 with bit 0x20 set on all but the last one. The last
+    # group's 0x10 bit is the sign.
+    values = blob - 48
+    malformed[byte_rles[(values < 0) | (values > 63)]] = True
+    values &= 0x3F
+    is_last = (values & 0x20) == 0
+    rle_ends = offsets[1:][rle_sizes > 0] - 1
+    malformed[byte_rles[rle_ends[~is_last[rle_ends]]]] = True
+    is_last[rle_ends] = True
+
+    run_ends = np.flatnonzero(is_last)
+    run_starts = np.r_[0, run_ends[:-1] + 1]
+    run_n_chars = run_ends - run_starts + 1
+    malformed[byte_rles[run_ends[run_n_chars > _MAX_COUNT_CHARS]]] = True
+    char_idx = np.arange(len(values)) - np.repeat(run_starts, run_n_chars)
+    shifted = (values & 0x1F) << (5 * np.minimum(char_idx, _MAX_COUNT_CHARS))
+    runs = np.add.reduceat(shifted, run_starts)
+    negative = (values[run_ends] & 0x10) != 0
+    runs[negative] -= np.int64(1) << (
+        5 * np.minimum(run_n_chars[negative], _MAX_COUNT_CHARS)
+    )
+
+    # From the fourth run on, runs are stored as the difference to the run two
+    # before, i.e. odd runs and even runs after the first are cumulative sums.
+    run_rles = byte_rles[run_ends]
+    runs_per_rle = np.bincount(run_rles, minlength=n_rles)
+    run_offsets = np.r_[0, np.cumsum(runs_per_rle)[:-1]]
+    run_idx = np.arange(len(runs)) - np.repeat(run_offsets, runs_per_rle)
+    for is_delta in ((run_idx % 2 == 1), (run_idx % 2 == 0) & (run_idx > 0)):
+        if is_delta.any():
+            runs[is_delta] = _segmented_cumsum(runs[is_delta], run_rles[is_delta])
+
+    malformed[run_rles[runs < 0]] = True
+    rles_with_runs = np.flatnonzero(runs_per_rle)
+    lengths[rles_with_runs] = np.add.reduceat(runs, run_offsets[rles_with_runs])
+    lengths[malformed] = -1
+    return lengths
+
+
+def rle_lengths(rle_blob: np.ndarray, rle_offsets: np.ndarray) -> np.ndarray:
+    """Number of pixels covered by the runs of many COCO RLEs, without decoding.
+
+    RLE ``j`` is the compressed counts string
+    ``rle_blob[rle_offsets[j]:rle_offsets[j + 1]]`` (as stored by
+    :class:`VideoDetections`). Strings are parsed in large batches with NumPy,
+    so this is a cheap structural check: a well formed 100 x 100 mask has
+    length 10000.
+
+    Returns:
+        An int64 array of lengths, -1 for malformed strings (characters outside
+        the encoding, a truncated final run or negative runs).
+    """
+    blob = np.asarray(rle_blob, dtype=np.uint8)
+    offsets = np.asarray(rle_offsets, dtype=np.int64)
+    lengths = np.empty(len(offsets) - 1, dtype=np.int64)
+    start = 0
+    while start < len(lengths):
+        stop = int(
+            np.searchsorted(offsets, offsets[start] + _RLE_LENGTHS_BATCH_BYTES, "right")
+        )
+        stop = min(max(stop - 1, start + 1), len(lengths))
+        lengths[start:stop] = _rle_lengths(
+            blob[offsets[start] : offsets[stop]], offsets[start : stop + 1]
+        )
+        start = stop
+    return lengths
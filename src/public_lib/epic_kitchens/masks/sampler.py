@@ -0,0 +1,193 @@
+"""
+Batches of fixed resolution masks (and their boxes, classes and scores) for
+model training.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from epic_kitchens.masks.cache import MaskCache
+from epic_kitchens.masks.resize import resize_rles
+from epic_kitchens.masks.rle import MASK_HEIGHT, MASK_WIDTH, decode_rles
+from epic_kitchens.masks.types import VideoDetections
+
+__all__ = ["MaskBatch", "MaskSampler"]
+
+# Class id of padding slots.
+PAD_CLASS = -1
+
+
+@dataclass
+class MaskBatch:
+    """Padded per-object arrays of a batch of frames.
+
+    ``valid[b, i]`` is ``True`` if slot ``i`` of frame ``b`` holds an object;
+    padding slots have all-zero masks, boxes and scores and a class of -1.
+    """
+
+    masks: np.ndarray  # (B, max_objects, H, W) uint8
+    bboxes: np.ndarray  # (B, max_objects, 4) float32, normalized ltrb
+    classes: np.ndarray  # (B, max_objects) int32
+    scores: np.ndarray  # (B, max_objects) float32
+    valid: np.ndarray  # (B, max_objects) bool
+
+    @staticmethod
+    def empty(
+        batch_size: int, max_objects: int, height: int, width: int
+    ) -> "MaskBatch":
+        return MaskBatch(
+            masks=np.zeros((batch_size, max_objects, height, width), dtype=np.uint8),
+            bboxes=np.zeros((batch_size, max_objects, 4), dtype=np.float32),
+            classes=np.full((batch_size, max_objects), PAD_CLASS, dtype=np.int32),
+            scores=np.zeros((batch_size, max_objects), dtype=np.float32),
+            valid=np.zeros((batch_size, max_objects), dtype=bool),
+        )
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+    def __getitem__(self, key: slice) -> "MaskBatch":
+        return MaskBatch(
+            masks=self.masks[key],
+            bboxes=self.bboxes[key],
+            classes=self.classes[key],
+            scores=self.scores[key],
+            valid=self.valid[key],
+        )
+
+
+class MaskSampler:
+    """Gather the detections of ``(video_id, frame_number)`` keys into a
+    :class:`MaskBatch` with masks resized to ``height x width``.
+
+    Frames with more than ``max_objects`` objects keep their highest scoring
+    ones. Frames are decoded and resized by a pool of ``workers`` threads
+    (NumPy releases the GIL while resizing) straight into the output arrays.
+    Resized masks are cached in ``mask_cache`` if given, see
+    :func:`~epic_kitchens.masks.resize.resize_rles`.
+
+    The output arrays are allocated once and reused by every call to
+    :meth:`sample`, so a batch is only valid until the next one is sampled.
+    To keep several batches alive (e.g. while one is copied to a GPU), pass
+    buffers from :meth:`allocate` as ``out``.
+
+    Example::
+
+        videos = {video.video_id: video for video in load_dataset(root, workers=8)}
+        with MaskSampler(videos, 56, 56, max_objects=20, workers=8) as sampler:
+            batch = sampler.sample([("P01_01", 1), ("P01_01", 31), ("P02_03", 7)])
+            batch.masks.shape  # (3, 20, 56, 56)
+    """
+
+    def __init__(
+        self,
+        videos: Mapping[str, VideoDetections],
+        height: int,
+        width: int,
+        max_objects: int,
+        smooth: bool = True,
+        workers: int = 0,
+        mask_cache: Optional[MaskCache] = None,
+    ):
+        self.videos = videos
+        self.height = height
+        self.width = width
+        self.max_objects = max_objects
+        self.smooth = smooth
+        self.mask_cache = mask_cache
+        self._frame_lookups: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._out: Optional[MaskBatch] = None
+        self._pool = ThreadPoolExecutor(workers) if workers > 0 else None
+
+    def __enter__(self) -> "MaskSampler":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def allocate(self, batch_size: int) -> MaskBatch:
+        return MaskBatch.empty(batch_size, self.max_objects, self.height, self.width)
+
+    def _frame_idx(self, video_id: str, frame_number: int) -> int:
+        if video_id not in self._frame_lookups:
+            frame_numbers = self.videos[video_id].frame_numbers
+            order = np.argsort(frame_numbers, kind="stable")
+            self._frame_lookups[video_id] = (frame_numbers[order], order)
+        sorted_frame_numbers, order = self._frame_lookups[video_id]
+        i = np.searchsorted(sorted_frame_numbers, frame_number)
+        if i == len(sorted_frame_numbers) or sorted_frame_numbers[i] != frame_number:
+            raise KeyError(f"Frame {frame_number} not in {video_id}")
+        return int(order[i])
+
+    def _fill(self, out: MaskBatch, b: int, key: Tuple[str, int]) -> None:
+        video_id, frame_number = key
+        video = self.videos[video_id]
+        object_slice = video.object_slice(self._frame_idx(video_id, frame_number))
+        object_idxs = np.arange(object_slice.start, object_slice.stop)
+        if len(object_idxs) > self.max_objects:
+            top = np.argsort(-video.score[object_idxs], kind="stable")
+            object_idxs = np.sort(object_idxs[top[: self.max_objects]])
+        n = len(object_idxs)
+
+        out.bboxes[b, :n] = video.bbox[object_idxs]
+        out.bboxes[b, n:] = 0
+        out.classes[b, :n] = video.pred_class[object_idxs]
+        out.classes[b, n:] = PAD_CLASS
+        out.scores[b, :n] = video.score[object_idxs]
+        out.scores[b, n:] = 0
+        out.valid[b, :n] = True
+        out.valid[b, n:] = False
+
+        rles = [video.rle(object_idx) for object_idx in object_idxs]
+        if (self.height, self.width) == (MASK_HEIGHT, MASK_WIDTH):
+            decode_rles(rles, out=out.masks[b])
+        else:
+            resize_rles(
+                rles,
+                self.height,
+                self.width,
+                smooth=self.smooth,
+                cache=self.mask_cache,
+                out=out.masks[b],
+            )
+        out.masks[b, n:] = 0
+
+    def sample(
+        self, keys: Sequence[Tuple[str, int]], out: Optional[MaskBatch] = None
+    ) -> MaskBatch:
+        """Gather the frames of ``keys`` (``(video_id, frame_number)`` pairs).
+
+        Args:
+            keys: Frames to sample.
+            out: Buffers to write into, with room for at least ``len(keys)``
+                frames. Defaults to buffers owned by the sampler.
+
+        Returns:
+            ``out[:len(keys)]``.
+        """
+        if out is None:
+            if self._out is None or len(self._out) < len(keys):
+                self._out = self.allocate(len(keys))
+            out = self._out
+        elif len(out) < len(keys) or out.masks.shape[1:] != (
+            self.max_objects,
+            self.height,
+            self.width,
+        ):
+            raise ValueError(
+                f"Expected out to hold ({len(keys)}, {self.max_objects}, "
+                f"{self.height}, {self.width}) masks but was {out.masks.shape}"
+            )
+        if self._pool is None:
+            for b, key in enumerate(keys):
+                self._fill(out, b, key)
+        else:
+            # Consume the results so exceptions are raised.
+            list(self._pool.map(self._fill, [out] * len(keys), range(len(keys)), keys))
+        return out[: len(keys)]
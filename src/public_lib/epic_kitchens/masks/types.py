@@ -1,12 +1,31 @@
-from typing import List
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator, List, Optional, Union
 
 import numpy as np
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pycocotools.mask import decode as coco_mask_decode
 
 import epic_kitchens.masks.types_pb2 as pb
+from epic_kitchens.masks._wire import decode_frame_detections
+from epic_kitchens.masks.cache import MaskCache
+from epic_kitchens.masks.coco import to_class_ids
+from epic_kitchens.masks.rle import (
+    MASK_HEIGHT,
+    MASK_WIDTH,
+    decode_rles,
+    rle_areas,
+    rle_bboxes,
+    rle_ious,
+)
 
-__all__ = ["BBox", "FrameObjectDetections", "ObjectDetection"]
+__all__ = [
+    "BBox",
+    "FrameObjectDetections",
+    "LazyFrameObjectDetections",
+    "FrameView",
+    "ObjectDetection",
+    "VideoDetections",
+]
 
 
 @dataclass
@@ -65,12 +84,63 @@ class ObjectDetection:
     def mask(self) -> np.ndarray:
         return coco_mask_decode({
             'counts': self._coco_mask_counts,
-            'size': [100, 100]
+            'size': [MASK_HEIGHT, MASK_WIDTH]
         })
 
+    @property
+    def mask_area(self) -> int:
+        """Number of pixels in the (100 x 100) mask."""
+        return int(rle_areas([self._coco_mask_counts])[0])
+
+    @property
+    def mask_bbox(self) -> BBox:
+        """Tight normalized bounding box of the mask."""
+        left, top, right, bottom = rle_bboxes([self._coco_mask_counts])[0].tolist()
+        return BBox(left=left, top=top, right=right, bottom=bottom)
+
+    def mask_iou(self, other: "ObjectDetection") -> float:
+        ious = rle_ious([self._coco_mask_counts], [other._coco_mask_counts])
+        return float(ious[0, 0])
+
+
+class _FrameMasksMixin(ABC):
+    """Mask operations shared by the eager and lazy frame detection types.
+
+    These only need :meth:`rles`.
+    """
+
+    @abstractmethod
+    def rles(self) -> List[bytes]:
+        """The COCO RLE mask counts of each object."""
+
+    def masks(
+        self, out: Optional[np.ndarray] = None, cache: Optional[MaskCache] = None
+    ) -> np.ndarray:
+        """Decode the masks of all objects into a ``(N, 100, 100)`` uint8 array.
+
+        If a ``cache`` is given, decoded masks are looked up in/added to it.
+        """
+        if cache is not None:
+            return cache.masks(self.rles(), out=out)
+        return decode_rles(self.rles(), out=out)
+
+    def mask_areas(self) -> np.ndarray:
+        return rle_areas(self.rles())
+
+    def mask_bboxes(self) -> np.ndarray:
+        return rle_bboxes(self.rles())
+
+    def mask_iou(self, other: Optional["_FrameMasksMixin"] = None) -> np.ndarray:
+        """Pairwise mask IoU between the objects of this frame and ``other``.
+
+        Defaults to the IoU between the objects of this frame.
+        """
+        other_rles = self.rles() if other is None else other.rles()
+        return rle_ious(self.rles(), other_rles)
+
 
 @dataclass
-class FrameObjectDetections:
+class FrameObjectDetections(_FrameMasksMixin):
     video_id: str
     frame_number: int
     objects: List[ObjectDetection]
@@ -99,3 +169,404 @@ class FrameObjectDetections:
         detections.objects.extend([obj.to_protobuf() for obj in self.objects])
         assert detections.IsInitialized()
         return detections
+
+    def rles(self) -> List[bytes]:
+        return [obj._coco_mask_counts for obj in self.objects]
+
+
+class LazyFrameObjectDetections(_FrameMasksMixin):
+    """A frame of detections that only builds :class:`ObjectDetection` on access.
+
+    Holds on to the parsed protobuf message, so ``frame_number``, ``len()`` and
+    the per-field accessors are cheap. ``objects`` and indexing build (and
+    cache) the dataclasses.
+    """
+
+    def __init__(self, video_id: str, frame_detections: pb.FrameObjectDetections):
+        self.video_id = video_id
+        self._pb = frame_detections
+        self._objects: Optional[List[ObjectDetection]] = None
+
+    @staticmethod
+    def from_protobuf_str(video_id: str, pb_str: bytes) -> "LazyFrameObjectDetections":
+        detections = pb.FrameObjectDetections()
+        detections.MergeFromString(pb_str)
+        return LazyFrameObjectDetections(video_id, detections)
+
+    @property
+    def frame_number(self) -> int:
+        return self._pb.frame_number
+
+    def __len__(self) -> int:
+        return len(self._pb.objects)
+
+    def __getitem__(self, idx: int) -> ObjectDetection:
+        if self._objects is not None:
+            return self._objects[idx]
+        return ObjectDetection.from_protobuf(self._pb.objects[idx])
+
+    def __repr__(self) -> str:
+        return (
+            f"LazyFrameObjectDetections(video_id={self.video_id!r}, "
+            f"frame_number={self.frame_number}, n_objects={len(self)})"
+        )
+
+    @property
+    def objects(self) -> List[ObjectDetection]:
+        if self._objects is None:
+            self._objects = [
+                ObjectDetection.from_protobuf(obj) for obj in self._pb.objects
+            ]
+        return self._objects
+
+    @property
+    def scores(self) -> np.ndarray:
+        return np.array([obj.score for obj in self._pb.objects], dtype=np.float32)
+
+    @property
+    def pred_classes(self) -> np.ndarray:
+        return np.array([obj.pred_class for obj in self._pb.objects], dtype=np.int32)
+
+    @property
+    def bboxes(self) -> np.ndarray:
+        return np.array(
+            [
+                (obj.bbox.left, obj.bbox.top, obj.bbox.right, obj.bbox.bottom)
+                for obj in self._pb.objects
+            ],
+            dtype=np.float32,
+        ).reshape(-1, 4)
+
+    def to_protobuf(self) -> pb.FrameObjectDetections:
+        return self._pb
+
+    def rles(self) -> List[bytes]:
+        return [obj.coco_mask for obj in self._pb.objects]
+
+    def materialize(self) -> FrameObjectDetections:
+        return FrameObjectDetections(
+            video_id=self.video_id,
+            frame_number=self.frame_number,
+            objects=list(self.objects),
+        )
+
+
+def _concat_ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenation of ``arange(start, start + length)`` for each pair."""
+    lengths = lengths.astype(np.int64)
+    if len(lengths) == 0:
+        return np.zeros(0, dtype=np.int64)
+    range_starts = np.cumsum(lengths) - lengths
+    return np.repeat(starts - range_starts, lengths) + np.arange(lengths.sum())
+
+
+def _offsets(lengths: np.ndarray) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+@dataclass(eq=False)
+class VideoDetections:
+    """All detections of a video stored as flat columns.
+
+    Objects of frame ``frame_numbers[i]`` occupy rows
+    ``frame_offsets[i]:frame_offsets[i + 1]`` of the per-object columns, and the
+    COCO RLE counts of object ``j`` are ``rle_blob[rle_offsets[j]:rle_offsets[j + 1]]``.
+
+    Indexing with an integer gives a :class:`FrameView` of a frame and iterating
+    yields views of every frame; dataclasses are only built when asked for.
+    Slicing, :meth:`frames` and :meth:`filter` return new ``VideoDetections``,
+    sharing the underlying arrays where the selection is contiguous.
+
+    Example::
+
+        video = VideoDetections.from_frames("P01_01", load_detections("P01_01.pkl"))
+        knives = video.filter(score_threshold=0.8, classes=["knife"])
+        for frame in knives.frames(1000, 2000):
+            print(frame.frame_number, frame.score, frame.masks().shape)
+    """
+
+    video_id: str
+    frame_numbers: np.ndarray
+    frame_offsets: np.ndarray
+    bbox: np.ndarray
+    score: np.ndarray
+    pred_class: np.ndarray
+    rle_offsets: np.ndarray
+    rle_blob: np.ndarray = field(repr=False)
+
+    @staticmethod
+    def from_frames(
+        video_id: str, frames: Iterable[FrameObjectDetections]
+    ) -> "VideoDetections":
+        frame_numbers = []
+        frame_offsets = [0]
+        bbox = []
+        score = []
+        pred_class = []
+        rle_offsets = [0]
+        rles = []
+        for frame in frames:
+            frame_numbers.append(frame.frame_number)
+            for obj in frame.objects:
+                bbox.append(
+                    (obj.bbox.left, obj.bbox.top, obj.bbox.right, obj.bbox.bottom)
+                )
+                score.append(obj.score)
+                pred_class.append(obj.pred_class)
+                rles.append(obj._coco_mask_counts)
+                rle_offsets.append(rle_offsets[-1] + len(obj._coco_mask_counts))
+            frame_offsets.append(len(score))
+        return VideoDetections(
+            video_id=video_id,
+            frame_numbers=np.array(frame_numbers, dtype=np.int32),
+            frame_offsets=np.array(frame_offsets, dtype=np.int64),
+            bbox=np.array(bbox, dtype=np.float32).reshape(-1, 4),
+            score=np.array(score, dtype=np.float32),
+            pred_class=np.array(pred_class, dtype=np.int32),
+            rle_offsets=np.array(rle_offsets, dtype=np.int64),
+            rle_blob=np.frombuffer(b"".join(rles), dtype=np.uint8),
+        )
+
+    @staticmethod
+    def from_protobuf_strs(video_id: str, pb_strs: Iterable[bytes]) -> "VideoDetections":
+        """Decode serialized ``pb.FrameObjectDetections`` straight into columns.
+
+        This parses the protobuf wire format directly, skipping both protobuf
+        messages and dataclasses, so is much faster than :meth:`from_frames`.
+        """
+        return VideoDetections(video_id=video_id, **decode_frame_detections(pb_strs))
+
+    def __len__(self) -> int:
+        return len(self.frame_numbers)
+
+    def __getitem__(
+        self, key: Union[int, slice]
+    ) -> Union["FrameView", "VideoDetections"]:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self._take_frame_range(start, max(start, stop))
+            return self._take_frames(np.arange(start, stop, step))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(f"Frame index {key} out of range")
+        return FrameView(self, key)
+
+    def __iter__(self) -> Iterator["FrameView"]:
+        for frame_idx in range(len(self)):
+            yield FrameView(self, frame_idx)
+
+    @property
+    def n_objects(self) -> int:
+        return len(self.score)
+
+    @property
+    def n_objects_per_frame(self) -> np.ndarray:
+        return np.diff(self.frame_offsets)
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the columns (shared views are counted in full)."""
+        return sum(
+            column.nbytes
+            for column in (
+                self.frame_numbers,
+                self.frame_offsets,
+                self.bbox,
+                self.score,
+                self.pred_class,
+                self.rle_offsets,
+                self.rle_blob,
+            )
+        )
+
+    @property
+    def object_frame_numbers(self) -> np.ndarray:
+        """Frame number of each object."""
+        return np.repeat(self.frame_numbers, self.n_objects_per_frame)
+
+    def _take_frame_range(self, start: int, stop: int) -> "VideoDetections":
+        # Contiguous frames have contiguous objects and RLEs, so the columns can
+        # be views; only the offsets need rebasing.
+        first_obj, last_obj = self.frame_offsets[start], self.frame_offsets[stop]
+        first_byte, last_byte = self.rle_offsets[first_obj], self.rle_offsets[last_obj]
+        return VideoDetections(
+            video_id=self.video_id,
+            frame_numbers=self.frame_numbers[start:stop],
+            frame_offsets=self.frame_offsets[start : stop + 1] - first_obj,
+            bbox=self.bbox[first_obj:last_obj],
+            score=self.score[first_obj:last_obj],
+            pred_class=self.pred_class[first_obj:last_obj],
+            rle_offsets=self.rle_offsets[first_obj : last_obj + 1] - first_byte,
+            rle_blob=self.rle_blob[first_byte:last_byte],
+        )
+
+    def _take_frames(
+        self, frame_idxs: np.ndarray, object_mask: Optional[np.ndarray] = None
+    ) -> "VideoDetections":
+        object_idxs = _concat_ranges(
+            self.frame_offsets[:-1][frame_idxs], self.n_objects_per_frame[frame_idxs]
+        )
+        frame_offsets = _offsets(self.n_objects_per_frame[frame_idxs])
+        if object_mask is not None:
+            kept = object_mask[object_idxs]
+            frame_offsets = _offsets(kept)[frame_offsets]
+            object_idxs = object_idxs[kept]
+        rle_lengths = np.diff(self.rle_offsets)[object_idxs]
+        byte_idxs = _concat_ranges(self.rle_offsets[:-1][object_idxs], rle_lengths)
+        return VideoDetections(
+            video_id=self.video_id,
+            frame_numbers=self.frame_numbers[frame_idxs],
+            frame_offsets=frame_offsets,
+            bbox=self.bbox[object_idxs],
+            score=self.score[object_idxs],
+            pred_class=self.pred_class[object_idxs],
+            rle_offsets=_offsets(rle_lengths),
+            rle_blob=self.rle_blob[byte_idxs],
+        )
+
+    def frames(self, start: int, stop: int) -> "VideoDetections":
+        """Frames numbered ``start`` to ``stop`` inclusive.
+
+        If frames are stored in order of frame number (as in the release) the
+        result is a view onto this video's arrays.
+        """
+        frame_numbers = self.frame_numbers
+        if np.all(frame_numbers[1:] >= frame_numbers[:-1]):
+            return self._take_frame_range(
+                int(np.searchsorted(frame_numbers, start, side="left")),
+                int(np.searchsorted(frame_numbers, stop, side="right")),
+            )
+        return self._take_frames(
+            np.flatnonzero((frame_numbers >= start) & (frame_numbers <= stop))
+        )
+
+    def filter(
+        self,
+        score_threshold: Optional[float] = None,
+        classes: Optional[Iterable[Union[int, str]]] = None,
+    ) -> "VideoDetections":
+        """Keep objects scoring above ``score_threshold`` and of ``classes``.
+
+        All frames are kept, even if none of their objects are.
+        ``classes`` may be class ids or COCO class names.
+        """
+        object_mask = np.ones(self.n_objects, dtype=bool)
+        if score_threshold is not None:
+            object_mask &= self.score > score_threshold
+        if classes is not None:
+            object_mask &= np.isin(self.pred_class, to_class_ids(classes))
+        return self._take_frames(np.arange(len(self)), object_mask)
+
+    @property
+    def left(self) -> np.ndarray:
+        return self.bbox[:, 0]
+
+    @property
+    def top(self) -> np.ndarray:
+        return self.bbox[:, 1]
+
+    @property
+    def right(self) -> np.ndarray:
+        return self.bbox[:, 2]
+
+    @property
+    def bottom(self) -> np.ndarray:
+        return self.bbox[:, 3]
+
+    def object_slice(self, frame_idx: int) -> slice:
+        return slice(
+            int(self.frame_offsets[frame_idx]), int(self.frame_offsets[frame_idx + 1])
+        )
+
+    def rle(self, object_idx: int) -> bytes:
+        return self.rle_blob[
+            self.rle_offsets[object_idx] : self.rle_offsets[object_idx + 1]
+        ].tobytes()
+
+    def masks(
+        self, object_slice: slice = slice(None), out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Decode the masks of a contiguous range of objects (default all)."""
+        start, stop, _ = object_slice.indices(self.n_objects)
+        return decode_rles(
+            [self.rle(object_idx) for object_idx in range(start, stop)], out=out
+        )
+
+    def object_detection(self, object_idx: int) -> ObjectDetection:
+        left, top, right, bottom = self.bbox[object_idx].tolist()
+        return ObjectDetection(
+            bbox=BBox(left=left, top=top, right=right, bottom=bottom),
+            score=float(self.score[object_idx]),
+            pred_class=int(self.pred_class[object_idx]),
+            _coco_mask_counts=self.rle(object_idx),
+        )
+
+    def frame(self, frame_idx: int) -> FrameObjectDetections:
+        object_slice = self.object_slice(frame_idx)
+        return FrameObjectDetections(
+            video_id=self.video_id,
+            frame_number=int(self.frame_numbers[frame_idx]),
+            objects=[
+                self.object_detection(object_idx)
+                for object_idx in range(object_slice.start, object_slice.stop)
+            ],
+        )
+
+
+class FrameView(_FrameMasksMixin):
+    """The detections of one frame of a :class:`VideoDetections`.
+
+    Columns are views onto the video's arrays; :attr:`objects` builds
+    :class:`ObjectDetection` instances on access.
+    """
+
+    def __init__(self, video: VideoDetections, frame_idx: int):
+        self.video = video
+        self.frame_idx = frame_idx
+        self.object_slice = video.object_slice(frame_idx)
+
+    @property
+    def video_id(self) -> str:
+        return self.video.video_id
+
+    @property
+    def frame_number(self) -> int:
+        return int(self.video.frame_numbers[self.frame_idx])
+
+    def __len__(self) -> int:
+        return self.object_slice.stop - self.object_slice.start
+
+    def __repr__(self) -> str:
+        return (
+            f"FrameView(video_id={self.video_id!r}, "
+            f"frame_number={self.frame_number}, n_objects={len(self)})"
+        )
+
+    @property
+    def bbox(self) -> np.ndarray:
+        return self.video.bbox[self.object_slice]
+
+    @property
+    def score(self) -> np.ndarray:
+        return self.video.score[self.object_slice]
+
+    @property
+    def pred_class(self) -> np.ndarray:
+        return self.video.pred_class[self.object_slice]
+
+    def rles(self) -> List[bytes]:
+        return [
+            self.video.rle(object_idx)
+            for object_idx in range(self.object_slice.start, self.object_slice.stop)
+        ]
+
+    @property
+    def objects(self) -> List[ObjectDetection]:
+        return self.materialize().objects
+
+    def materialize(self) -> FrameObjectDetections:
+        return self.video.frame(self.frame_idx)
@@ -1,31 +1,28 @@
 import random
-from typing import List, Tuple
+from typing import List, Optional, Sequence, Tuple
 
 import PIL.Image
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from epic_kitchens.masks.cache import MaskCache
 from epic_kitchens.masks.types import BBox, FrameObjectDetections
 from epic_kitchens.masks._maskrcnn_visualise import display_instances, random_colors
 from epic_kitchens.masks.coco import class_names as coco_class_names
+from epic_kitchens.masks.polygons import to_pixel_polygons
+from epic_kitchens.masks.raster import render_instances, to_uint8_colors
+from epic_kitchens.masks.resize import resize_masks, resize_rles
+
+BACKEND_RASTER = "raster"
+BACKEND_MATPLOTLIB = "matplotlib"
 
 
 def resize_mask(
     mask: np.ndarray, height: int, width: int, smooth: bool = True
 ) -> np.ndarray:
     assert mask.ndim == 2
-    if smooth:
-        # The original masks seem to be
-        mask_img = PIL.Image.fromarray(mask * 255)
-        return (
-            np.asarray(
-                mask_img.resize((50, 50), PIL.Image.LANCZOS).resize(
-                    (width, height), PIL.Image.LANCZOS
-                )
-            )
-            > 128
-        ).astype(np.uint8)
-    return np.asarray(
-        PIL.Image.fromarray(mask).resize((width, height), PIL.Image.NEAREST)
-    )
+    # To resize several masks at once, use resize_masks.
+    return resize_masks(mask[np.newaxis], height, width, smooth=smooth)[0]
 
 
 def resize_bbox(bbox: BBox, height: int, width: int) -> Tuple[int, int, int, int]:
@@ -38,55 +35,110 @@ def resize_bbox(bbox: BBox, height: int, width: int) -> Tuple[int, int, int, int
 
 
 class DetectionRenderer:
+    """Draw the detections of a frame over it.
+
+    The default ``matplotlib`` backend renders the original Mask R-CNN figure
+    (at its fixed 16 x 16 inch size) and returns a screenshot of it. The much
+    faster ``raster`` backend draws straight into the frame with NumPy and PIL,
+    and colors objects by class.
+    """
+
     def __init__(
         self,
         display_mask: bool = True,
         display_bbox: bool = True,
         score_threshold: float = 0,
         smooth_mask: bool = True,
+        mask_cache: Optional[MaskCache] = None,
+        backend: str = BACKEND_MATPLOTLIB,
     ):
+        if backend not in (BACKEND_RASTER, BACKEND_MATPLOTLIB):
+            raise ValueError(f"Unknown rendering backend {backend!r}")
+        self.backend = backend
         self.display_mask = display_mask
         self.display_bbox = display_bbox
         self.score_threshold = score_threshold
         self.smooth_mask = smooth_mask
-        original_random_state = random.getstate()
-        # Ensure colors are consistent across instances of detection renderer.
-        random.seed(42)
-        self.colors = random_colors(len(coco_class_names))
-        random.setstate(original_random_state)
+        self.mask_cache = mask_cache
+        # Ensure colors are consistent across instances of detection renderer,
+        # without touching the global random state (which isn't safe to rely on
+        # with several threads).
+        self.colors = random_colors(len(coco_class_names), rng=random.Random(42))
+        self.class_colors = to_uint8_colors(self.colors)
 
     def render_detections(
-        self, img: PIL.Image.Image, detection: FrameObjectDetections
+        self,
+        img: PIL.Image.Image,
+        detection: FrameObjectDetections,
+        polygons: Optional[Sequence[Sequence[np.ndarray]]] = None,
     ) -> PIL.Image.Image:
+        """Draw the detections of a frame over it.
+
+        Outlines are traced from the masks unless ``polygons`` (normalized
+        outline polygons of each object, e.g. from
+        :meth:`~epic_kitchens.masks.polygons.VideoPolygons.frame`) are given.
+        """
+        if polygons is not None and len(polygons) != len(detection.objects):
+            raise ValueError(
+                f"Expected polygons of {len(detection.objects)} objects but got "
+                f"{len(polygons)}"
+            )
         img = img.copy()
         bboxes: List[Tuple[int, int, int, int]] = []
-        masks: [np.ndarray] = []
-
         pred_classes = []
         scores = []
-        for obj in detection.objects:
-            if obj.score > self.score_threshold:
-                pred_classes.append(obj.pred_class)
-                masks.append(
-                    resize_mask(
-                        obj.mask, img.height, img.width, smooth=self.smooth_mask
-                    )
-                )
-                bboxes.append(resize_bbox(obj.bbox, img.height, img.width))
-                scores.append(obj.score)
+        kept = [obj.score > self.score_threshold for obj in detection.objects]
+        objects = [obj for obj, keep in zip(detection.objects, kept) if keep]
+        if polygons is not None:
+            polygons = [
+                to_pixel_polygons(object_polygons, img.height, img.width)
+                for object_polygons, keep in zip(polygons, kept)
+                if keep
+            ]
+        for obj in objects:
+            pred_classes.append(obj.pred_class)
+            bboxes.append(resize_bbox(obj.bbox, img.height, img.width))
+            scores.append(obj.score)
+        # Resized masks are cached under their RLE, so static objects are only
+        # resized once per video.
+        masks = resize_rles(
+            [obj._coco_mask_counts for obj in objects],
+            img.height,
+            img.width,
+            smooth=self.smooth_mask,
+            cache=self.mask_cache,
+        )
+
+        if self.backend == BACKEND_RASTER:
+            return render_instances(
+                np.asarray(img.convert("RGB")),
+                np.array(bboxes).reshape(-1, 4),
+                masks,
+                np.array(pred_classes, dtype=np.int64),
+                coco_class_names,
+                scores=scores,
+                show_mask=self.display_mask,
+                show_bbox=self.display_bbox,
+                colors=self.class_colors[np.array(pred_classes, dtype=np.int64)],
+                polygons=polygons,
+            )
 
-        if len(masks) > 0:
-            np_masks = np.stack(masks, axis=-1)
-        else:
-            np_masks = np.zeros((img.height, img.width, 0), dtype=np.uint8)
-        return display_instances(
+        figure = Figure(figsize=(16, 16))
+        canvas = FigureCanvasAgg(figure)
+        display_instances(
             np.asarray(img),
             np.array(bboxes),
-            np_masks,
+            np.moveaxis(masks, 0, -1),
             np.array(pred_classes),
             np.array(coco_class_names),
             scores=scores,
             show_mask=self.display_mask,
             show_bbox=self.display_bbox,
             colors=self.colors,
+            ax=figure.add_subplot(1, 1, 1),
+            polygons=polygons,
         )
+        canvas.draw()
+        return PIL.Image.frombuffer(
+            "RGBA", canvas.get_width_height(), bytes(canvas.buffer_rgba())
+        ).convert("RGB")
@@ -0,0 +1,82 @@
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from epic_kitchens.masks.container import (
+    DEFAULT_CHUNK_SIZE,
+    DetectionReader,
+    available_codecs,
+)
+from epic_kitchens.masks.io import (
+    FORMAT_INDEXED,
+    DetectionWriter,
+    iter_serialized_detections,
+    load_detections,
+)
+
+parser = argparse.ArgumentParser(
+    description="Compare file size, random access latency and sequential read "
+    "throughput of indexed detections files across codecs and chunk sizes",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+)
+parser.add_argument("detections", type=Path, help="Detections file of one video")
+parser.add_argument(
+    "--chunk-sizes",
+    type=int,
+    nargs="+",
+    default=[8, 32, DEFAULT_CHUNK_SIZE, 256],
+    help="Chunk sizes (in frames) to benchmark compressed files with",
+)
+parser.add_argument(
+    "--n-lookups", type=int, default=1000, help="Number of random frame reads to time"
+)
+
+
+def benchmark(path: Path, n_lookups: int):
+    with DetectionReader(path) as reader:
+        frame_numbers = random.Random(42).choices(
+            reader.frame_numbers.tolist(), k=n_lookups
+        )
+        start = time.perf_counter()
+        for frame_number in frame_numbers:
+            reader.get_frame_bytes(frame_number)
+        lookup_s = (time.perf_counter() - start) / n_lookups
+
+    start = time.perf_counter()
+    n_frames = sum(1 for _ in iter_serialized_detections(path))
+    sequential_s = time.perf_counter() - start
+    return path.stat().st_size, lookup_s, n_frames / sequential_s
+
+
+def main(args):
+    video_id = args.detections.stem
+    configurations = [(None, DEFAULT_CHUNK_SIZE)] + [
+        (codec, chunk_size)
+        for codec in available_codecs()
+        for chunk_size in args.chunk_sizes
+    ]
+    print(
+        f"{'codec':>6} {'chunk':>6} {'size (MiB)':>11} "
+        f"{'lookup (us)':>12} {'sequential (frames/s)':>22}"
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for codec, chunk_size in configurations:
+            path = Path(tmpdir) / f"{video_id}.dets"
+            with DetectionWriter(
+                path,
+                file_format=FORMAT_INDEXED,
+                compression=codec,
+                chunk_size=chunk_size,
+            ) as writer:
+                writer.write_all(load_detections(args.detections, lazy=True))
+            size, lookup_s, frames_per_s = benchmark(path, args.n_lookups)
+            print(
+                f"{codec or 'none':>6} {chunk_size if codec else '-':>6} "
+                f"{size / 2 ** 20:>11.2f} {lookup_s * 1e6:>12.1f} {frames_per_s:>22.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main(parser.parse_args())
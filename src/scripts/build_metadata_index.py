@@ -0,0 +1,24 @@
+import argparse
+from pathlib import Path
+
+from epic_kitchens.masks.dataset import build_metadata_index
+
+parser = argparse.ArgumentParser(
+    description="Index the object metadata (class, score, bbox) of every video for fast querying",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+)
+parser.add_argument(
+    "detections_root", type=Path, help="Directory containing Pxx/Pxx_yy.pkl detections"
+)
+parser.add_argument("index", type=Path, help="Path to write the metadata index to")
+parser.add_argument(
+    "-j", "--workers", type=int, default=1, help="Number of videos to read in parallel"
+)
+
+
+def main(args):
+    build_metadata_index(args.detections_root, args.index, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main(parser.parse_args())
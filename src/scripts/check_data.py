@@ -1,9 +1,17 @@
-from typing import Iterator
-
-from epic_kitchens.masks.types import BBox, FrameObjectDetections, ObjectDetection
-from epic_kitchens.masks.io import load_detections
+import sys
+from typing import Iterator, List, Optional
+
+from epic_kitchens.masks.types import (
+    BBox,
+    FrameObjectDetections,
+    ObjectDetection,
+    VideoDetections,
+)
+from epic_kitchens.masks.io import iter_serialized_detections, load_detections
 from epic_kitchens.masks.coco import class_names
+from epic_kitchens.masks.rle import MASK_HEIGHT, MASK_WIDTH, rle_lengths
 import numpy as np
+import pandas as pd
 import argparse
 from pathlib import Path
 
@@ -16,6 +24,18 @@ parser.add_argument("detections_pkl", type=Path, help="Path to masks pkl.")
 parser.add_argument(
     "-n", "--n-frames", type=int, help="Expected number of frames in video."
 )
+parser.add_argument(
+    "--frame-counts",
+    type=Path,
+    help="Look up the expected number of frames in this CSV "
+    "(e.g. EPIC_100_frame_counts.csv) instead of passing --n-frames.",
+)
+parser.add_argument(
+    "--fast",
+    action="store_true",
+    help="Check columns in bulk without decoding masks (RLEs are checked "
+    "structurally) and report every violation.",
+)
 
 
 class DetectionChecker:
@@ -94,9 +114,114 @@ class DetectionChecker:
             )
 
 
+class FastDetectionChecker:
+    """Vectorized version of :class:`DetectionChecker` over a whole video.
+
+    Masks aren't decoded; instead their RLEs are checked to cover exactly
+    100 x 100 pixels. Rather than raising on the first problem, every
+    violation is returned.
+    """
+
+    def __init__(self, n_frames: Optional[int]):
+        self.n_frames = n_frames
+
+    def check(self, video: VideoDetections) -> List[str]:
+        violations = []
+        violations.extend(self.check_frames(video.frame_numbers))
+
+        object_frame_numbers = video.object_frame_numbers
+        object_idxs = np.arange(video.n_objects) - np.repeat(
+            video.frame_offsets[:-1], video.n_objects_per_frame
+        )
+
+        def report(failed: np.ndarray, values: np.ndarray, message: str) -> None:
+            for j in np.flatnonzero(failed):
+                violations.append(
+                    f"Frame {object_frame_numbers[j]} object {object_idxs[j]}: "
+                    + message.format(values[j])
+                )
+
+        for coord_idx, coord in enumerate(["left", "top", "right", "bottom"]):
+            values = video.bbox[:, coord_idx]
+            report(
+                ~((0 <= values) & (values <= 1)),
+                values,
+                f"Expected bbox {coord} ({{}}) to be between 0--1.",
+            )
+        report(
+            ~(video.left <= video.right),
+            video.bbox,
+            "Expected bbox left to be less than or equal to right {}",
+        )
+        report(
+            ~(video.top <= video.bottom),
+            video.bbox,
+            "Expected bbox top to be less than or equal to bottom {}",
+        )
+        report(
+            ~((0 <= video.score) & (video.score <= 1)),
+            video.score,
+            "Expected score to be between 0--1 but was {}",
+        )
+        report(
+            ~((0 <= video.pred_class) & (video.pred_class < len(class_names))),
+            video.pred_class,
+            f"Expected class id to be between 0--{len(class_names) - 1} but was {{}}",
+        )
+        mask_lengths = rle_lengths(video.rle_blob, video.rle_offsets)
+        report(mask_lengths < 0, mask_lengths, "Malformed mask RLE")
+        report(
+            (mask_lengths >= 0) & (mask_lengths != MASK_HEIGHT * MASK_WIDTH),
+            mask_lengths,
+            f"Expected mask RLE to cover {MASK_HEIGHT * MASK_WIDTH} pixels but "
+            f"covered {{}}",
+        )
+        return violations
+
+    def check_frames(self, frame_numbers: np.ndarray) -> List[str]:
+        violations = []
+        unique_frame_numbers, counts = np.unique(frame_numbers, return_counts=True)
+        for frame_number, count in zip(
+            unique_frame_numbers[counts > 1], counts[counts > 1]
+        ):
+            violations.append(f"Frame {frame_number} occurs {count} times")
+        if self.n_frames is None:
+            return violations
+        in_range = (1 <= unique_frame_numbers) & (unique_frame_numbers <= self.n_frames)
+        for frame_number in unique_frame_numbers[~in_range]:
+            violations.append(
+                f"Expected frame_number to be between 1 and {self.n_frames} "
+                f"but was {frame_number}"
+            )
+        n_missing = self.n_frames - in_range.sum()
+        if n_missing > 0:
+            violations.append(
+                f"{n_missing} of {self.n_frames} frames have no detections"
+            )
+        return violations
+
+
+def get_n_frames(frame_counts_csv: Path, video_id: str) -> int:
+    frame_counts = pd.read_csv(frame_counts_csv, index_col="video_id")
+    return int(frame_counts.loc[video_id, "rgb_n_frames"])
+
+
 def main(args):
+    n_frames = args.n_frames
+    if args.frame_counts is not None:
+        n_frames = get_n_frames(args.frame_counts, args.detections_pkl.stem)
+    if args.fast:
+        video = VideoDetections.from_protobuf_strs(
+            args.detections_pkl.stem, iter_serialized_detections(args.detections_pkl)
+        )
+        violations = FastDetectionChecker(n_frames).check(video)
+        for violation in violations:
+            print(violation)
+        if violations:
+            sys.exit(f"{len(violations)} violations in {args.detections_pkl}")
+        return
     detections: Iterator[FrameObjectDetections] = load_detections(args.detections_pkl)
-    checker = DetectionChecker(args.n_frames)
+    checker = DetectionChecker(n_frames)
     checker.check(detections)
 
 
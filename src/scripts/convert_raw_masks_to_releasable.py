@@ -1,12 +1,15 @@
 import argparse
 import re
+from contextlib import ExitStack
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 from pycocotools.mask import decode as coco_mask_decode
 
 import numpy as np
 import pandas as pd
-from epic_kitchens.masks.io import save_detections
+from epic_kitchens.masks.container import DEFAULT_CHUNK_SIZE, available_codecs
+from epic_kitchens.masks.io import FORMAT_INDEXED, FORMAT_PICKLE, DetectionWriter
+from epic_kitchens.masks.polygons import DEFAULT_TOLERANCE, PolygonWriter
 from epic_kitchens.masks.types import BBox, FrameObjectDetections, ObjectDetection
 
 parser = argparse.ArgumentParser(
@@ -23,6 +26,37 @@ parser.add_argument(
     type=Path,
     help="Path to pickle containing list of releasable mask detections",
 )
+parser.add_argument(
+    "--format",
+    dest="file_format",
+    choices=[FORMAT_PICKLE, FORMAT_INDEXED],
+    default=FORMAT_PICKLE,
+    help="File format to write the releasable mask detections in",
+)
+parser.add_argument(
+    "--compression",
+    choices=available_codecs(),
+    help="Compress indexed files in chunks with this codec",
+)
+parser.add_argument(
+    "--chunk-size",
+    type=int,
+    default=DEFAULT_CHUNK_SIZE,
+    help="Number of frames per compressed chunk",
+)
+parser.add_argument(
+    "--polygons",
+    type=Path,
+    help="Also write the outline polygons of the masks to this file (e.g. "
+    "P01_101.polygons) so renderers needn't trace them",
+)
+parser.add_argument(
+    "--polygon-tolerance",
+    type=float,
+    default=DEFAULT_TOLERANCE,
+    help="Maximum distance of simplified outlines from the masks' contours, in "
+    "pixels of the 100x100 masks. 0 keeps every contour vertex",
+)
 
 
 def get_frame_number(frame_filename: str) -> int:
@@ -37,10 +71,15 @@ class Converter:
     def convert_video_detections(
         self, video_id: str, raw_masks: Dict[str, Dict[str, Any]]
     ) -> List[FrameObjectDetections]:
-        return [
-            self.convert_frame_detections(video_id, frame_filename, raw_frame_masks)
-            for frame_filename, raw_frame_masks in raw_masks.items()
-        ]
+        return list(self.iter_video_detections(video_id, raw_masks))
+
+    def iter_video_detections(
+        self, video_id: str, raw_masks: Dict[str, Dict[str, Any]]
+    ) -> Iterator[FrameObjectDetections]:
+        for frame_filename, raw_frame_masks in raw_masks.items():
+            yield self.convert_frame_detections(
+                video_id, frame_filename, raw_frame_masks
+            )
 
     def convert_frame_detections(
         self, video_id: str, frame_filename: str, raw_frame_masks: Dict[str, Any]
@@ -85,8 +124,26 @@ def main(args):
     raw_masks: Dict[str, Dict[str, Any]] = pd.read_pickle(args.raw_masks_pkl)
     video_id = args.raw_masks_pkl.stem
     converter = Converter()
-    releasable_masks = converter.convert_video_detections(video_id, raw_masks)
-    save_detections(args.releasable_masks_pkl, releasable_masks)
+    with ExitStack() as stack:
+        writer = stack.enter_context(
+            DetectionWriter(
+                args.releasable_masks_pkl,
+                file_format=args.file_format,
+                compression=args.compression,
+                chunk_size=args.chunk_size,
+            )
+        )
+        polygon_writer = None
+        if args.polygons is not None:
+            polygon_writer = stack.enter_context(
+                PolygonWriter(
+                    args.polygons, video_id, tolerance=args.polygon_tolerance
+                )
+            )
+        for detections in converter.iter_video_detections(video_id, raw_masks):
+            writer.write(detections)
+            if polygon_writer is not None:
+                polygon_writer.write(detections)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+from pathlib import Path
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from epic_kitchens.masks.columnar import (
+    VIDEO_COLUMNS,
+    ColumnWriter,
+    load_video_detections,
+    read_columns,
+    save_video_detections,
+)
+from epic_kitchens.masks.types import BBox, FrameObjectDetections, VideoDetections
+from test_serialization import gen_frame_detections
+
+
+def test_video_detections_round_trip_through_column_file(tmpdir):
+    tmpfile = Path(str(tmpdir / "P01_101.cols"))
+    # Round trip through protobuf so the expected values are float32 too.
+    frames = [
+        FrameObjectDetections.from_protobuf("P01_101", frame.to_protobuf())
+        for frame in (gen_frame_detections("P01_101", i) for i in range(1, 11))
+    ]
+    video = VideoDetections.from_frames("P01_101", frames)
+    save_video_detections(tmpfile, video)
+
+    loaded = load_video_detections(tmpfile)
+    assert isinstance(loaded.score, np.memmap)
+    assert loaded.video_id == "P01_101"
+    assert len(loaded) == len(frames)
+    assert loaded.n_objects == sum(len(frame.objects) for frame in frames)
+    assert [loaded.frame(i) for i in range(len(loaded))] == frames
+    assert_array_equal(loaded.right, video.bbox[:, 2])
+
+
+def test_column_writer_appends_rows(tmpdir):
+    tmpfile = Path(str(tmpdir / "columns"))
+    with ColumnWriter(tmpfile, attrs={"name": "test"}) as writer:
+        writer.append(a=np.arange(3), b=np.ones((3, 2), dtype=np.float32))
+        writer.append(a=np.arange(3, 5), b=np.zeros((2, 2), dtype=np.float32))
+        writer.append(c=np.array([], dtype=np.uint8))
+
+    attrs, columns = read_columns(tmpfile, mmap=False)
+    assert attrs == {"name": "test"}
+    assert_array_equal(columns["a"], np.arange(5))
+    assert columns["b"].shape == (5, 2)
+    assert columns["c"].shape == (0,)
+
+
+def gen_video(frame_numbers) -> VideoDetections:
+    return VideoDetections.from_frames(
+        "P01_101", [gen_frame_detections("P01_101", i) for i in frame_numbers]
+    )
+
+
+def test_video_detections_frame_range_is_a_view():
+    video = gen_video(range(1, 21))
+    subset = video.frames(5, 8)
+
+    assert subset.frame_numbers.tolist() == [5, 6, 7, 8]
+    assert np.shares_memory(subset.bbox, video.bbox)
+    assert np.shares_memory(subset.rle_blob, video.rle_blob)
+    assert [frame.materialize() for frame in subset] == [
+        video.frame(i) for i in range(4, 8)
+    ]
+    assert video[4:8].frame_numbers.tolist() == [5, 6, 7, 8]
+    assert video[-1].frame_number == 20
+    assert len(video.frames(21, 30)) == 0
+
+
+def test_video_detections_frame_range_of_unsorted_frames():
+    video = gen_video([7, 3, 5, 1, 6])
+    subset = video.frames(3, 6)
+
+    assert subset.frame_numbers.tolist() == [3, 5, 6]
+    assert [frame.materialize() for frame in subset] == [
+        video.frame(i) for i in [1, 2, 4]
+    ]
+
+
+def test_video_detections_filter():
+    video = gen_video(range(1, 13))
+    video.score[:] = np.linspace(0, 1, video.n_objects)
+    filtered = video.filter(score_threshold=0.5, classes=[0, "person"])
+
+    assert len(filtered) == len(video)
+    assert_array_equal(filtered.frame_numbers, video.frame_numbers)
+    expected = (video.score > 0.5) & np.isin(video.pred_class, [0, 1])
+    assert filtered.n_objects == expected.sum()
+    assert_array_equal(
+        filtered.object_frame_numbers, video.object_frame_numbers[expected]
+    )
+    for frame, filtered_frame in zip(video, filtered):
+        expected_objects = [
+            obj for obj in frame.objects if obj.score > 0.5 and obj.pred_class <= 1
+        ]
+        assert filtered_frame.objects == expected_objects
+        assert_array_equal(
+            filtered_frame.masks(),
+            np.array([obj.mask for obj in expected_objects]).reshape(-1, 100, 100),
+        )
+
+
+def test_wire_decoder_matches_protobuf_parsing():
+    frames = [gen_frame_detections("P01_101", i) for i in range(0, 12)]
+    # Zero-valued fields are omitted from the wire format.
+    frames[3].objects[0].bbox = BBox(left=0.0, top=0.5, right=0.0, bottom=1.0)
+    frames[3].objects[1].score = 0.0
+    frames[3].objects[2].pred_class = -3
+    frames[5].objects[0]._coco_mask_counts = b""
+    pb_strs = [frame.to_protobuf().SerializeToString() for frame in frames]
+
+    decoded = VideoDetections.from_protobuf_strs("P01_101", pb_strs)
+    expected = VideoDetections.from_frames(
+        "P01_101",
+        (FrameObjectDetections.from_protobuf_str("P01_101", s) for s in pb_strs),
+    )
+    for column in VIDEO_COLUMNS:
+        assert_array_equal(getattr(decoded, column), getattr(expected, column))
@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+
+from epic_kitchens.masks.cli import main
+from epic_kitchens.masks.coverage import analyze_coverage, frame_coverage
+from epic_kitchens.masks.io import FORMAT_INDEXED, save_detections
+from test_serialization import gen_frame_detections
+
+
+def test_frame_coverage_finds_gaps_duplicates_and_out_of_range_frames():
+    coverage = frame_coverage("P01_01", [2, 3, 3, 6, 0, 12, 12, 9, 10], n_frames=10)
+
+    assert coverage.missing_ranges == [(1, 1), (4, 5), (7, 8)]
+    assert coverage.n_missing == 5
+    assert coverage.duplicates == {3: 2, 12: 2}
+    assert coverage.out_of_range == [0, 12]
+    assert not coverage.complete
+    assert frame_coverage("P01_01", [1, 2, 3], n_frames=3).complete
+
+
+def test_analyze_coverage_summarizes_dataset(tmpdir):
+    root = Path(str(tmpdir / "processed"))
+    frame_numbers = {"P01_01": [1, 2, 3, 4], "P01_02": [1, 2, 2, 5], "P02_01": [1]}
+    for video_id, file_format in [
+        ("P01_01", "pickle"),
+        ("P01_02", FORMAT_INDEXED),
+        ("P02_01", "pickle"),
+    ]:
+        save_detections(
+            root / video_id.split("_")[0] / (video_id + ".pkl"),
+            [gen_frame_detections(video_id, i) for i in frame_numbers[video_id]],
+            file_format=file_format,
+        )
+    frame_counts = Path(str(tmpdir / "frame_counts.csv"))
+    frame_counts.write_text(
+        "participant_id,video_id,rgb_n_frames,flow_n_frames\n"
+        "P01,P01_01,4,2\nP01,P01_02,4,2\nP03,P03_01,10,5\n"
+    )
+
+    summary = analyze_coverage(root, frame_counts, workers=2)
+    assert list(summary["videos"]) == ["P01_01", "P01_02"]
+    assert summary["videos"]["P01_01"]["n_missing"] == 0
+    assert summary["videos"]["P01_02"]["missing_ranges"] == [[3, 4]]
+    assert summary["videos"]["P01_02"]["duplicates"] == {"2": 2}
+    assert summary["videos"]["P01_02"]["out_of_range"] == [5]
+    assert summary["missing_videos"] == ["P03_01"]
+    assert summary["unknown_videos"] == ["P02_01"]
+    assert summary["totals"]["n_incomplete_videos"] == 1
+
+    output = Path(str(tmpdir / "coverage.json"))
+    args = ["coverage", str(root), "--frame-counts", str(frame_counts), "-o", str(output)]
+    assert main(args) == 1
+    assert json.loads(output.read_text()) == summary
+    assert main(args + ["--report-only"]) == 0
@@ -0,0 +1,82 @@
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from epic_kitchens.masks.dataset import (
+    MetadataIndex,
+    build_metadata_index,
+    find_detection_files,
+    load_dataset,
+)
+from epic_kitchens.masks.io import FORMAT_INDEXED, load_detections, save_detections
+from test_serialization import gen_frame_detections
+
+
+def make_dataset(root: Path):
+    for video_id, file_format in [
+        ("P01_01", "pickle"),
+        ("P01_02", FORMAT_INDEXED),
+        ("P02_01", "pickle"),
+    ]:
+        suffix = ".dets" if file_format == FORMAT_INDEXED else ".pkl"
+        participant_id = video_id.split("_")[0]
+        save_detections(
+            root / participant_id / (video_id + suffix),
+            [gen_frame_detections(video_id, i) for i in range(1, 9)],
+            file_format=file_format,
+        )
+
+
+def test_metadata_index_answers_queries(tmpdir):
+    root = Path(str(tmpdir / "processed"))
+    make_dataset(root)
+    (root / "P02" / "notes.pkl").write_bytes(b"")
+    assert list(find_detection_files(root)) == ["P01_01", "P01_02", "P02_01"]
+
+    index_path = root / "metadata_index.cols"
+    build_metadata_index(root, index_path, workers=2)
+    index = MetadataIndex(index_path)
+
+    assert index.video_ids == ["P01_01", "P01_02", "P02_01"]
+    # Frame n has n % 4 objects with classes 0..n % 4 - 1
+    assert len(index) == 3 * sum(i % 4 for i in range(1, 9))
+    assert index.frames(participants=["P01"], classes=[2]) == [
+        ("P01_01", 3),
+        ("P01_01", 7),
+        ("P01_02", 3),
+        ("P01_02", 7),
+    ]
+    assert len(index.frames(classes=["BG"], min_score=0.4)) == 3 * 6
+    assert index.frames(classes=["BG"], min_score=0.5) == []
+    assert index.select(video_ids=["P02_01"], classes=["person"]).sum() == 4
+    counts = list(index.object_counts(video_ids=["P01_02"]))
+    assert counts[:5] == [
+        ("P01_02", 1, 1),
+        ("P01_02", 2, 2),
+        ("P01_02", 3, 3),
+        ("P01_02", 4, 0),
+        ("P01_02", 5, 1),
+    ]
+    assert_array_equal(np.unique(index.bbox[:, 1]), [np.float32(0.2)])
+
+
+def test_load_dataset_matches_serial_loading(tmpdir):
+    root = Path(str(tmpdir / "processed"))
+    make_dataset(root)
+
+    serial = list(load_dataset(root))
+    assert [video.video_id for video in serial] == ["P01_01", "P01_02", "P02_01"]
+    assert [video.frame(2) for video in serial] == [
+        next(islice(load_detections(path), 2, None))
+        for path in find_detection_files(root).values()
+    ]
+
+    parallel = load_dataset(
+        root, video_ids=["P02_01", "P01_02"], workers=2, ordered=False
+    )
+    videos = {video.video_id: video for video in parallel}
+    assert sorted(videos) == ["P01_02", "P02_01"]
+    assert_array_equal(videos["P01_02"].score, serial[1].score)
+    assert_array_equal(videos["P01_02"].rle_blob, serial[1].rle_blob)
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from epic_kitchens.masks._maskrcnn_utils import compute_overlaps_masks
+from epic_kitchens.masks.iou import PackedMasks, mask_ious, video_mask_ious
+from epic_kitchens.masks.resize import resize_rles
+from epic_kitchens.masks.types import VideoDetections
+from test_serialization import gen_frame_detections
+
+
+def random_masks(rng, n_masks, height, width):
+    masks = np.zeros((n_masks, height, width), dtype=np.uint8)
+    # The last mask is left empty.
+    for mask in masks[:-1]:
+        top, left = rng.randint(0, height - 4), rng.randint(0, width - 4)
+        bottom = top + rng.randint(3, height // 2)
+        right = left + rng.randint(3, width // 2)
+        mask[top:bottom, left:right] = 1
+        mask &= rng.rand(height, width) > 0.2
+    return masks
+
+
+@pytest.mark.parametrize("height,width", [(100, 100), (61, 333)])
+def test_mask_ious_match_dense_overlaps(height, width):
+    rng = np.random.RandomState(0)
+    masks1 = random_masks(rng, 15, height, width)
+    masks2 = random_masks(rng, 12, height, width)
+    with np.errstate(invalid="ignore"):
+        expected = compute_overlaps_masks(
+            np.moveaxis(masks1, 0, -1), np.moveaxis(masks2, 0, -1)
+        )
+    ious = mask_ious(masks1, masks2)
+    assert (ious > 0).sum() > 10
+    # The dense overlaps are NaN between empty masks.
+    np.testing.assert_allclose(ious, np.nan_to_num(expected), atol=1e-6)
+
+
+def test_packed_masks_boxes_and_areas():
+    masks = np.zeros((2, 5, 20), dtype=np.uint8)
+    masks[0, 1:3, 9:17] = 1
+    packed = PackedMasks.from_masks(masks)
+    assert packed.bits.shape == (2, 5, 3)
+    np.testing.assert_array_equal(packed.areas, [16, 0])
+    np.testing.assert_array_equal(packed.boxes, [[9, 1, 17, 3], [0, 0, 0, 0]])
+    with pytest.raises(ValueError):
+        mask_ious(masks, masks[:, :, :10])
+
+
+def test_video_mask_ious():
+    video = VideoDetections.from_frames(
+        "P01_101", [gen_frame_detections("P01_101", i) for i in range(1, 9)]
+    )
+    results = list(video_mask_ious(video, 90, 160, lag=2))
+    assert [(a, b) for a, b, _ in results] == [(i, i + 2) for i in range(6)]
+    for frame_idx_a, frame_idx_b, ious in results:
+        masks = [
+            resize_rles(video[frame_idx].rles(), 90, 160)
+            for frame_idx in (frame_idx_a, frame_idx_b)
+        ]
+        np.testing.assert_allclose(ious, mask_ious(*masks))
+    # At the stored resolution these are the RLE IoUs.
+    for frame_idx_a, frame_idx_b, ious in video_mask_ious(video):
+        np.testing.assert_allclose(
+            ious, video[frame_idx_a].mask_iou(video[frame_idx_b]), atol=1e-12
+        )
+    with pytest.raises(ValueError, match="lag"):
+        next(video_mask_ious(video, lag=0))
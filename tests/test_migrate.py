@@ -0,0 +1,106 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from epic_kitchens.masks.cli import main
+from epic_kitchens.masks.container import DetectionReader
+from epic_kitchens.masks.io import iter_serialized_detections, save_detections
+from epic_kitchens.masks.migrate import (
+    FAILED,
+    MIGRATED,
+    SKIPPED,
+    migrate_detections,
+)
+from test_serialization import gen_frame_detections
+
+
+def make_legacy_dataset(root: Path, video_ids):
+    for video_id in video_ids:
+        save_detections(
+            root / video_id.split("_")[0] / (video_id + ".pkl"),
+            [gen_frame_detections(video_id, i) for i in range(1, 9)],
+        )
+
+
+def test_migrate_converts_skips_and_uses_replacements(tmpdir):
+    source_root = Path(str(tmpdir / "legacy"))
+    output_root = Path(str(tmpdir / "migrated"))
+    replacements_root = Path(str(tmpdir / "dropbox"))
+    make_legacy_dataset(source_root, ["P01_01", "P01_109", "P02_01"])
+    save_detections(
+        replacements_root / "P01_109.pkl",
+        [gen_frame_detections("P01_109", i) for i in range(1, 5)],
+    )
+
+    results = sorted(
+        migrate_detections(
+            source_root,
+            output_root,
+            replacements_root=replacements_root,
+            compression="zlib",
+            workers=2,
+        )
+    )
+    assert [(r.video_id, r.status, r.n_frames) for r in results] == [
+        ("P01_01", MIGRATED, 8),
+        ("P01_109", MIGRATED, 4),
+        ("P02_01", MIGRATED, 8),
+    ]
+    output = output_root / "P01" / "P01_109.dets"
+    assert list(iter_serialized_detections(output)) == list(
+        iter_serialized_detections(replacements_root / "P01_109.pkl")
+    )
+    assert sorted(p.name for p in output_root.rglob("*")) == [
+        "P01",
+        "P01_01.dets",
+        "P01_109.dets",
+        "P02",
+        "P02_01.dets",
+    ]
+
+    with DetectionReader(output) as reader:
+        assert reader.metadata["source"]["size"] == (
+            (replacements_root / "P01_109.pkl").stat().st_size
+        )
+
+    def migrate(**kwargs):
+        results = migrate_detections(
+            source_root, output_root, replacements_root=replacements_root, **kwargs
+        )
+        return [r.status for r in sorted(results)]
+
+    source = source_root / "P02" / "P02_01.pkl"
+    stat = source.stat()
+    os.utime(source, (stat.st_atime, stat.st_mtime + 10))
+    assert migrate(compression="zlib") == [SKIPPED, SKIPPED, MIGRATED]
+
+    # A corrected file older than the existing output is still picked up.
+    save_detections(
+        replacements_root / "P01_109.pkl",
+        [gen_frame_detections("P01_109", i) for i in range(1, 7)],
+    )
+    os.utime(replacements_root / "P01_109.pkl", (0, 0))
+    assert migrate(compression="zlib") == [SKIPPED, MIGRATED, SKIPPED]
+    assert len(list(iter_serialized_detections(output))) == 6
+
+    assert migrate(compression="zlib", chunk_size=2) == [MIGRATED] * 3
+    assert migrate() == [MIGRATED] * 3
+    assert migrate() == [SKIPPED] * 3
+
+
+def test_migrate_reports_failures(tmpdir):
+    source_root = Path(str(tmpdir / "legacy"))
+    make_legacy_dataset(source_root, ["P01_01"])
+    (source_root / "P01" / "P01_02.pkl").write_bytes(b"not a pickle")
+
+    results = sorted(migrate_detections(source_root, source_root))
+    assert [r.status for r in results] == [MIGRATED, FAILED]
+    assert (source_root / "P01" / "P01_01.dets").exists()
+    assert not (source_root / "P01" / "P01_02.dets").exists()
+    assert sorted(p.name for p in (source_root / "P01").iterdir()) == [
+        "P01_01.dets",
+        "P01_01.pkl",
+        "P01_02.pkl",
+    ]
+    assert main(["migrate", str(source_root)]) == 1
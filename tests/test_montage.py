@@ -0,0 +1,87 @@
+from pathlib import Path
+
+import numpy as np
+import PIL.Image
+import pytest
+
+from epic_kitchens.masks.cli import main
+from epic_kitchens.masks.io import save_detections
+from epic_kitchens.masks.montage import (
+    BY_SCORE,
+    MontageBuilder,
+    build_montages,
+    sample_frames,
+)
+from epic_kitchens.masks.types import VideoDetections
+from test_serialization import gen_frame_detections
+
+
+def make_video(video_id="P01_101", n_frames=40):
+    frames = [gen_frame_detections(video_id, i) for i in range(1, n_frames + 1)]
+    for frame in frames:
+        for i, obj in enumerate(frame.objects):
+            obj.score = (frame.frame_number + i) / 100
+    return VideoDetections.from_frames(video_id, frames)
+
+
+def test_sample_frames():
+    video = make_video()
+    np.testing.assert_array_equal(sample_frames(video, 5), [0, 10, 20, 29, 39])
+    assert len(sample_frames(video, 100)) == 40
+    # Frame number n (at index n - 1) has n % 4 objects, the last scoring
+    # (n + n % 4 - 1) / 100, so frame numbers 38 and 39 (indices 37 and 38)
+    # score highest.
+    np.testing.assert_array_equal(sample_frames(video, 2, by=BY_SCORE), [37, 38])
+    # Only frames 3, 7, ... have an object of class 2.
+    np.testing.assert_array_equal(
+        sample_frames(video, 3, classes=[2]) % 4, [2, 2, 2]
+    )
+    assert len(sample_frames(video, 3, score_threshold=0.3, classes=[2])) == 3
+    assert len(sample_frames(video, 3, score_threshold=0.9)) == 0
+    with pytest.raises(ValueError):
+        sample_frames(video, 3, by="random")
+
+
+def test_montage_tiles_frames(tmpdir):
+    frames_root = Path(str(tmpdir))
+    (frames_root / "P01_101").mkdir()
+    PIL.Image.new("RGB", (456, 256), (0, 0, 200)).save(
+        frames_root / "P01_101" / "frame_0000000001.jpg"
+    )
+    video = make_video()
+    builder = MontageBuilder(
+        tile_height=50, tile_width=100, columns=2, frames_root=frames_root
+    )
+
+    img = builder.render(video, [0, 2, 4])
+    assert img.size == (200, 100)
+    pixels = np.asarray(img)
+    # Frame 1 has its frame as background, frame 3's is missing.
+    assert pixels[40, 90, 2] > 150 and (pixels[40, 190] == 32).all()
+    # The empty fourth tile is left blank.
+    assert (pixels[50:, 100:] == 32).all()
+    # Frame 3's masks (rows 13:35 and columns 20:40 of 100) are drawn.
+    assert (pixels[9:15, 125:135] != 32).any(axis=-1).all()
+
+
+def test_build_montages(tmpdir):
+    root = Path(str(tmpdir))
+    for video_id in ["P01_101", "P02_102"]:
+        save_detections(
+            root / "dets" / video_id[:3] / (video_id + ".pkl"),
+            [gen_frame_detections(video_id, i) for i in range(1, 9)],
+        )
+    outputs = build_montages(
+        root / "dets",
+        root / "sheets",
+        builder=MontageBuilder(tile_height=20, tile_width=30),
+        n_frames=4,
+        workers=2,
+    )
+    assert sorted(path.name for path in outputs) == ["P01_101.jpg", "P02_102.jpg"]
+    assert PIL.Image.open(root / "sheets" / "P01_101.jpg").size == (120, 20)
+
+    assert main(
+        ["montage", str(root / "dets"), str(root / "cli"), "--by", "score", "-n", "2"]
+    ) == 0
+    assert len(list((root / "cli").iterdir())) == 2
@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import numpy as np
+import PIL.Image
+import pytest
+
+from epic_kitchens.masks.polygons import (
+    load_polygons,
+    mask_polygons,
+    save_polygons,
+    to_pixel_polygons,
+)
+from epic_kitchens.masks.visualisation import BACKEND_MATPLOTLIB, DetectionRenderer
+from test_serialization import gen_frame_detections, gen_mask
+
+
+def test_mask_polygons_are_normalized_and_simplified():
+    mask = gen_mask(0)
+    exact = mask_polygons(mask, tolerance=0)
+    simplified = mask_polygons(mask, tolerance=0.5)
+    assert len(exact) == len(simplified) == 1
+    assert len(simplified[0]) < len(exact[0])
+    # The mask covers rows 10:30 and columns 20:40 of 100.
+    np.testing.assert_allclose(simplified[0].min(axis=0), [0.2, 0.1], atol=0.006)
+    np.testing.assert_allclose(simplified[0].max(axis=0), [0.4, 0.3], atol=0.006)
+    pixels = to_pixel_polygons(simplified, 200, 1000)[0]
+    np.testing.assert_allclose(pixels.min(axis=0), [199.5, 19.5], atol=1)
+
+
+def test_polygons_round_trip(tmpdir):
+    filepath = Path(str(tmpdir)) / "P01_101.polygons"
+    frames = [gen_frame_detections("P01_101", i) for i in range(1, 9)]
+    save_polygons(filepath, frames, "P01_101", tolerance=1)
+
+    polygons = load_polygons(filepath)
+    assert polygons.video_id == "P01_101" and polygons.tolerance == 1
+    assert len(polygons) == 8 and 3 in polygons and 9 not in polygons
+    for frame in frames:
+        frame_polygons = polygons.frame(frame.frame_number)
+        assert len(frame_polygons) == len(frame.objects)
+        for mask, object_polygons in zip(frame.masks(), frame_polygons):
+            expected = mask_polygons(mask, tolerance=1)
+            assert len(object_polygons) == len(expected)
+            for actual, exact in zip(object_polygons, expected):
+                np.testing.assert_allclose(actual, exact, atol=1e-4)
+    with pytest.raises(KeyError):
+        polygons.frame(9)
+
+
+@pytest.mark.parametrize("backend", ["raster", BACKEND_MATPLOTLIB])
+def test_renderers_draw_precomputed_polygons(backend):
+    frame = gen_frame_detections("P01_101", 3)
+    polygons = [mask_polygons(mask) for mask in frame.masks()]
+    img = PIL.Image.new("RGB", (200, 100))
+    renderer = DetectionRenderer(display_mask=False, display_bbox=False, backend=backend)
+
+    rendered = renderer.render_detections(img, frame, polygons)
+    with pytest.raises(ValueError):
+        renderer.render_detections(img, frame, polygons[:1])
+    # Only the given outlines are drawn: none without polygons, and moved
+    # polygons are drawn elsewhere.
+    no_outlines = renderer.render_detections(img, frame, [[] for _ in polygons])
+    moved = [
+        [polygon + [0.3, 0.2] for polygon in object_polygons]
+        for object_polygons in polygons
+    ]
+    moved_outlines = renderer.render_detections(img, frame, moved)
+    assert rendered.size == no_outlines.size == moved_outlines.size
+    assert (np.asarray(rendered) != np.asarray(no_outlines)).any()
+    assert (np.asarray(rendered) != np.asarray(moved_outlines)).any()
+    if backend == "raster":
+        # The masks span rows 13:35 and columns 40:80 of the frame (captions
+        # start at row 20), and only their outlines are drawn.
+        drawn = np.asarray(rendered).any(axis=-1)
+        assert drawn[14:20, 38:42].any(axis=1).all()
+        assert drawn[14:20, 78:82].any(axis=1).all()
+        assert not drawn[16:19, 45:75].any()
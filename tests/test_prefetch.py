@@ -0,0 +1,67 @@
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from epic_kitchens.masks.io import load_detections, save_detections
+from epic_kitchens.masks.prefetch import Prefetcher, prefetch_detections
+from test_serialization import gen_frame_detections
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "Timed out waiting for the producer"
+        time.sleep(0.001)
+
+
+def test_prefetcher_respects_depth_and_memory_cap():
+    arrays = [np.zeros(100, dtype=np.uint8) for _ in range(20)]
+    requested = []
+
+    def items():
+        for array in arrays:
+            requested.append(array)
+            yield array
+
+    with Prefetcher(items(), depth=4) as prefetcher:
+        wait_for(lambda: prefetcher.stats.max_buffered_items == 4)
+        # The producer has read the next item but has no room for it.
+        wait_for(lambda: len(requested) == 5)
+        assert prefetcher.stats.max_buffered_items == 4
+        assert len(list(prefetcher)) == 20
+    assert prefetcher.stats.producer_wait_s > 0
+
+    with Prefetcher(iter(arrays), depth=10, max_bytes=250) as prefetcher:
+        wait_for(lambda: prefetcher.stats.max_buffered_bytes == 200)
+        assert len(list(prefetcher)) == 20
+    assert prefetcher.stats.n_items == 20
+    assert prefetcher.stats.max_buffered_bytes == 200
+
+
+def test_prefetcher_reports_stalls_and_errors():
+    def slow_items():
+        for i in range(3):
+            time.sleep(0.01)
+            yield i
+        raise RuntimeError("corrupt file")
+
+    prefetcher = Prefetcher(slow_items(), depth=2)
+    assert [next(prefetcher) for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(RuntimeError):
+        next(prefetcher)
+    assert prefetcher.stats.n_stalls >= 1
+    assert prefetcher.stats.stall_s > 0
+
+
+def test_prefetch_detections_decodes_masks(tmpdir):
+    tmpfile = Path(str(tmpdir / "P01_101.pkl"))
+    save_detections(tmpfile, [gen_frame_detections("P01_101", i) for i in range(1, 9)])
+
+    with prefetch_detections(tmpfile, depth=3, masks=True) as frames:
+        prefetched = list(frames)
+    for (frame, masks), expected in zip(prefetched, load_detections(tmpfile)):
+        assert frame.frame_number == expected.frame_number
+        assert_array_equal(masks, expected.masks())
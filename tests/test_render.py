@@ -0,0 +1,121 @@
+import pickle
+from pathlib import Path
+
+import numpy as np
+import PIL.Image
+import pytest
+
+from epic_kitchens.masks.cache import MaskCache
+from epic_kitchens.masks.cli import main
+from epic_kitchens.masks.io import save_detections
+from epic_kitchens.masks.polygons import save_polygons
+from epic_kitchens.masks.render import iter_frame_files, render_video
+from epic_kitchens.masks.types import VideoDetections
+from epic_kitchens.masks.visualisation import DetectionRenderer
+from test_serialization import gen_frame_detections
+
+
+def make_frames(frames_dir: Path, frame_numbers):
+    frames_dir.mkdir(parents=True)
+    for frame_number in frame_numbers:
+        PIL.Image.new("RGB", (64, 48), (frame_number, 0, 0)).save(
+            frames_dir / "frame_{:010d}.jpg".format(frame_number)
+        )
+
+
+def test_render_video_workers_match_serial(tmpdir):
+    tmpdir = Path(str(tmpdir))
+    make_frames(tmpdir / "frames", range(1, 10))
+    video = VideoDetections.from_frames(
+        "P01_101", [gen_frame_detections("P01_101", i) for i in range(1, 8)]
+    )
+    written = []
+
+    assert render_video(tmpdir / "frames", video, tmpdir / "serial") == 9
+    n_frames = render_video(
+        tmpdir / "frames",
+        video,
+        tmpdir / "parallel",
+        workers=2,
+        max_pending=3,
+        progress=written.append,
+    )
+
+    assert n_frames == 9
+    assert written == list(range(1, 10))
+    for frame_number, path in iter_frame_files(tmpdir / "serial"):
+        parallel_path = tmpdir / "parallel" / path.name
+        assert path.read_bytes() == parallel_path.read_bytes()
+    # Frames 8 and 9 have no detections so are written as they are.
+    rendered = np.asarray(PIL.Image.open(tmpdir / "serial" / "frame_0000000009.jpg"))
+    original = np.asarray(PIL.Image.open(tmpdir / "frames" / "frame_0000000009.jpg"))
+    assert np.abs(rendered.astype(int) - original).max() <= 8
+
+
+def test_render_video_from_images(tmpdir):
+    out_dir = Path(str(tmpdir))
+    frames = [(i, PIL.Image.new("RGB", (40, 30))) for i in range(1, 4)]
+    detections = [gen_frame_detections("P01_101", i) for i in range(1, 4)]
+
+    render_video(frames, detections, out_dir, output_template="{:03d}.png")
+    assert sorted(path.name for path in out_dir.iterdir()) == [
+        "001.png",
+        "002.png",
+        "003.png",
+    ]
+    with pytest.raises(FileNotFoundError):
+        render_video(
+            frames, detections, out_dir, video_path="out.mp4", ffmpeg="not-ffmpeg"
+        )
+
+
+def test_render_video_checks_polygons_cover_detections(tmpdir):
+    tmpdir = Path(str(tmpdir))
+    frames = [(i, PIL.Image.new("RGB", (40, 30))) for i in range(1, 4)]
+    detections = [gen_frame_detections("P01_101", i) for i in range(1, 4)]
+    save_polygons(tmpdir / "complete.polygons", detections, "P01_101")
+    save_polygons(tmpdir / "partial.polygons", detections[:2], "P01_101")
+
+    n_frames = render_video(
+        frames, detections, tmpdir / "out", polygons=tmpdir / "complete.polygons"
+    )
+    assert n_frames == 3
+    with pytest.raises(ValueError, match="Frame 3 .*partial.polygons"):
+        render_video(
+            frames,
+            detections,
+            tmpdir / "out",
+            workers=2,
+            polygons=tmpdir / "partial.polygons",
+        )
+
+
+def test_renderers_pickle_with_empty_caches():
+    cache = MaskCache(max_bytes=1024)
+    cache.put("key", np.zeros(4, dtype=np.uint8))
+    renderer = pickle.loads(pickle.dumps(DetectionRenderer(mask_cache=cache)))
+    assert renderer.mask_cache.max_bytes == 1024
+    assert len(renderer.mask_cache) == 0
+    assert renderer.colors == DetectionRenderer().colors
+
+
+def test_cli_render(tmpdir):
+    tmpdir = Path(str(tmpdir))
+    make_frames(tmpdir / "frames", [1, 2])
+    save_detections(
+        tmpdir / "P01_101.pkl", [gen_frame_detections("P01_101", i) for i in (1, 2)]
+    )
+    assert (
+        main(
+            [
+                "render",
+                str(tmpdir / "frames"),
+                str(tmpdir / "P01_101.pkl"),
+                str(tmpdir / "rendered"),
+                "--score-threshold",
+                "0.3",
+            ]
+        )
+        == 0
+    )
+    assert len(list((tmpdir / "rendered").iterdir())) == 2
@@ -0,0 +1,133 @@
+from dataclasses import astuple
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+
+from epic_kitchens.masks.cache import MaskCache
+from epic_kitchens.masks.rle import decode_masks, decode_rles, rle_lengths
+from epic_kitchens.masks.types import (
+    BBox,
+    FrameObjectDetections,
+    LazyFrameObjectDetections,
+    ObjectDetection,
+    VideoDetections,
+)
+from pycocotools.mask import encode as coco_mask_encode
+from test_serialization import gen_frame_detections, gen_mask
+
+
+def test_batched_decode_matches_per_object_decode():
+    frames = [gen_frame_detections("P01_101", i) for i in range(1, 10)]
+    expected = np.stack([obj.mask for frame in frames for obj in frame.objects])
+
+    assert_array_equal(decode_masks(frames), expected)
+    assert_array_equal(
+        decode_masks(frames, frames=[3, 7]),
+        np.stack([obj.mask for obj in frames[2].objects + frames[6].objects]),
+    )
+    assert_array_equal(
+        VideoDetections.from_frames("P01_101", frames).masks(), expected
+    )
+    lazy_frame = LazyFrameObjectDetections.from_protobuf_str(
+        "P01_101", frames[2].to_protobuf().SerializeToString()
+    )
+    assert_array_equal(lazy_frame.masks(), frames[2].masks())
+
+
+def test_decode_rles_into_preallocated_buffer():
+    frame = gen_frame_detections("P01_101", 3)
+    out = np.ones((5, 100, 100), dtype=np.uint8)
+    masks = decode_rles(frame.rles(), out=out)
+
+    assert masks.base is out
+    assert masks.flags.c_contiguous
+    assert_array_equal(masks, frame.masks())
+    assert decode_rles([]).shape == (0, 100, 100)
+    with pytest.raises(ValueError):
+        decode_rles(frame.rles(), out=np.empty((1, 100, 100), dtype=np.uint8))
+
+
+def test_mask_cache_hits_and_evicts():
+    frame = gen_frame_detections("P01_101", 3)
+    cache = MaskCache(max_bytes=2 * 100 * 100)
+
+    assert_array_equal(frame.masks(cache=cache), frame.masks())
+    assert (cache.hits, cache.misses) == (0, 3)
+    # Only the two most recently decoded masks fit in the budget.
+    assert len(cache) == 2
+    assert frame.rles()[0] not in cache
+
+    assert_array_equal(frame.masks(cache=cache), frame.masks())
+    assert cache.n_bytes <= cache.max_bytes
+    assert (cache.hits, cache.misses) == (2, 4)
+
+    cache.clear()
+    assert len(cache) == 0 and cache.n_bytes == 0 and cache.hits == 0
+
+
+def test_mask_cache_is_keyed_by_mask_not_position():
+    video = VideoDetections.from_frames(
+        "P01_101", [gen_frame_detections("P01_101", i) for i in range(1, 5)]
+    )
+    cache = MaskCache()
+    assert_array_equal(video[2].masks(cache=cache), video[2].masks())
+    # Object 1 of frame 3 is its first object once filtered.
+    filtered = video.filter(classes=[1])
+    assert_array_equal(filtered[2].masks(cache=cache), video[2].masks()[1:2])
+    assert cache.hits == 1
+
+
+def test_rle_domain_ops_match_decoded_masks():
+    frame = gen_frame_detections("P01_101", 3)
+    other = gen_frame_detections("P01_101", 7)
+    masks = frame.masks().astype(bool)
+    other_masks = other.masks().astype(bool)
+
+    assert_array_equal(frame.mask_areas(), masks.sum(axis=(1, 2)))
+    obj = frame.objects[1]
+    ys, xs = np.nonzero(obj.mask)
+    assert obj.mask_area == len(ys)
+    assert obj.mask_bbox == BBox(
+        left=np.float32(xs.min() / 100),
+        top=np.float32(ys.min() / 100),
+        right=np.float32((xs.max() + 1) / 100),
+        bottom=np.float32((ys.max() + 1) / 100),
+    )
+    assert_array_equal(frame.mask_bboxes()[1], astuple(obj.mask_bbox))
+
+    intersection = (masks[:, None] & other_masks[None]).sum(axis=(2, 3))
+    union = (masks[:, None] | other_masks[None]).sum(axis=(2, 3))
+    assert_allclose(frame.mask_iou(other), intersection / union)
+    assert_allclose(np.diag(frame.mask_iou()), 1)
+    assert obj.mask_iou(obj) == 1
+    assert frame.mask_iou(gen_frame_detections("P01_101", 4)).shape == (3, 0)
+
+
+def test_rle_lengths_checks_structure_without_decoding():
+    masks = [gen_mask(offset) for offset in range(5)] + [
+        np.zeros((100, 100), dtype=np.uint8, order="F"),
+        np.asfortranarray(np.random.RandomState(0).rand(100, 100) > 0.5).astype(
+            np.uint8
+        ),
+    ]
+    rles = [coco_mask_encode(np.asfortranarray(mask))["counts"] for mask in masks]
+    rles += [rles[-1][:-1], b"@", b"0\x7f", b""]
+    video = VideoDetections.from_frames(
+        "P01_101",
+        [
+            FrameObjectDetections(
+                video_id="P01_101",
+                frame_number=1,
+                objects=[
+                    ObjectDetection(BBox(0, 0, 1, 1), 0.5, 1, _coco_mask_counts=rle)
+                    for rle in rles
+                ],
+            )
+        ],
+    )
+
+    lengths = rle_lengths(video.rle_blob, video.rle_offsets)
+    assert_array_equal(lengths[:7], 10000)
+    assert lengths[7] not in (-1, 10000)
+    assert_array_equal(lengths[8:], [-1, -1, 0])
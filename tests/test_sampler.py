@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from epic_kitchens.masks.sampler import MaskSampler
+from epic_kitchens.masks.types import VideoDetections
+from epic_kitchens.masks.visualisation import resize_mask
+from test_serialization import gen_frame_detections
+
+
+def make_videos():
+    return {
+        video_id: VideoDetections.from_frames(
+            video_id, [gen_frame_detections(video_id, i) for i in range(1, 9)]
+        )
+        for video_id in ["P01_01", "P02_01"]
+    }
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_mask_sampler_pads_and_resizes(workers):
+    videos = make_videos()
+    keys = [("P01_01", 3), ("P02_01", 4), ("P02_01", 2)]
+    with MaskSampler(videos, 40, 60, max_objects=3, workers=workers) as sampler:
+        batch = sampler.sample(keys)
+        assert batch.masks.shape == (3, 3, 40, 60)
+        assert_array_equal(batch.valid.sum(axis=1), [3, 0, 2])
+        assert_array_equal(batch.classes[2], [0, 1, -1])
+        assert not batch.masks[1].any()
+        frame = videos["P02_01"][1]
+        assert_array_equal(batch.bboxes[2, :2], frame.bbox)
+        assert_array_equal(batch.masks[2, 1], resize_mask(frame.masks()[1], 40, 60))
+
+        # Buffers are reused, and stale objects are cleared.
+        masks_buffer = batch.masks
+        batch = sampler.sample([("P01_01", 4)])
+        assert np.shares_memory(batch.masks, masks_buffer)
+        assert not batch.valid.any() and not batch.masks.any()
+
+
+def test_mask_sampler_keeps_highest_scoring_objects():
+    videos = make_videos()
+    videos["P01_01"].score[videos["P01_01"].object_slice(2)] = [0.2, 0.9, 0.5]
+    with MaskSampler(videos, 100, 100, max_objects=2) as sampler:
+        batch = sampler.sample([("P01_01", 3)])
+    assert_array_equal(batch.classes[0], [1, 2])
+    assert_array_equal(batch.masks[0], videos["P01_01"][2].masks()[1:])
+    with pytest.raises(KeyError):
+        sampler.sample([("P01_01", 100)])
@@ -1,16 +1,29 @@
+import pickle
 from pathlib import Path
 
 import numpy as np
+import pytest
 from numpy.testing import assert_almost_equal, assert_array_equal
 
+from epic_kitchens.masks.container import available_codecs
 from epic_kitchens.masks.types import FrameObjectDetections, ObjectDetection, BBox
-from epic_kitchens.masks.io import load_detections, save_detections
+from epic_kitchens.masks.io import (
+    FORMAT_INDEXED,
+    FORMAT_PICKLE,
+    DetectionWriter,
+    get_frame,
+    get_frames,
+    iter_serialized_detections,
+    load_detections,
+    open_detections,
+    save_detections,
+)
 from pycocotools.mask import encode as coco_mask_encode
 
 
-def gen_mask():
+def gen_mask(offset: int = 0):
     mask = np.zeros((100, 100), dtype=np.uint8, order='F')
-    mask[10:30, 20:40] = 1
+    mask[10 + offset:30 + offset, 20:40] = 1
     return mask
 
 
@@ -55,3 +68,147 @@ def test_serialisation_round_trip_is_idempotent(tmpdir):
     assert_array_equal(loaded_obj_det.mask, obj_det.mask)
     assert not (obj_det.mask == 0).all()
     assert_bbox_close(obj_det.bbox, loaded_obj_det.bbox)
+
+
+def gen_frame_detections(video_id: str, frame_number: int) -> FrameObjectDetections:
+    return FrameObjectDetections(
+        video_id=video_id,
+        frame_number=frame_number,
+        objects=[
+            ObjectDetection(
+                bbox=BBox(left=0.1, top=0.2, right=0.3 + i / 100, bottom=0.4),
+                _coco_mask_counts=coco_mask_encode(gen_mask(frame_number + i))[
+                    'counts'
+                ],
+                pred_class=i,
+                score=0.5,
+            )
+            for i in range(frame_number % 4)
+        ],
+    )
+
+
+def test_indexed_round_trip_matches_pickle(tmpdir):
+    detections = [gen_frame_detections("P01_101", i) for i in range(1, 21)]
+    pkl_file = Path(str(tmpdir / "pkl" / "P01_101.pkl"))
+    indexed_file = Path(str(tmpdir / "indexed" / "P01_101.pkl"))
+    save_detections(pkl_file, detections)
+    save_detections(indexed_file, detections, file_format=FORMAT_INDEXED)
+
+    assert list(load_detections(indexed_file)) == list(load_detections(pkl_file))
+
+
+def test_indexed_random_access(tmpdir):
+    tmpfile = Path(str(tmpdir / "P01_101.dets"))
+    detections = [gen_frame_detections("P01_101", i) for i in [5, 3, 9, 1]]
+    save_detections(tmpfile, detections, file_format=FORMAT_INDEXED)
+    loaded = list(load_detections(tmpfile))
+
+    assert get_frame(tmpfile, 9) == loaded[2]
+    assert get_frames(tmpfile, [1, 5, 1]) == [loaded[3], loaded[0], loaded[3]]
+    with open_detections(tmpfile) as reader:
+        assert len(reader) == 4
+        assert 3 in reader
+        assert 4 not in reader
+        with pytest.raises(KeyError):
+            reader.get_frame(4)
+
+
+@pytest.mark.parametrize("compression", available_codecs())
+def test_compressed_indexed_matches_uncompressed(tmpdir, compression):
+    detections = [gen_frame_detections("P01_101", i) for i in range(1, 100)]
+    plain_file = Path(str(tmpdir / "plain" / "P01_101.dets"))
+    compressed_file = Path(str(tmpdir / "compressed" / "P01_101.dets"))
+    save_detections(plain_file, detections, file_format=FORMAT_INDEXED)
+    save_detections(
+        compressed_file,
+        detections,
+        file_format=FORMAT_INDEXED,
+        compression=compression,
+        chunk_size=16,
+    )
+
+    assert list(iter_serialized_detections(compressed_file)) == list(
+        iter_serialized_detections(plain_file)
+    )
+    frame_numbers = [99, 1, 50, 17, 16, 50]
+    assert get_frames(compressed_file, frame_numbers) == get_frames(
+        plain_file, frame_numbers
+    )
+    with open_detections(compressed_file) as reader:
+        assert reader.compression == compression
+        assert reader.get_frame(33) == get_frame(plain_file, 33)
+        assert list(reader) == list(load_detections(plain_file))
+
+
+def test_compression_requires_indexed_format(tmpdir):
+    with pytest.raises(ValueError):
+        DetectionWriter(tmpdir / "P01_101.pkl", compression="zlib")
+
+
+@pytest.mark.parametrize("protocol", range(pickle.HIGHEST_PROTOCOL + 1))
+def test_streaming_pickled_bytes_matches_unpickling(tmpdir, protocol):
+    tmpfile = Path(str(tmpdir / "P01_101.pkl"))
+    empty = b""
+    pb_strs = [b"\x10\x01", empty, b"x" * 300, empty, b"y" * 70000]
+    with open(tmpfile, "wb") as f:
+        pickle.dump(pb_strs, f, protocol=protocol)
+
+    assert list(iter_serialized_detections(tmpfile)) == pb_strs
+
+
+@pytest.mark.parametrize("protocol", range(3, pickle.HIGHEST_PROTOCOL + 1))
+def test_streaming_pickled_bytes_follows_memo_references(tmpdir, protocol):
+    tmpfile = Path(str(tmpdir / "P01_101.pkl"))
+    # The same frame object twice, e.g. a video with a frame duplicated.
+    pb_str = gen_frame_detections("P01_101", 3).to_protobuf().SerializeToString()
+    assert len(pb_str) > 200
+    pb_strs = [pb_str, b"y" * 70000, pb_str, b"\x10\x01", pb_str]
+    with open(tmpfile, "wb") as f:
+        pickle.dump(pb_strs, f, protocol=protocol)
+
+    assert list(iter_serialized_detections(tmpfile)) == pb_strs
+
+
+@pytest.mark.parametrize("file_format", [FORMAT_PICKLE, FORMAT_INDEXED])
+def test_detection_writer_streams_frames(tmpdir, file_format):
+    tmpfile = Path(str(tmpdir / "P01_101.dets"))
+    detections = [gen_frame_detections("P01_101", i) for i in range(1, 1200)]
+    with DetectionWriter(tmpfile, file_format=file_format) as writer:
+        writer.write(detections[0])
+        writer.write_all(iter(detections[1:]))
+    assert writer.n_frames == len(detections)
+
+    expected_pb_strs = [det.to_protobuf().SerializeToString() for det in detections]
+    assert list(iter_serialized_detections(tmpfile)) == expected_pb_strs
+    if file_format == FORMAT_PICKLE:
+        with open(tmpfile, "rb") as f:
+            assert pickle.load(f) == expected_pb_strs
+
+
+def test_detection_writer_removes_partial_file_on_error(tmpdir):
+    tmpfile = Path(str(tmpdir / "P01_101.dets"))
+    with pytest.raises(RuntimeError):
+        with DetectionWriter(tmpfile, file_format=FORMAT_INDEXED) as writer:
+            writer.write(gen_frame_detections("P01_101", 1))
+            raise RuntimeError()
+    assert not tmpfile.exists()
+
+
+def test_lazy_frames_build_objects_on_access(tmpdir):
+    tmpfile = Path(str(tmpdir / "P01_101.pkl"))
+    detections = [gen_frame_detections("P01_101", i) for i in range(1, 9)]
+    save_detections(tmpfile, detections)
+
+    eager_frames = list(load_detections(tmpfile))
+    lazy_frames = list(load_detections(tmpfile, lazy=True))
+    for eager, lazy in zip(eager_frames, lazy_frames):
+        assert lazy.frame_number == eager.frame_number
+        assert len(lazy) == len(eager.objects)
+        assert lazy._objects is None
+        assert_array_equal(lazy.pred_classes, [obj.pred_class for obj in eager.objects])
+        assert lazy.bboxes.shape == (len(eager.objects), 4)
+        if len(lazy) > 0:
+            assert lazy[-1] == eager.objects[-1]
+        assert lazy._objects is None
+        assert lazy.materialize() == eager
@@ -0,0 +1,106 @@
+import numpy as np
+import PIL.Image
+import pytest
+
+from epic_kitchens.masks.cache import MaskCache
+from epic_kitchens.masks.raster import composite_masks, label_map
+from epic_kitchens.masks.resize import resize_masks, resize_rles
+from epic_kitchens.masks.rle import decode_rles
+from epic_kitchens.masks.visualisation import (
+    BACKEND_MATPLOTLIB,
+    BACKEND_RASTER,
+    DetectionRenderer,
+    resize_mask,
+)
+from test_serialization import gen_frame_detections, gen_mask
+
+
+def test_raster_renderer_draws_into_frame():
+    frame = gen_frame_detections("P01_101", 3)
+    img = PIL.Image.new("RGB", (200, 100), (0, 0, 0))
+    renderer = DetectionRenderer(display_bbox=False, backend=BACKEND_RASTER)
+
+    rendered = renderer.render_detections(img, frame)
+    assert isinstance(rendered, PIL.Image.Image)
+    assert rendered.size == img.size
+    pixels = np.asarray(rendered)
+    mask = resize_mask(frame.objects[0].mask, 100, 200).astype(bool)
+    # Only masks (and their captions in the top left corner) are drawn.
+    assert pixels[mask].any()
+    assert not pixels[60:][~mask[60:]].any()
+    assert not np.asarray(img).any()
+
+
+def test_matplotlib_renderer_returns_image():
+    frame = gen_frame_detections("P01_101", 2)
+    img = PIL.Image.new("RGB", (64, 32))
+    rendered = DetectionRenderer(backend=BACKEND_MATPLOTLIB).render_detections(
+        img, frame
+    )
+    assert isinstance(rendered, PIL.Image.Image)
+    assert DetectionRenderer().backend == BACKEND_MATPLOTLIB
+    with pytest.raises(ValueError):
+        DetectionRenderer(backend="svg")
+
+
+def test_composite_masks_draws_highest_score_on_top():
+    masks = np.zeros((3, 6, 8), dtype=np.uint8)
+    masks[0, 0:4, 0:4] = 1
+    masks[1, 2:6, 2:6] = 1
+    masks[2, 1:3, 5:8] = 1
+    colors = np.array([[200, 0, 0], [0, 200, 0], [0, 0, 200]], dtype=np.uint8)
+    labels = label_map(masks, order=np.argsort([0.9, 0.5, 0.7]))
+
+    # Object 0 scores highest so covers object 1 where they overlap.
+    assert labels[3, 3] == 1 and labels[5, 5] == 2 and labels[2, 5] == 3
+    assert labels[1, 6] == 3 and labels[0, 7] == 0
+
+    image = np.full((6, 8, 3), 100, dtype=np.uint8)
+    composite_masks(image, labels, colors)
+    assert (image[5, 7] == 100).all()
+    # Outlines take the instance color, interiors are blended.
+    assert (image[3, 3] == colors[0]).all()
+    assert (image[1, 1] == [150, 50, 50]).all()
+
+
+def pil_resize_mask(mask, height, width, smooth):
+    if smooth:
+        mask_img = PIL.Image.fromarray(mask * 255)
+        small_img = mask_img.resize((50, 50), PIL.Image.LANCZOS)
+        resized = small_img.resize((width, height), PIL.Image.LANCZOS)
+        return (np.asarray(resized) > 128).astype(np.uint8)
+    return np.asarray(
+        PIL.Image.fromarray(mask).resize((width, height), PIL.Image.NEAREST)
+    )
+
+
+@pytest.mark.parametrize("smooth", [True, False])
+@pytest.mark.parametrize("height,width", [(1080, 1920), (37, 83), (100, 100)])
+def test_resize_masks_matches_pil(height, width, smooth):
+    rng = np.random.RandomState(0)
+    masks = np.stack(
+        [
+            gen_mask(3),
+            gen_mask(55),
+            (rng.rand(100, 100) > 0.5).astype(np.uint8),
+            np.zeros((100, 100), dtype=np.uint8),
+        ]
+    )
+    expected = [pil_resize_mask(mask, height, width, smooth) for mask in masks]
+    np.testing.assert_array_equal(
+        resize_masks(masks, height, width, smooth=smooth), expected
+    )
+
+
+def test_resize_rles_caches_resized_masks():
+    frame = gen_frame_detections("P01_101", 3)
+    rles = [obj._coco_mask_counts for obj in frame.objects]
+    cache = MaskCache()
+    expected = resize_masks(decode_rles(rles), 45, 80)
+
+    np.testing.assert_array_equal(resize_rles(rles, 45, 80, cache=cache), expected)
+    assert (cache.hits, cache.misses) == (0, 3)
+    np.testing.assert_array_equal(resize_rles(rles, 45, 80, cache=cache), expected)
+    assert (cache.hits, cache.misses) == (3, 3)
+    resize_rles(rles, 80, 45, cache=cache)
+    assert cache.misses == 6